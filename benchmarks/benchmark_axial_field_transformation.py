@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the transformation of axial symmetric fields to 3d cartesian fields: Compares the vectorized
+``transform_2d_axial_to_3d`` with the previous implementation, which interpolated every node of the cartesian grid
+individually, and checks that both implementations produce bitwise identical results.
+
+Usage: python benchmarks/benchmark_axial_field_transformation.py [--radial N] [--axial N] [--chunk-size N]
+"""
+
+import argparse
+import time
+import numpy as np
+import IDSimPy.preprocessing.field_generation as fg
+
+
+def transform_2d_axial_to_3d_reference(R_axi, Z_axi, V_axi, radial_component=False):
+	"""
+	Previous node by node implementation of the interpolation step of the transformation, used as reference.
+	Returns the interpolated values on the positive quadrant of the cartesian grid.
+	"""
+	grid_r = R_axi[:, 0]
+	len_r = len(grid_r)
+	grid_z = Z_axi[0, :]
+
+	X, Y, Z = np.meshgrid(grid_r, grid_z, grid_r, indexing='ij')
+
+	if not radial_component:
+		result = np.zeros(np.shape(X))
+	else:
+		result = np.zeros(np.shape(X)+(2,))
+
+	for i in range(len(grid_r)):
+		for j in range(len(grid_z)):
+			for k in range(len(grid_r)):
+				x = X[i, j, k]
+				z = Z[i, j, k]
+
+				r = np.sqrt(x*x + z*z)
+				r_ic = np.searchsorted(grid_r, r)
+				r_if = r_ic - 1
+
+				if r_ic < len_r:
+					d_f = r - grid_r[r_if]
+					dn_f = d_f / (grid_r[r_ic] - grid_r[r_if])
+					dn_c = 1 - dn_f
+					res = dn_c * V_axi[r_if, j] + dn_f * V_axi[r_ic, j]
+
+					if radial_component:
+						phi = np.arctan2(x, z)
+						result[i, j, k, 0] = np.sin(phi)*res
+						result[i, j, k, 1] = np.cos(phi)*res
+					else:
+						result[i, j, k] = res
+
+	return result
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the axial symmetric to 3d field transformation')
+	parser.add_argument('--radial', type=int, default=40, help='number of radial grid points')
+	parser.add_argument('--axial', type=int, default=200, help='number of axial grid points')
+	parser.add_argument('--chunk-size', type=int, default=None, help='number of axial grid points per chunk')
+	args = parser.parse_args()
+
+	R_axi, Z_axi = np.meshgrid(np.linspace(0, 0.01, args.radial), np.linspace(0, 0.1, args.axial), indexing='ij')
+	V_axi = np.random.default_rng(42).normal(size=R_axi.shape)
+
+	for radial_component in (False, True):
+		t_start = time.perf_counter()
+		result_ref = transform_2d_axial_to_3d_reference(R_axi, Z_axi, V_axi, radial_component)
+		t_reference = time.perf_counter() - t_start
+
+		t_start = time.perf_counter()
+		result = fg.transform_2d_axial_to_3d(R_axi, Z_axi, V_axi, radial_component, chunk_size=args.chunk_size)[3]
+		t_vectorized = time.perf_counter() - t_start
+
+		print('radial component {}: reference {:.3f} s, vectorized {:.3f} s (speedup {:.1f})'.format(
+			radial_component, t_reference, t_vectorized, t_reference / t_vectorized))
+
+		# the positive quadrant of the result is the interpolated data:
+		n_r = args.radial
+		result_quadrant = result[n_r:, :, n_r:]
+		if not np.array_equal(result_quadrant.view(np.int64), result_ref.view(np.int64)):
+			raise AssertionError('Results of vectorized and reference implementation differ')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the center of charge calculation: Compares the vectorized ``center_of_charge`` (a single reduction of
+the static position array, a segmented reduction of the ragged frames of variable trajectories) with the previous
+implementation, which averaged every spatial dimension of every time step individually.
+
+The full benchmark problem size of 1e5 ions and 1e4 time steps requires about 24 GB of memory for the static position
+array, the default problem size is therefore smaller.
+
+Usage: python benchmarks/benchmark_center_of_charge.py [--ions N] [--steps N]
+"""
+
+import argparse
+import time
+import numpy as np
+import IDSimPy.analysis as ia
+
+
+def center_of_charge_reference(trajectory, charges=None):
+	"""
+	Previous center of charge implementation, used as reference
+	"""
+	n_timesteps = trajectory.n_timesteps
+	coc = np.zeros((n_timesteps, 3))
+	for i in range(n_timesteps):
+		p_pos = trajectory.get_positions(i)
+		weights = None if charges is None else charges[i]
+
+		x_mean = np.average(p_pos[:, 0], weights=weights)
+		y_mean = np.average(p_pos[:, 1], weights=weights)
+		z_mean = np.average(p_pos[:, 2], weights=weights)
+
+		coc[i, :] = np.array([x_mean, y_mean, z_mean])
+
+	return coc
+
+
+def run_benchmark(label, trajectory, charges):
+	t_start = time.perf_counter()
+	coc_reference = center_of_charge_reference(trajectory, charges)
+	t_reference = time.perf_counter() - t_start
+
+	t_start = time.perf_counter()
+	coc = ia.center_of_charge(trajectory, charge_attribute=None if charges is None else 'charge')
+	t_vectorized = time.perf_counter() - t_start
+
+	print('{}: reference {:.3f} s, vectorized {:.3f} s (speedup {:.1f})'.format(
+		label, t_reference, t_vectorized, t_reference / t_vectorized))
+	np.testing.assert_allclose(coc, coc_reference, rtol=1e-9, atol=1e-12)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark center of charge calculation')
+	parser.add_argument('--ions', type=int, default=10000, help='number of ions')
+	parser.add_argument('--steps', type=int, default=1000, help='number of time steps')
+	args = parser.parse_args()
+
+	rng = np.random.default_rng(42)
+	times = np.arange(args.steps) * 1e-6
+	positions = rng.normal(size=(args.ions, 3, args.steps))
+	charges = rng.integers(1, 3, size=(args.ions, 1, args.steps)).astype(float)
+	static_trajectory = ia.Trajectory(positions=positions, times=times)
+	run_benchmark('static trajectory', static_trajectory, None)
+
+	static_trajectory.particle_attributes = ia.ParticleAttributes(['charge'], charges)
+	run_benchmark('static trajectory, charge attribute', static_trajectory,
+	              [charges[:, 0, i] for i in range(args.steps)])
+
+	n_particles = rng.integers(args.ions // 2, args.ions, size=args.steps)
+	frames = [positions[:n_particles[i], :, i] for i in range(args.steps)]
+	variable_charges = [charges[:n_particles[i], :, i] for i in range(args.steps)]
+	variable_trajectory = ia.Trajectory(
+		positions=ia.RaggedFrames.from_frames(frames), times=times,
+		particle_attributes=ia.ParticleAttributes(['charge'], ia.RaggedFrames.from_frames(variable_charges)))
+	run_benchmark('variable trajectory', variable_trajectory, None)
+	run_benchmark('variable trajectory, charge attribute', variable_trajectory,
+	              [c[:, 0] for c in variable_charges])
+
+
+if __name__ == '__main__':
+	main()
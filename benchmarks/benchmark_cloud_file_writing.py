@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for writing ion cloud files: Compares the chunked ion cloud file writer (``write_cloud_file``) with the
+previous implementation, which wrote the ion cloud value by value, and with the binary ion cloud format.
+
+Usage: python benchmarks/benchmark_cloud_file_writing.py [--ions N]
+"""
+
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+import numpy as np
+import IDSimPy.preprocessing.ion_cloud_generation as cl
+
+
+def write_cloud_file_reference(ion_cloud, filename):
+	"""
+	Previous ion cloud file writer implementation, used as reference
+	"""
+	with open(filename, 'w') as file:
+		for i_ion in range(np.shape(ion_cloud)[0]):
+			line = ion_cloud[i_ion, :]
+			for v in line:
+				file.write(str(v) + ';')
+
+			file.write('\n')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark ion cloud file writing')
+	parser.add_argument('--ions', type=int, default=200000, help='number of ions')
+	args = parser.parse_args()
+
+	cloud = cl.define_cylinder_z_dir(args.ions, 1e-3, 5e-3, 1, 100)
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		reference_file = os.path.join(tmp_dir, 'reference_cloud.csv')
+		t_start = time.perf_counter()
+		write_cloud_file_reference(cloud, reference_file)
+		t_reference = time.perf_counter() - t_start
+		print('reference implementation: {:.3f} s'.format(t_reference))
+
+		text_file = os.path.join(tmp_dir, 'cloud.csv')
+		t_start = time.perf_counter()
+		cl.write_cloud_file(cloud, text_file)
+		t_text = time.perf_counter() - t_start
+		print('chunked text writer: {:.3f} s (speedup {:.1f})'.format(t_text, t_reference / t_text))
+
+		binary_file = os.path.join(tmp_dir, 'cloud.npy')
+		t_start = time.perf_counter()
+		cl.write_cloud_file(cloud, binary_file)
+		t_binary = time.perf_counter() - t_start
+		print('binary writer: {:.3f} s (speedup {:.1f})'.format(t_binary, t_reference / t_binary))
+
+		t_start = time.perf_counter()
+		cloud_text = cl.read_cloud_file(text_file)
+		t_read_text = time.perf_counter() - t_start
+		t_start = time.perf_counter()
+		cloud_binary = cl.read_cloud_file(binary_file)
+		t_read_binary = time.perf_counter() - t_start
+		print('reading: text {:.3f} s, binary {:.3f} s'.format(t_read_text, t_read_binary))
+
+		if not filecmp.cmp(reference_file, text_file, shallow=False):
+			raise ValueError('Text ion cloud file differs from reference')
+		np.testing.assert_array_equal(cloud_text, cloud)
+		np.testing.assert_array_equal(cloud_binary, cloud)
+
+
+if __name__ == '__main__':
+	main()
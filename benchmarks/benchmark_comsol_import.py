@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the import of comsol csv grid files: Compares the streaming importer (``import_comsol_3d_csv_grid``)
+with the previous implementation, which read the whole file into one string, split it into field chunks and copied
+the parsed chunks line by line into the field arrays.
+
+A synthetic gzipped comsol csv grid file is generated for the benchmark.
+
+Usage: python benchmarks/benchmark_comsol_import.py [--points N] [--fields N]
+"""
+
+import argparse
+import gzip
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import IDSimPy.preprocessing.comsol_import as ci
+
+
+def import_comsol_3d_csv_grid_reference(filename):
+	"""
+	Previous comsol csv importer implementation, used as reference
+	"""
+	with gzip.open(filename, 'rt') as f:
+		raw_dat_str = f.read()
+
+	raw_dat_tokenized = raw_dat_str.split("% Data\n")
+	grid_points = ci.parse_spatial_dimensions(raw_dat_tokenized[0])
+	x_len, y_len, z_len = [len(x) for x in grid_points]
+
+	fields = []
+	for raw_chunk in raw_dat_tokenized[1:]:
+		(field_name, raw_field) = raw_chunk.split('\n', 1)
+		field_raw_dat = np.genfromtxt(io.BytesIO(raw_field.encode()), delimiter=',')
+		field_dat = np.zeros([x_len, y_len, z_len])
+		for k in range(z_len):
+			for j in range(y_len):
+				field_dat[:, j, k] = field_raw_dat[j + k * y_len, :]
+		fields.append({"name": field_name, 'data': field_dat})
+
+	return {"grid_points": grid_points, "fields": fields}
+
+
+def write_synthetic_comsol_file(file_name, n_points, n_fields):
+	"""
+	Writes a synthetic gzipped comsol csv grid file
+	"""
+	rng = np.random.default_rng(42)
+	grid_vec = np.linspace(-1.0, 1.0, n_points)
+	with gzip.open(file_name, 'wt') as f:
+		f.write('% Model,synthetic.mph\n% Grid\n')
+		for i in range(3):
+			f.write(','.join(repr(v) for v in grid_vec) + '\n')
+		for i_field in range(n_fields):
+			f.write('% Data\n% field ' + str(i_field) + ' (V)\n')
+			np.savetxt(f, rng.normal(size=(n_points * n_points, n_points)), delimiter=',', fmt='%.9g')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark comsol csv grid import')
+	parser.add_argument('--points', type=int, default=60, help='number of grid points per dimension')
+	parser.add_argument('--fields', type=int, default=4, help='number of fields')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		file_name = os.path.join(tmp_dir, 'benchmark_field.csv.gz')
+		write_synthetic_comsol_file(file_name, args.points, args.fields)
+
+		t_start = time.perf_counter()
+		dat_ref = import_comsol_3d_csv_grid_reference(file_name)
+		t_reference = time.perf_counter() - t_start
+		print('reference implementation: {:.3f} s'.format(t_reference))
+
+		t_start = time.perf_counter()
+		dat = ci.import_comsol_3d_csv_grid(file_name)
+		t_streaming = time.perf_counter() - t_start
+		print('streaming importer: {:.3f} s (speedup {:.2f})'.format(t_streaming, t_reference / t_streaming))
+
+		t_start = time.perf_counter()
+		ci.import_comsol_3d_csv_grid(file_name, field_names=['% field 0 (V)'])
+		t_selected = time.perf_counter() - t_start
+		print('streaming importer, one field: {:.3f} s'.format(t_selected))
+
+		for field, field_ref in zip(dat['fields'], dat_ref['fields']):
+			np.testing.assert_array_equal(field['data'], field_ref['data'])
+
+
+if __name__ == '__main__':
+	main()
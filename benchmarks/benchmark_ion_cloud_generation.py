@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for generating multi species ion clouds: Compares the ion cloud builder (``IonCloudBuilder``), which
+allocates the ion cloud once and fills the particle groups in place, with the previous approach of defining the
+particle groups individually and growing the ion cloud by repeated ``np.vstack``.
+
+Usage: python benchmarks/benchmark_ion_cloud_generation.py [--ions N] [--species N]
+"""
+
+import argparse
+import time
+import numpy as np
+import IDSimPy.preprocessing.ion_cloud_generation as cl
+
+
+def generate_cloud_reference(n_ions, masses):
+	"""
+	Previous ion cloud generation approach, used as reference
+	"""
+	ion_cloud = []
+	for mass in masses:
+		species_cloud = cl.add_thermalized_kinetic_energy(cl.define_cylinder_z_dir(n_ions, 1e-3, 5e-3, 1, mass), 0.05)
+		if len(ion_cloud) == 0:
+			ion_cloud = species_cloud
+		else:
+			ion_cloud = np.vstack([ion_cloud, species_cloud])
+	return ion_cloud
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark ion cloud generation')
+	parser.add_argument('--ions', type=int, default=200000, help='number of ions per species')
+	parser.add_argument('--species', type=int, default=20, help='number of ion species')
+	args = parser.parse_args()
+
+	masses = np.linspace(50, 500, args.species)
+
+	t_start = time.perf_counter()
+	cloud_reference = generate_cloud_reference(args.ions, masses)
+	t_reference = time.perf_counter() - t_start
+	print('reference implementation: {:.3f} s'.format(t_reference))
+
+	t_start = time.perf_counter()
+	builder = cl.IonCloudBuilder(seed=42)
+	for mass in masses:
+		builder.add_cylinder_z_dir(args.ions, 1e-3, 5e-3, 1, mass, kinetic_energy=0.05)
+	cloud = builder.build()
+	t_builder = time.perf_counter() - t_start
+	print('ion cloud builder: {:.3f} s (speedup {:.2f})'.format(t_builder, t_reference / t_builder))
+
+	if np.shape(cloud) != np.shape(cloud_reference):
+		raise ValueError('Ion cloud shape differs from reference')
+	np.testing.assert_array_equal(cloud[:, 6:9], cloud_reference[:, 6:9])
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for reading json trajectory files: Compares the streaming json trajectory reader
+(``read_json_trajectory_file``) with the previous implementation, which loaded the whole document with ``json.load``
+and filled the trajectory arrays ion by ion.
+
+A synthetic (gzipped) json trajectory file is generated for the benchmark.
+
+Usage: python benchmarks/benchmark_json_trajectory_reading.py [--ions N] [--steps N]
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import IDSimPy.analysis as ia
+
+
+def read_json_trajectory_file_reference(trajectory_filename):
+	"""
+	Previous json trajectory reader implementation, used as reference
+	"""
+	if trajectory_filename[-8:] == ".json.gz":
+		with gzip.open(trajectory_filename) as tf:
+			tj = json.load(io.TextIOWrapper(tf))
+	else:
+		with open(trajectory_filename) as tf:
+			tj = json.load(tf)
+
+	steps = tj["steps"]
+	n_ions = len(steps[0]["ions"])
+	n_timesteps = len(steps)
+
+	times = np.array([float(step["time"]) for step in steps])
+	positions = np.zeros([n_ions, 3, n_timesteps])
+	n_additional_parameters = len(steps[0]["ions"][0]) - 1
+	additional_parameters = np.zeros([n_ions, n_additional_parameters, n_timesteps])
+
+	for i in range(n_timesteps):
+		for j in range(n_ions):
+			positions[j, :, i] = np.array(steps[i]["ions"][j][0])
+			additional_parameters[j, :, i] = np.array(steps[i]["ions"][j][1:])
+
+	return times, positions, additional_parameters
+
+
+def write_synthetic_json_trajectory(file_name, n_ions, n_steps):
+	"""
+	Writes a synthetic gzipped json trajectory file
+	"""
+	rng = np.random.default_rng(42)
+	with gzip.open(file_name, 'wt') as tf:
+		tf.write('{"steps":[')
+		for i in range(n_steps):
+			positions = rng.normal(size=(n_ions, 3))
+			ions = [[list(positions[j, :]), j % 3] for j in range(n_ions)]
+			if i > 0:
+				tf.write(',')
+			json.dump({'time': i * 1e-6, 'ions': ions}, tf)
+		tf.write('],"ionMasses":' + json.dumps([100.0] * n_ions))
+		tf.write(',"splatTimes":' + json.dumps([0.0] * n_ions) + '}')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark json trajectory reading')
+	parser.add_argument('--ions', type=int, default=2000, help='number of ions')
+	parser.add_argument('--steps', type=int, default=200, help='number of time steps')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		file_name = os.path.join(tmp_dir, 'benchmark_trajectories.json.gz')
+		write_synthetic_json_trajectory(file_name, args.ions, args.steps)
+
+		t_start = time.perf_counter()
+		times_ref, positions_ref, parameters_ref = read_json_trajectory_file_reference(file_name)
+		t_reference = time.perf_counter() - t_start
+		print('reference implementation: {:.3f} s'.format(t_reference))
+
+		t_start = time.perf_counter()
+		tra = ia.read_json_trajectory_file(file_name)
+		t_streaming = time.perf_counter() - t_start
+		print('streaming reader: {:.3f} s (speedup {:.2f})'.format(t_streaming, t_reference / t_streaming))
+
+		np.testing.assert_array_equal(tra.positions, positions_ref)
+		np.testing.assert_array_equal(tra.particle_attributes.attr_dat_float, parameters_ref)
+
+
+if __name__ == '__main__':
+	main()
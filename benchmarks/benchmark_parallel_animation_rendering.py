@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for rendering animation videos with multiple worker processes: Compares the parallel frame rendering of
+the high level animation rendering functions with their serial rendering for a scatter and a density animation of a
+trajectory and checks that the resulting video files are identical.
+
+Usage: python benchmarks/benchmark_parallel_animation_rendering.py [--project PROJECT] [--workers N] [--frames N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import IDSimPy.analysis.trajectory as tra
+import IDSimPy.analysis.visualization as vis
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark parallel animation rendering')
+	parser.add_argument(
+		'--project', default=os.path.join(
+			'test', 'analysis', 'data', 'trajectory_v3', 'qitSim_2019_07_variableTrajectoryQIT', 'qitSim_2019_07_22_002'),
+		help='basename of the simulation project to animate (static hdf5 trajectory)')
+	parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of rendering worker processes')
+	parser.add_argument('--frames', type=int, default=None, help='number of rendered frames')
+	args = parser.parse_args()
+
+	n_frames = args.frames
+	if n_frames is None:
+		n_frames = tra.read_hdf5_trajectory_file(args.project + '_trajectories.hd5').n_timesteps
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		for label, render_function, suffix, kwargs in (
+				('scatter', vis.render_scatter_animation, '_scatter.mp4', {'n_frames': n_frames, 'alpha': 0.5}),
+				('density', vis.render_xz_density_animation, '_densityXZ.mp4',
+				 {'n_frames': n_frames, 'xedges': 80, 'zedges': 80})):
+
+			reference_name = os.path.join(tmp_dir, label + '_serial')
+			t_start = time.perf_counter()
+			render_function(args.project, reference_name, **kwargs)
+			t_serial = time.perf_counter() - t_start
+
+			parallel_name = os.path.join(tmp_dir, label + '_parallel')
+			t_start = time.perf_counter()
+			render_function(args.project, parallel_name, n_workers=args.workers, **kwargs)
+			t_parallel = time.perf_counter() - t_start
+
+			print('{} animation ({} frames): serial {:.3f} s, {} workers {:.3f} s (speedup {:.1f})'.format(
+				label, n_frames, t_serial, args.workers, t_parallel, t_serial / t_parallel))
+
+			with open(reference_name + suffix, 'rb') as ref_file, open(parallel_name + suffix, 'rb') as par_file:
+				if ref_file.read() != par_file.read():
+					raise AssertionError('The parallel rendered {} video differs from the serial video'.format(label))
+
+
+if __name__ == '__main__':
+	main()
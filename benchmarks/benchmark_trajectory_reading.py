@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for reading hdf5 trajectory files: Compares serial frame reading with parallel reading with
+multiple worker threads (``n_workers`` option of ``read_hdf5_trajectory_file``) and with reading of the same
+trajectory from a file in the packed layout (written with ``write_hdf5_trajectory_file``).
+
+A synthetic version 3 trajectory file with gzip compressed frames is generated for the benchmark.
+
+Usage: python benchmarks/benchmark_trajectory_reading.py [--timesteps N] [--particles N] [--workers N [N ...]]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import h5py
+import numpy as np
+import IDSimPy.analysis as ia
+
+
+def write_synthetic_v3_trajectory(file_name, n_timesteps, n_particles, n_attributes_float=9):
+	"""
+	Writes a synthetic static version 3 hdf5 trajectory file with gzip compressed frames
+	"""
+	rng = np.random.default_rng(42)
+	with h5py.File(file_name, 'w') as h5f:
+		tra_group = h5f.create_group('particle_trajectory')
+		tra_group.attrs['file version'] = [3]
+		tra_group.attrs['number of timesteps'] = [n_timesteps]
+		tra_group.attrs['attributes names'] = [('attribute ' + str(i)).encode() for i in range(n_attributes_float)]
+		tra_group.attrs['integer attributes names'] = [b'global index', b'chemical id']
+		tra_group.create_dataset('times', data=np.arange(n_timesteps, dtype='>f4') * 1e-6)
+
+		ts_group = tra_group.create_group('timesteps')
+		global_index = np.arange(n_particles, dtype=np.int32)
+		for ts_i in range(n_timesteps):
+			frame_group = ts_group.create_group(str(ts_i))
+			frame_group.create_dataset(
+				'positions', data=rng.normal(size=(n_particles, 3)).astype('>f4'), compression='gzip')
+			frame_group.create_dataset(
+				'particle_attributes_float', data=rng.normal(size=(n_particles, n_attributes_float)).astype('>f4'),
+				compression='gzip')
+			frame_group.create_dataset(
+				'particle_attributes_integer',
+				data=np.column_stack((global_index, global_index % 3)), compression='gzip')
+
+
+def time_reading(file_name, n_workers, repetitions):
+	"""
+	Returns the best wall clock time of reading the trajectory file
+	"""
+	timings = []
+	for i in range(repetitions):
+		t_start = time.perf_counter()
+		ia.read_hdf5_trajectory_file(file_name, n_workers=n_workers)
+		timings.append(time.perf_counter() - t_start)
+	return min(timings)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark serial and parallel hdf5 trajectory reading')
+	parser.add_argument('--timesteps', type=int, default=500, help='number of time steps')
+	parser.add_argument('--particles', type=int, default=20000, help='number of particles')
+	parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8], help='numbers of workers')
+	parser.add_argument('--repetitions', type=int, default=3, help='number of repetitions per configuration')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		file_name = os.path.join(tmp_dir, 'benchmark_trajectories.hd5')
+		write_synthetic_v3_trajectory(file_name, args.timesteps, args.particles)
+
+		t_serial = time_reading(file_name, None, args.repetitions)
+		print('serial: {:.3f} s'.format(t_serial))
+		for n_workers in args.workers:
+			t_parallel = time_reading(file_name, n_workers, args.repetitions)
+			print('{} workers: {:.3f} s (speedup {:.2f})'.format(n_workers, t_parallel, t_serial / t_parallel))
+
+		packed_file_name = os.path.join(tmp_dir, 'benchmark_trajectories_packed.hd5')
+		ia.write_hdf5_trajectory_file(ia.read_hdf5_trajectory_file(file_name), packed_file_name, packed=True)
+		t_packed = time_reading(packed_file_name, None, args.repetitions)
+		print('packed layout: {:.3f} s (speedup {:.2f})'.format(t_packed, t_serial / t_packed))
+		for n_workers in args.workers:
+			t_parallel = time_reading(packed_file_name, n_workers, args.repetitions)
+			print('packed layout, {} workers: {:.3f} s (speedup {:.2f})'.format(
+				n_workers, t_parallel, t_serial / t_parallel))
+
+
+if __name__ == '__main__':
+	main()
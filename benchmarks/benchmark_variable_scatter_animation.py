@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the scatter animation of variable trajectories: Compares ``animate_variable_scatter_plot``, which
+creates the plot artists once and updates them for every frame, with the previous implementation, which cleared the
+figure and rebuilt the complete plot for every frame.
+
+Usage: python benchmarks/benchmark_variable_scatter_animation.py [--project PROJECT] [--frames N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import animation
+import IDSimPy.analysis.trajectory as tra
+import IDSimPy.analysis.visualization as vis
+
+
+def animate_variable_scatter_plot_reference(trajectory, n_frames, color_parameter, alpha=0.1, figsize=(13, 5)):
+	"""
+	Previous variable scatter animation implementation, used as reference (without manual limits and color range)
+	"""
+	fig = plt.figure(figsize=figsize)
+	pos = trajectory.positions
+	c_param = trajectory.particle_attributes.get(color_parameter)
+
+	def render_scatter_plot(i):
+		plt.clf()
+		ts_pos = pos[i]
+		empty_frame = ts_pos.shape[0] == 0
+
+		for subplot, yindex, ylabel in ((1, 1, "y position"), (2, 2, "z position")):
+			plt.subplot(1, 2, subplot)
+			plt.scatter(ts_pos[:, 0], ts_pos[:, yindex], s=10, alpha=alpha, c=c_param[i])
+			plt.xlabel("x position")
+			plt.ylabel(ylabel)
+			if not empty_frame:
+				plt.ylim((np.min(ts_pos[:, yindex]), np.max(ts_pos[:, yindex])))
+				plt.xlim((np.min(ts_pos[:, 0]), np.max(ts_pos[:, 0])))
+			else:
+				plt.ylim(0, 1)
+				plt.xlim(0, 1)
+
+		plt.annotate(
+			u"t= {: .2e} s".format(trajectory.times[i]), xy=(0.02, 0.96), xycoords="figure fraction",
+			horizontalalignment="left", verticalalignment="top", fontsize=13)
+
+	return animation.FuncAnimation(fig, render_scatter_plot, frames=range(n_frames))
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark variable scatter animation')
+	parser.add_argument(
+		'--project', default=os.path.join(
+			'test', 'analysis', 'data', 'trajectory_v3', 'qitSim_2019_07_variableTrajectoryQIT', 'qitSim_2019_07_22_001'),
+		help='basename of the simulation project to animate (variable hdf5 trajectory)')
+	parser.add_argument('--frames', type=int, default=None, help='number of rendered frames')
+	args = parser.parse_args()
+
+	trajectory = tra.read_hdf5_trajectory_file(args.project + '_trajectories.hd5')
+	n_frames = args.frames
+	if n_frames is None:
+		n_frames = trajectory.n_timesteps
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		t_start = time.perf_counter()
+		anim = animate_variable_scatter_plot_reference(trajectory, n_frames, 'global index')
+		anim.save(os.path.join(tmp_dir, 'reference.mp4'), fps=20, extra_args=['-vcodec', 'libx264'])
+		t_reference = time.perf_counter() - t_start
+		plt.close('all')
+
+		t_start = time.perf_counter()
+		anim = vis.animate_variable_scatter_plot(trajectory, n_frames=n_frames, color_parameter='global index')
+		anim.save(os.path.join(tmp_dir, 'artist_reuse.mp4'), fps=20, extra_args=['-vcodec', 'libx264'])
+		t_reuse = time.perf_counter() - t_start
+		plt.close('all')
+
+	print('video rendering ({} frames): reference {:.3f} s, artist reuse {:.3f} s (speedup {:.1f})'.format(
+		n_frames, t_reference, t_reuse, t_reference / t_reuse))
+
+	# frame update cost without video encoding, as relevant for interactive display with blitting:
+	anim = vis.animate_variable_scatter_plot(trajectory, n_frames=n_frames, color_parameter='global index')
+	anim._init_draw()
+	t_start = time.perf_counter()
+	for i in range(n_frames):
+		anim._draw_next_frame(i, blit=True)
+	t_blit = time.perf_counter() - t_start
+
+	anim = animate_variable_scatter_plot_reference(trajectory, n_frames, 'global index')
+	anim._init_draw()
+	t_start = time.perf_counter()
+	for i in range(n_frames):
+		anim._draw_next_frame(i, blit=False)
+		anim._fig.canvas.draw()
+	t_redraw = time.perf_counter() - t_start
+
+	print('frame updates: reference (full redraw) {:.3f} s, blitting {:.3f} s (speedup {:.1f})'.format(
+		t_redraw, t_blit, t_redraw / t_blit))
+
+
+if __name__ == '__main__':
+	main()
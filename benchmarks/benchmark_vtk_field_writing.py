@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for writing three dimensional fields to VTK files: Compares the bulk array conversion of the field writers
+(``write_3d_scalar_fields_as_vtk_point_data`` and ``write_3d_vector_fields_as_vtk_point_data``) with the previous
+implementation, which inserted the grid points and field values one by one.
+
+Usage: python benchmarks/benchmark_vtk_field_writing.py [--points N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+import IDSimPy.preprocessing.field_generation as fg
+
+
+def write_3d_fields_as_vtk_point_data_reference(dat, result_filename, vector_field):
+	"""
+	Previous VTK field writer implementation, used as reference
+	"""
+	vtk_p = vtk.vtkPoints()
+	x_vec, y_vec, z_vec = [np.array(x) for x in dat["grid_points"]]
+	fields_dat = dat["fields"]
+
+	vtk_fields = []
+	for fi in fields_dat:
+		vfi = vtk.vtkDoubleArray()
+		if vector_field:
+			vfi.SetNumberOfComponents(3)
+		vfi.SetName(fi['name'])
+		vtk_fields.append(vfi)
+
+	for zi in range(len(z_vec)):
+		for yi in range(len(y_vec)):
+			for xi in range(len(x_vec)):
+				vtk_p.InsertNextPoint([x_vec[xi], y_vec[yi], z_vec[zi]])
+				for i in range(len(vtk_fields)):
+					if vector_field:
+						vtk_fields[i].InsertNextTuple([c[xi, yi, zi] for c in fields_dat[i]['data']])
+					else:
+						vtk_fields[i].InsertNextValue(fields_dat[i]['data'][xi, yi, zi])
+
+	vtk_grid = vtk.vtkStructuredGrid()
+	vtk_grid.SetDimensions(len(x_vec), len(y_vec), len(z_vec))
+	vtk_grid.SetPoints(vtk_p)
+	for vfi in vtk_fields:
+		vtk_grid.GetPointData().AddArray(vfi)
+
+	writer = vtk.vtkXMLStructuredGridWriter()
+	writer.SetFileName(result_filename)
+	writer.SetInputData(vtk_grid)
+	writer.Write()
+
+
+def read_structured_grid(file_name):
+	"""
+	Reads a structured grid file, returns the points and the first point data array
+	"""
+	reader = vtk.vtkXMLStructuredGridReader()
+	reader.SetFileName(file_name)
+	reader.Update()
+	grid = reader.GetOutput()
+	return (numpy_support.vtk_to_numpy(grid.GetPoints().GetData()),
+	        numpy_support.vtk_to_numpy(grid.GetPointData().GetArray(0)))
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark VTK field writing')
+	parser.add_argument('--points', type=int, default=60, help='number of grid points per dimension')
+	args = parser.parse_args()
+
+	grid_points = [np.linspace(-1.0, 1.0, args.points)] * 3
+	X, Y, Z = np.meshgrid(*grid_points, indexing='ij')
+	scalar_dat = {'grid_points': grid_points, 'fields': [{'name': 'potential', 'data': X * Y + Z}]}
+	vector_dat = {'grid_points': grid_points, 'fields': [{'name': 'field', 'data': [X, Y * 2.0, Z * 3.0]}]}
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		for label, dat, writer, vector_field in (
+				('scalar', scalar_dat, fg.write_3d_scalar_fields_as_vtk_point_data, False),
+				('vector', vector_dat, fg.write_3d_vector_fields_as_vtk_point_data, True)):
+			reference_file = os.path.join(tmp_dir, label + '_reference.vts')
+			t_start = time.perf_counter()
+			write_3d_fields_as_vtk_point_data_reference(dat, reference_file, vector_field)
+			t_reference = time.perf_counter() - t_start
+
+			bulk_file = os.path.join(tmp_dir, label + '_bulk.vts')
+			t_start = time.perf_counter()
+			writer(dat, bulk_file)
+			t_bulk = time.perf_counter() - t_start
+
+			rectilinear_file = os.path.join(tmp_dir, label + '_bulk.vtr')
+			t_start = time.perf_counter()
+			writer(dat, rectilinear_file)
+			t_rectilinear = time.perf_counter() - t_start
+
+			print('{} fields: reference {:.3f} s, structured grid {:.3f} s (speedup {:.1f}), '
+			      'rectilinear grid {:.3f} s (speedup {:.1f})'.format(
+				label, t_reference, t_bulk, t_reference / t_bulk, t_rectilinear, t_reference / t_rectilinear))
+
+			for reference_array, bulk_array in zip(read_structured_grid(reference_file), read_structured_grid(bulk_file)):
+				np.testing.assert_array_equal(bulk_array, reference_array)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""
+Shared utilities for the binary on-disk caches of IDSimPy (trajectory cache and comsol import cache)
+"""
+
+import os
+import errno
+import shutil
+import tempfile
+
+
+def write_cache_entry(cache_dir, entry_dir, write_entry):
+	"""
+	Writes a cache entry directory atomically: The entry is written to a temporary directory in the cache directory
+	first and moved to its final place afterwards, which prevents incomplete cache entries if writing fails or is
+	interrupted. An existing (stale) entry is replaced. If another process writes the same entry concurrently, the
+	entry which is moved to its place first is kept.
+
+	:param cache_dir: The cache directory, created if it does not exist
+	:type cache_dir: str
+	:param entry_dir: The final directory of the cache entry
+	:type entry_dir: str
+	:param write_entry: Function which writes the files of the cache entry into the directory given as argument
+	:type write_entry: callable
+	"""
+	os.makedirs(cache_dir, exist_ok=True)
+	tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+	stale_dir = tmp_dir + '.stale'
+	try:
+		write_entry(tmp_dir)
+
+		# an existing entry is moved aside first, since a directory can not be replaced by a non empty directory:
+		try:
+			os.replace(entry_dir, stale_dir)
+		except FileNotFoundError:
+			pass
+
+		try:
+			os.replace(tmp_dir, entry_dir)
+		except OSError as error:
+			if error.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+				raise
+			# another process has written the entry in the meantime, the written entry is discarded
+	finally:
+		shutil.rmtree(tmp_dir, ignore_errors=True)
+		shutil.rmtree(stale_dir, ignore_errors=True)
@@ -7,6 +7,7 @@ import numpy as np
 from matplotlib import animation
 import pylab as plt
 from . import qitsim_analysis as lq
+from .visualization import DensityBinning
 
 
 def ion_radius_from_trajectories(positions, radius_center=[]):
@@ -167,7 +168,7 @@ def animate_simulation_z_vs_x_spacecharge_density(dat, n_frames, interval,
 	ax = plt.axes(ylim=(zedges[0], zedges[-1]), xlim=(xedges[0], xedges[-1]))
 	ax.set_facecolor(background_color)
 
-	im1 = ax.imshow(H, interpolation='nearest', origin='low', alpha=1, vmin=0, vmax=10, cmap="Reds",
+	im1 = ax.imshow(H, interpolation='nearest', origin='lower', alpha=1, vmin=0, vmax=10, cmap="Reds",
 					extent=[xedges[0], xedges[-1], zedges[0], zedges[-1]])
 
 	text_time = ax.annotate("TestText", xy=(0.02, 0.96), xycoords="figure fraction",
@@ -179,21 +180,27 @@ def animate_simulation_z_vs_x_spacecharge_density(dat, n_frames, interval,
 	plt.ylabel("z (mm)")
 	fillChannel = np.ones([len(xedges) - 1, len(zedges) - 1])
 
-	def animate(i):
-		tsNumber = i * interval
-		x = i_pos[:, 0, tsNumber]
-		z = i_pos[:, 2, tsNumber]
-
-		if analysis_mode == 'space_charge_magnitude':
-			weights = sc_force[:, tsNumber]
-		elif analysis_mode == 'space_charge_z_direction':
-			weights = np.abs(sc_force_z_dir[:, tsNumber])
-		elif analysis_mode == 'rf_force':
-			weights = rf_force[:, tsNumber]
+	if analysis_mode == 'space_charge_magnitude':
+		weights = sc_force
+	elif analysis_mode == 'space_charge_z_direction':
+		weights = np.abs(sc_force_z_dir)
+	elif analysis_mode == 'rf_force':
+		weights = rf_force
+
+	# the densities of all rendered frames are binned at once:
+	if file_mode == 'singleFrame':
+		ts_numbers = np.array([n_frames * interval])
+	else:
+		ts_numbers = np.arange(n_frames) * interval
+	n_ions = np.shape(i_pos)[0]
+	h_dens_frames, h_frames = DensityBinning(xedges, zedges).histogram_frames(
+		i_pos[:, 2, ts_numbers].T.ravel(), i_pos[:, 0, ts_numbers].T.ravel(),
+		np.repeat(np.arange(len(ts_numbers)), n_ions), len(ts_numbers), weights[:, ts_numbers].T.ravel())
 
-
-		h, xedges2, zedges2 = np.histogram2d(z, x, bins=(xedges, zedges), weights=weights)
-		h_dens, xedges2, zedges2 = np.histogram2d(z, x, bins=(xedges, zedges))
+	def animate(i):
+		tsNumber = ts_numbers[i]
+		h_dens = h_dens_frames[i]
+		h = h_frames[i]
 		# h_max = 1e-15 #np.max(h)
 		# h_min = 1e-17 #np.min(h)
 
@@ -215,5 +222,5 @@ def animate_simulation_z_vs_x_spacecharge_density(dat, n_frames, interval,
 		anim = animation.FuncAnimation(fig, animate, frames=n_frames, blit=False)
 		return (anim)
 	elif file_mode == 'singleFrame':
-		animate(n_frames)
+		animate(0)
 		return (fig)
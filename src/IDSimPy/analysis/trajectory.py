@@ -3,9 +3,18 @@
 import gzip
 import json
 import io
+import os
+import zlib
+import threading
+import hashlib
+import collections
+import concurrent.futures
 import h5py
 import numpy as np
+import vtk
+from vtk.util import numpy_support
 from enum import Enum
+from .._cache_util import write_cache_entry
 
 
 class OptionalAttribute(Enum):
@@ -17,6 +26,190 @@ class OptionalAttribute(Enum):
 	PARTICLE_CHARGES = 2  #: Particle charges
 
 
+def _is_static_frame_data(frame_data):
+	"""
+	Checks if frame data (positions or particle attributes) is static.
+
+	:param frame_data: Frame data to check
+	:return: True if the frame data is static (three dimensional numpy.ndarray or static :py:class:`LazyFrames`),
+		False if the frame data is variable (list of numpy.ndarray, :py:class:`RaggedFrames` or variable
+		:py:class:`LazyFrames`) and None if the frame data is of no valid frame data type
+	"""
+	if isinstance(frame_data, np.ndarray):
+		return True
+	elif isinstance(frame_data, (list, RaggedFrames)):
+		return False
+	elif isinstance(frame_data, LazyFrames):
+		return frame_data.is_static
+	else:
+		return None
+
+
+def _frame_data_dimensions(frame_data):
+	"""
+	Determines the number of time steps and the number of data columns of frame data
+
+	:param frame_data: Static or variable frame data
+	:return: Tuple with the number of time steps and the number of data columns
+	"""
+	if isinstance(frame_data, np.ndarray):
+		return np.shape(frame_data)[2], np.shape(frame_data)[1]
+	elif isinstance(frame_data, (LazyFrames, RaggedFrames)):
+		return frame_data.n_timesteps, frame_data.n_columns
+	else:
+		n_columns = [np.shape(i)[1] for i in frame_data if np.size(np.shape(i)) == 2][0]
+		return len(frame_data), n_columns
+
+
+class RaggedFrames:
+	"""
+	Contiguous storage of variable frame data (positions or particle attributes of a non static trajectory).
+
+	The rows of all frames are stored in one concatenated array **data** with the shape ``[total number of particles
+	in all frames, n columns]``. The vector **offsets** (length ``n time steps + 1``) marks the first row of every
+	frame in the data array: Frame ``i`` consists of the rows ``offsets[i]`` to ``offsets[i+1]``.
+
+	Ragged frames behave like a ``list`` of ``numpy.ndarray`` with the shape ``[n particles, n columns]``, one per
+	time step, which is the classic representation of variable frame data. The individual frames are views into the
+	data array. Operations on all frames can be done in a single vectorized pass on the data array.
+	"""
+
+	is_static = False
+
+	def __init__(self, data, offsets):
+		"""
+		Constructs new ragged frame data
+
+		:param data: Concatenated frame data with the shape ``[total number of rows, n columns]``
+		:type data: numpy.ndarray
+		:param offsets: First row of every frame and the total number of rows as last element
+		:type offsets: numpy.ndarray
+		"""
+		offsets = np.asarray(offsets, dtype=np.int64)
+		if np.ndim(data) != 2:
+			raise ValueError('Ragged frame data has to be two dimensional')
+		if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != np.shape(data)[0] \
+				or np.any(np.diff(offsets) < 0):
+			raise ValueError('Invalid frame offsets for ragged frame data')
+
+		self.data = data
+		self.offsets = offsets
+		self.n_timesteps = len(offsets) - 1
+		self.n_columns = np.shape(data)[1]
+
+	@classmethod
+	def from_frames(cls, frames, n_columns=None):
+		"""
+		Constructs ragged frame data from a list of individual frames
+
+		:param frames: Frames with the shape ``[n particles, n columns]``
+		:type frames: list of numpy.ndarray
+		:param n_columns: Number of data columns, determined from the frames if None
+		:type n_columns: int
+		"""
+		frames = [np.asarray(frame) for frame in frames]
+		if n_columns is None:
+			n_columns = _frame_data_dimensions(frames)[1]
+
+		offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+		offsets[1:] = np.cumsum([frame.shape[0] for frame in frames])
+
+		# empty frames are often of a different (default) data type, they should not determine the data type:
+		non_empty_frames = [frame for frame in frames if frame.size > 0]
+		if non_empty_frames:
+			dtype = np.result_type(*non_empty_frames)
+			data = np.concatenate([frame.reshape([-1, n_columns]).astype(dtype, copy=False) for frame in frames])
+		else:
+			dtype = frames[0].dtype if frames else float
+			data = np.empty([0, n_columns], dtype=dtype)
+
+		return cls(data, offsets)
+
+	@property
+	def frame_lengths(self):
+		"""
+		Number of rows (particles) in the individual frames
+		"""
+		return np.diff(self.offsets)
+
+	@property
+	def frame_indices(self):
+		"""
+		Time step index of every row of the data array
+		"""
+		return np.repeat(np.arange(self.n_timesteps), self.frame_lengths)
+
+	def frame(self, timestep_index):
+		"""
+		Returns a view on the data of a single frame
+
+		:param timestep_index: Index of the time step
+		:type timestep_index: int
+		:rtype: numpy.ndarray
+		"""
+		if timestep_index < 0:
+			timestep_index += self.n_timesteps
+		if timestep_index < 0 or timestep_index >= self.n_timesteps:
+			raise IndexError('Time step index out of range')
+		return self.data[self.offsets[timestep_index]:self.offsets[timestep_index + 1]]
+
+	def select_rows(self, row_selection):
+		"""
+		Selects rows from all frames and returns new ragged frame data with the selected rows
+
+		:param row_selection: Boolean mask or ascending indices of the selected rows of the data array
+		:type row_selection: numpy.ndarray
+		:rtype: RaggedFrames
+		"""
+		row_selection = np.asarray(row_selection)
+		frame_indices = self.frame_indices[row_selection]
+		offsets = np.zeros(self.n_timesteps + 1, dtype=np.int64)
+		offsets[1:] = np.cumsum(np.bincount(frame_indices, minlength=self.n_timesteps))
+		return RaggedFrames(self.data[row_selection], offsets)
+
+	def __len__(self):
+		return self.n_timesteps
+
+	def __iter__(self):
+		for i in range(self.n_timesteps):
+			yield self.frame(i)
+
+	def __getitem__(self, key):
+		if isinstance(key, slice):
+			return [self.frame(i) for i in range(self.n_timesteps)[key]]
+		return self.frame(int(key))
+
+
+def _ragged_frame_column(frame_data, column):
+	"""
+	Returns a single column of in memory frame data (static or variable) as flat vector in time step major order,
+	which is the row order of :py:class:`RaggedFrames`
+	"""
+	if isinstance(frame_data, RaggedFrames):
+		return frame_data.data[:, column]
+	elif isinstance(frame_data, np.ndarray):
+		return frame_data[:, column, :].T.ravel()
+	else:
+		return RaggedFrames.from_frames(frame_data).data[:, column]
+
+
+def _select_ragged_rows(frame_data, row_mask):
+	"""
+	Selects rows from in memory frame data (static or variable) with a flat boolean mask in time step major order
+	and returns the selected rows as :py:class:`RaggedFrames`
+	"""
+	if isinstance(frame_data, RaggedFrames):
+		return frame_data.select_rows(row_mask)
+	elif isinstance(frame_data, np.ndarray):
+		n_particles, n_columns, n_timesteps = frame_data.shape
+		frame_mask = np.reshape(row_mask, [n_timesteps, n_particles])
+		offsets = np.zeros(n_timesteps + 1, dtype=np.int64)
+		offsets[1:] = np.cumsum(np.count_nonzero(frame_mask, axis=1))
+		return RaggedFrames(np.transpose(frame_data, (2, 0, 1))[frame_mask], offsets)
+	else:
+		return RaggedFrames.from_frames(frame_data).select_rows(row_mask)
+
+
 class ParticleAttributes:
 	"""
 	Container class for heterogeneous particle attributes. This container class can store a set of named additional
@@ -32,6 +225,9 @@ class ParticleAttributes:
 	  and 15 time steps the shape would be ``[5, 4, 15]``.
 	* If the trajectory is not static: The internal arrays are ``lists`` of ``numpy.ndarray`` with the shape
 	  ``[particle attribute, n ions]``
+
+	Particle attributes of lazily read trajectories store their data as :py:class:`LazyFrames`. Variable particle
+	attributes read from files are stored as :py:class:`RaggedFrames`, which behave like the ``list`` representation.
 	"""
 
 	def __init__(self, attribute_names_float=None, attributes_float=None, attribute_names_int=None, attributes_int=None):
@@ -65,16 +261,10 @@ class ParticleAttributes:
 		if self.attr_dat_float is not None:
 			self.attr_names += self.attr_names_float
 			n_attr_float = len(attribute_names_float)
-			if type(self.attr_dat_float) == np.ndarray:
-				float_static = True
-				float_n_ts = np.shape(self.attr_dat_float)[2]
-				n_columns_float = np.shape(self.attr_dat_float)[1]
-			elif type(self.attr_dat_float) == list:
-				float_static = False
-				float_n_ts = len(self.attr_dat_float)
-				n_columns_float = [np.shape(i)[1] for i in self.attr_dat_float if np.size(np.shape(i)) == 2][0]
-			else:
+			float_static = _is_static_frame_data(self.attr_dat_float)
+			if float_static is None:
 				raise TypeError('Wrong type for float particle attributes, has to be an numpy.ndarray or a list of numpy.ndarrays')
+			float_n_ts, n_columns_float = _frame_data_dimensions(self.attr_dat_float)
 
 			if n_columns_float != len(self.attr_names_float):
 				raise ValueError('Wrong number of data columns for particle attributes (float)')
@@ -85,16 +275,10 @@ class ParticleAttributes:
 		if self.attr_dat_int is not None:
 			self.attr_names += self.attr_names_int
 			n_attr_int = len(attribute_names_int)
-			if type(self.attr_dat_int) == np.ndarray:
-				int_static = True
-				int_n_ts = np.shape(self.attr_dat_int)[2]
-				n_columns_int = np.shape(self.attr_dat_int)[1]
-			elif type(self.attr_dat_int) == list:
-				int_static = False
-				int_n_ts = len(self.attr_dat_int)
-				n_columns_int = [np.shape(i)[1] for i in self.attr_dat_int if np.size(np.shape(i)) == 2][0]
-			else:
+			int_static = _is_static_frame_data(self.attr_dat_int)
+			if int_static is None:
 				raise TypeError('Wrong type for int particle attributes, has to be an numpy.ndarray or a list of numpy.ndarrays')
+			int_n_ts, n_columns_int = _frame_data_dimensions(self.attr_dat_int)
 
 			if n_columns_int != len(self.attr_names_int):
 				raise ValueError('Wrong number of data columns for particle attributes (int)')
@@ -181,6 +365,28 @@ class ParticleAttributes:
 
 		return selected_attrs_float, selected_attrs_int
 
+	def _select_ragged_rows(self, row_mask):
+		"""
+		Selects particles with a flat boolean mask over all rows of all frames (in time step major order, see
+		:py:class:`RaggedFrames`) and returns a new variable ParticleAttribute container
+		"""
+		selected_attrs_float = None
+		if self.attr_dat_float is not None:
+			selected_attrs_float = _select_ragged_rows(self.attr_dat_float, row_mask)
+
+		selected_attrs_int = None
+		if self.attr_dat_int is not None:
+			selected_attrs_int = _select_ragged_rows(self.attr_dat_int, row_mask)
+
+		return ParticleAttributes(
+			self.attr_names_float, selected_attrs_float, self.attr_names_int, selected_attrs_int)
+
+	def _is_in_memory(self):
+		"""
+		Checks if the attribute data is held in memory (is not lazily read)
+		"""
+		return not isinstance(self.attr_dat_float, LazyFrames) and not isinstance(self.attr_dat_int, LazyFrames)
+
 	def select(self, selected_particle_indices):
 		"""
 		Select individual particles based on their indices and return new ParticleAttribute container
@@ -251,6 +457,8 @@ class ParticleAttributes:
 		else:
 			if timestep_index is not None:
 				return attr_dat[timestep_index][:, ap[1]]
+			elif isinstance(attr_dat, RaggedFrames):
+				return np.split(attr_dat.data[:, ap[1]], attr_dat.offsets[1:-1])
 			else:
 				return [ attr_dat[i][:, ap[1]]
 				         if attr_dat[i].ndim == 2 else attr_dat[i]
@@ -328,7 +536,11 @@ class Trajectory:
 		* If the trajectory is static: **positions** is a ``numpy.ndarray`` with the shape ``[n ions, spatial
 		  dimensions, n time steps]``. With 5 particles and 15 time steps the shape would be ``[5, 3, 15]``.
 		* If the trajectory is not static: **positions** is a ``list`` of ``numpy.ndarray`` with the shape ``[spatial
-		  dimensions, n ions]``
+		  dimensions, n ions]``. Variable trajectories read from files store their positions as
+		  :py:class:`RaggedFrames`, which behave like such a list but hold all frames in one contiguous array.
+		* If the trajectory was read lazily from a file: **positions** is a :py:class:`LazyFrames` object, which
+		  mimics one of the representations above and reads the frames on demand
+		* If only particle attributes were read from a file: **positions** is None
 
 	:ivar times: Vector of simulated times for the individual time frames.
 	:type times: numpy.ndarray
@@ -353,8 +565,8 @@ class Trajectory:
 		"""
 		Constructor: (for details about the shape of the parameters see the class docsting)
 
-		:param positions: Particle positions
-		:type positions: numpy.ndarray or list[numpy.ndarray]
+		:param positions: Particle positions, can be None if particle attributes are given
+		:type positions: numpy.ndarray or list[numpy.ndarray] or RaggedFrames
 		:param times: Times of the simulation time steps
 		:type times: numpy.ndarray with shape ``[n timesteps, 1]``
 		:param particle_attributes: Additional attributes for every particle for every time step, provided by a
@@ -368,16 +580,25 @@ class Trajectory:
 		:type file_version_id: int
 		"""
 
-		if type(positions) == np.ndarray:
-			self.is_static_trajectory = True
-			if len(positions.shape) != 3 or positions.shape[1] != 3:
-				raise ValueError('Static positions have wrong shape')
-			self.n_timesteps = positions.shape[2]
-		elif type(positions) == list:
-			self.is_static_trajectory = False
-			self.n_timesteps = len(positions)
+		if positions is None:
+			if particle_attributes is None:
+				raise ValueError('Particle attributes are required for a trajectory without positions')
+			if type(particle_attributes) != ParticleAttributes:
+				raise ValueError('Particle attributes argument has to be of type ParticleAttributes')
+			self.is_static_trajectory = particle_attributes.is_static
+			self.n_timesteps = particle_attributes.n_timesteps
 		else:
-			raise TypeError('Wrong type for positions, has to be an numpy.ndarray or a list of numpy.ndarrays')
+			static_positions = _is_static_frame_data(positions)
+			if static_positions is None:
+				raise TypeError('Wrong type for positions, has to be an numpy.ndarray or a list of numpy.ndarrays')
+
+			self.is_static_trajectory = static_positions
+			if self.is_static_trajectory:
+				if len(positions.shape) != 3 or positions.shape[1] != 3:
+					raise ValueError('Static positions have wrong shape')
+				self.n_timesteps = positions.shape[2]
+			else:
+				self.n_timesteps = len(positions)
 
 		if type(times) != np.ndarray:
 			raise TypeError('Wrong type for times, a numpy vector is expected')
@@ -410,7 +631,16 @@ class Trajectory:
 	def __len__(self):
 		return self.n_timesteps
 
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
 	def __getitem__(self, timestep_index):
+		if self.positions is None:
+			raise ValueError('Trajectory contains no particle positions')
+
 		if self.is_static_trajectory:
 			return self.positions[:, :, timestep_index]
 		else:
@@ -423,11 +653,12 @@ class Trajectory:
 		:return: Number of particles in the static trajectory
 		:rtype: int
 		"""
+		frame_data = self._particle_frame_data()
 		if self.is_static_trajectory:
-			return self.positions.shape[0]
+			return frame_data.shape[0]
 		else:
 			if timestep_index is not None:
-				return self.positions[timestep_index].shape[0]
+				return frame_data[timestep_index].shape[0]
 			else:
 				raise AttributeError("Time step independent number of ions is only defined for static trajectories")
 
@@ -465,53 +696,924 @@ class Trajectory:
 
 		return pos, attributes
 
+	def close(self):
+		"""
+		Closes the trajectory file of a lazily read trajectory (see :py:func:`read_hdf5_trajectory_file`).
+		Frames of a closed lazy trajectory can not be accessed anymore. This method has no effect if the
+		trajectory data is held in memory.
+		"""
+		frame_data = self._particle_frame_data()
+		if isinstance(frame_data, LazyFrames):
+			frame_data.frame_source.close()
+
+	def _particle_frame_data(self):
+		"""
+		Returns per particle frame data of the trajectory: The positions or, for a trajectory without positions,
+		the particle attribute data
+		"""
+		if self.positions is not None:
+			return self.positions
+		elif self.particle_attributes.attr_dat_float is not None:
+			return self.particle_attributes.attr_dat_float
+		else:
+			return self.particle_attributes.attr_dat_int
+
+
+# -------------- Lazy trajectory file access -------------- #
+
+
+def _decode_attribute_value(attribs, key):
+	"""
+	Decodes a string value from a hdf5 attribute, returns None if the attribute is not present
+	"""
+	if key not in attribs.keys():
+		return None
+
+	value = attribs[key]
+	return value.decode('UTF-8') if isinstance(value, bytes) else value
+
+
+def _decode_attribute_names(attribs, key):
+	"""
+	Decodes a list of names from a hdf5 attribute, returns None if the attribute is not present
+	"""
+	if key not in attribs.keys():
+		return None
+
+	return [name.decode('UTF-8') if isinstance(name, bytes) else name for name in attribs[key]]
+
+
+class _TrajectoryFileReader:
+	"""
+	Common base of the low level trajectory file readers
+	"""
+
+	def _select_attributes(self, attributes):
+		"""
+		Restricts the read particle attributes to a set of named attributes
+		"""
+		names_float = self.attribute_names_float if self.attribute_names_float else []
+		names_int = self.attribute_names_int if self.attribute_names_int else []
+
+		for name in attributes:
+			if name not in names_float and name not in names_int:
+				raise ValueError('Particle attribute ' + str(name) + ' is not present in the trajectory file')
+
+		selected_float = [name for name in attributes if name in names_float]
+		selected_int = [name for name in attributes if name in names_int]
+
+		self.float_columns = [names_float.index(name) for name in selected_float]
+		self.int_columns = [names_int.index(name) for name in selected_int]
+		self.attribute_names_float = selected_float if selected_float else None
+		self.attribute_names_int = selected_int if selected_int else None
+
+	def close(self):
+		self.hdf5file.close()
+
+
+class _Hdf5TrajectoryReader(_TrajectoryFileReader):
+	"""
+	Low level reader for version 2 and version 3 hdf5 trajectory files: Parses the trajectory metadata and reads
+	individual time step frames on request. The hdf5 file is kept open until :py:meth:`close` is called.
+	"""
+
+	def __init__(
+			self, trajectory_file_name, attributes=None, read_positions=True, particle_indices=None, where=None):
+		"""
+		Opens a trajectory file for reading
+
+		:param trajectory_file_name: Name of the file to open
+		:type trajectory_file_name: str
+		:param attributes: Names of the particle attributes to read, all attributes are read if None
+		:type attributes: list of str
+		:param read_positions: If false, the particle positions are not read
+		:type read_positions: bool
+		:param particle_indices: Indices of the particles to read in every frame, all particles are read if None
+		:type particle_indices: list of int or numpy.ndarray
+		:param where: Particle attribute name and value, only particles with this attribute value are read
+		:type where: tuple of str and value
+		"""
+		self.hdf5file = h5py.File(trajectory_file_name, 'r')
+		self.read_positions = read_positions
+		try:
+			tra_group = self.hdf5file['particle_trajectory']
+			attribs = tra_group.attrs
+
+			self.tra_group = tra_group
+			self.file_version_id = attribs['file version'][0]
+			self.n_timesteps = attribs['number of timesteps'][0]
+			self.times = np.array(tra_group['times'])
+
+			# packed files store every quantity in one dataset for all frames, the frames are addressed by offsets:
+			self.packed = _decode_attribute_value(attribs, 'layout') == 'packed'
+			if self.packed:
+				self.timesteps_group = None
+				self.frame_offsets = np.array(tra_group['frame offsets'], dtype=np.int64)
+			else:
+				self.timesteps_group = tra_group['timesteps']
+
+			if self.file_version_id == 2:
+				self.attribute_names_float = _decode_attribute_names(attribs, 'auxiliary parameter names')
+				self.attribute_names_int = None
+				self.float_dataset_name = 'aux_parameters'
+			else:
+				self.attribute_names_float = _decode_attribute_names(attribs, 'attributes names')
+				self.attribute_names_int = _decode_attribute_names(attribs, 'integer attributes names')
+				self.float_dataset_name = 'particle_attributes_float'
+			self.int_dataset_name = 'particle_attributes_integer'
+
+			self.particle_indices = None
+			if particle_indices is not None:
+				self.particle_indices = np.asarray(particle_indices, dtype=int)
+				if self.particle_indices.ndim != 1:
+					raise ValueError('Particle indices have to be a one dimensional sequence of indices')
+
+			self.where = None
+			if where is not None:
+				self._select_where(where)
+
+			self.float_columns = None
+			self.int_columns = None
+			if attributes is not None:
+				self._select_attributes(attributes)
+		except Exception:
+			self.hdf5file.close()
+			raise
+
+	def _select_where(self, where):
+		"""
+		Sets up the particle attribute predicate ``(attribute name, value)`` which selects the read particles
+		"""
+		attribute_name, value = where
+		if self.attribute_names_float and attribute_name in self.attribute_names_float:
+			self.where = (self.float_dataset_name, self.attribute_names_float.index(attribute_name), value)
+		elif self.attribute_names_int and attribute_name in self.attribute_names_int:
+			self.where = (self.int_dataset_name, self.attribute_names_int.index(attribute_name), value)
+		else:
+			raise ValueError('Particle attribute ' + str(attribute_name) + ' is not present in the trajectory file')
+
+	@staticmethod
+	def _read_columns(dataset, columns):
+		"""
+		Reads selected columns of a two dimensional dataset (or of a :py:class:`_PackedFrameDataset`), only the range
+		of the selected columns is read from the file
+		"""
+		if isinstance(dataset, _PackedFrameDataset):
+			h5_dataset, row_start, row_stop = dataset.dataset, dataset.start, dataset.stop
+		else:
+			h5_dataset, row_start, row_stop = dataset, 0, dataset.shape[0]
+
+		if columns is None or columns == list(range(dataset.shape[1])):
+			return _read_dataset_block(h5_dataset, row_start, row_stop, 0, dataset.shape[1])
+
+		unique_columns, inverse = np.unique(columns, return_inverse=True)
+		data = _read_dataset_block(h5_dataset, row_start, row_stop, unique_columns[0], unique_columns[-1] + 1)
+		return data[:, unique_columns - unique_columns[0]][:, inverse]
+
+	@classmethod
+	def _read_rows(cls, dataset, rows, columns):
+		"""
+		Reads selected rows and columns of a two dimensional dataset
+
+		:param rows: Row selection as tuple of the unique, ascending row indices and the order of the rows in the
+			result (None if the rows are read in ascending order). All rows are read if None.
+		"""
+		if rows is None:
+			return cls._read_columns(dataset, columns)
+
+		unique_rows, row_order = rows
+		if len(unique_rows) == 0:
+			n_columns = dataset.shape[1] if columns is None else len(columns)
+			return np.empty([0, n_columns], dtype=dataset.dtype)
+
+		# regular row selections are read as hyperslab, irregular ones as point selection:
+		steps = np.diff(unique_rows)
+		if len(unique_rows) == 1 or np.all(steps == steps[0]):
+			step = int(steps[0]) if len(unique_rows) > 1 else 1
+			data = dataset[int(unique_rows[0]):int(unique_rows[-1]) + 1:step]
+		else:
+			data = dataset[list(unique_rows)]
+
+		if columns is not None:
+			data = data[:, columns]
+		if row_order is not None:
+			data = data[row_order]
+		return _native_byte_order(data)
+
+	def _frame_group(self, timestep_index):
+		"""
+		Returns the datasets of a time step frame: The hdf5 group of the time step or, for packed files, a
+		:py:class:`_PackedFrame` with views on the frame rows of the packed datasets
+		"""
+		if self.packed:
+			return _PackedFrame(
+				self.tra_group, self.frame_offsets[timestep_index], self.frame_offsets[timestep_index + 1])
+		else:
+			return self.timesteps_group[str(timestep_index)]
+
+	def n_file_particles(self, timestep_index):
+		"""
+		Returns the number of particles stored in a time step frame of the file (from the file metadata only)
+		"""
+		if self.packed:
+			return int(self.frame_offsets[timestep_index + 1] - self.frame_offsets[timestep_index])
+
+		ts_group = self.timesteps_group[str(timestep_index)]
+		if 'positions' in ts_group.keys():
+			return ts_group['positions'].shape[0]
+		else:
+			return 0
+
+	def _selected_rows(self, ts_group, n_file_particles):
+		"""
+		Determines the rows of the particles selected by particle indices and the particle attribute predicate
+		in a time step frame. Returns None if all particles are selected.
+		"""
+		if self.particle_indices is None and self.where is None:
+			return None
+
+		if self.particle_indices is not None:
+			rows = self.particle_indices
+			if np.any(rows >= n_file_particles) or np.any(rows < -n_file_particles):
+				raise IndexError('Particle index out of range')
+			rows = np.where(rows < 0, rows + n_file_particles, rows)
+			unique_rows, row_order = np.unique(rows, return_inverse=True)
+		else:
+			unique_rows, row_order = np.arange(n_file_particles), None
+
+		if self.where is not None and n_file_particles > 0:
+			dataset_name, column, value = self.where
+			where_values = self._read_rows(ts_group[dataset_name], (unique_rows, None), [column])[:, 0]
+			if row_order is None:
+				unique_rows = unique_rows[where_values == value]
+			else:
+				selected = where_values[row_order] == value
+				rows = unique_rows[row_order[selected]]
+				unique_rows, row_order = np.unique(rows, return_inverse=True)
+
+		if row_order is not None and np.array_equal(row_order, np.arange(len(unique_rows))):
+			row_order = None
+
+		return unique_rows, row_order
+
+	def n_particles(self, timestep_index):
+		"""
+		Returns the number of selected particles in a time step frame (from the file metadata only, the number of
+		particles selected by a particle attribute predicate is not known without reading the frame)
+		"""
+		if self.particle_indices is not None:
+			return len(self.particle_indices)
+		else:
+			return self.n_file_particles(timestep_index)
+
+	def is_static(self, timestep_indices):
+		"""
+		Checks if the number of particles is constant in the selected frames (from the file metadata only). Frames
+		selected by a particle attribute predicate are not considered to be static.
+		"""
+		if self.where is not None:
+			return False
+		n_ion_per_frame = [self.n_particles(ts_i) for ts_i in timestep_indices]
+		return len(set(n_ion_per_frame)) <= 1
+
+	def read_frame(self, timestep_index):
+		"""
+		Reads a time step frame
+
+		:param timestep_index: Index of the time step to read
+		:type timestep_index: int
+		:return: Tuple of particle positions, float particle attributes and integer particle attributes,
+			components which are not present in the file or not read are None
+		"""
+		ts_group = self._frame_group(timestep_index)
+		n_ions = self.n_file_particles(timestep_index)
+		rows = self._selected_rows(ts_group, n_ions)
+		if rows is not None:
+			n_ions = len(rows[0]) if rows[1] is None else len(rows[1])
+
+		positions = None
+		if self.read_positions:
+			if n_ions > 0:
+				positions = self._read_rows(ts_group['positions'], rows, None)
+			else:
+				positions = np.empty([0, 3])  # maintain correct dimensionality even in empty array
+
+		attributes_float = None
+		if self.attribute_names_float:
+			if n_ions == 0:
+				attributes_float = np.empty([0, len(self.attribute_names_float)])
+			else:
+				attributes_float = self._read_rows(ts_group[self.float_dataset_name], rows, self.float_columns)
+
+		attributes_int = None
+		if self.attribute_names_int:
+			if n_ions == 0:
+				attributes_int = np.empty([0, len(self.attribute_names_int)], dtype=int)
+			else:
+				attributes_int = np.array(
+					self._read_rows(ts_group[self.int_dataset_name], rows, self.int_columns), dtype=int)
+
+		return positions, attributes_float, attributes_int
+
+	def read_packed_components(self, timestep_indices, n_workers=None):
+		"""
+		Reads the frame components of a set of time steps from a packed file at once: The rows of a contiguous
+		range of time steps are read from every packed dataset with a single read, directly into the preallocated
+		result arrays. Particle indices and particle attribute predicates are not considered.
+
+		:param timestep_indices: Indices of the time steps to read
+		:type timestep_indices: numpy.ndarray
+		:param n_workers: Number of worker threads which read blocks of time steps concurrently, the time steps are
+			read serially if None or 1
+		:type n_workers: int
+		:return: List of positions, float particle attributes and integer particle attributes as
+			:py:class:`RaggedFrames`, components which are not present in the file or not read are None
+		"""
+		timestep_indices = np.asarray(timestep_indices)
+		starts = self.frame_offsets[timestep_indices]
+		stops = self.frame_offsets[timestep_indices + 1]
+		offsets = np.concatenate(([0], np.cumsum(stops - starts)))
+
+		# the time steps are split into blocks (a few per worker for load balancing), every block is read as runs of
+		# contiguous time steps:
+		n_blocks = 1 if n_workers is None or n_workers <= 1 else min(len(timestep_indices), 4 * n_workers)
+		read_ranges = []
+		for block in np.array_split(np.arange(len(timestep_indices)), max(n_blocks, 1)):
+			run_starts = np.flatnonzero(np.diff(timestep_indices[block], prepend=-2) != 1)
+			run_stops = np.append(run_starts[1:], len(block))
+			read_ranges.append([
+				(starts[block[r_start]], stops[block[r_stop - 1]], offsets[block[r_start]])
+				for r_start, r_stop in zip(run_starts, run_stops)])
+
+		def read_component(dataset_name, columns, dtype=None):
+			dataset = self.tra_group[dataset_name]
+			n_columns = dataset.shape[1] if columns is None else len(columns)
+			if dtype is None:
+				dtype = dataset.dtype.newbyteorder('=')
+			data = np.empty([offsets[-1], n_columns], dtype=dtype)
+
+			def read_block(block_ranges):
+				for file_start, file_stop, data_start in block_ranges:
+					if file_stop > file_start:
+						data[data_start: data_start + file_stop - file_start] = self._read_columns(
+							_PackedFrameDataset(dataset, file_start, file_stop), columns)
+
+			if n_blocks <= 1:
+				for block_ranges in read_ranges:
+					read_block(block_ranges)
+			else:
+				with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+					list(executor.map(read_block, read_ranges))
+
+			return RaggedFrames(data, offsets)
+
+		positions = None
+		if self.read_positions:
+			positions = read_component('positions', None)
+
+		attributes_float = None
+		if self.attribute_names_float:
+			attributes_float = read_component(self.float_dataset_name, self.float_columns)
+
+		attributes_int = None
+		if self.attribute_names_int:
+			attributes_int = read_component(self.int_dataset_name, self.int_columns, dtype=int)
+
+		return [positions, attributes_float, attributes_int]
+
+	def read_start_splat_data(self):
+		"""
+		Reads the particle start / splat data, returns None if the file contains no start / splat data
+		"""
+		if 'start_splat' not in self.tra_group.keys():
+			return None
+
+		ss_grp = self.tra_group['start_splat']
+		start_pos = np.array(ss_grp['particle start locations'])
+		splat_pos = np.array(ss_grp['particle splat locations'])
+		start_times = np.array(ss_grp['particle start times'])
+		splat_times = np.array(ss_grp['particle splat times'])
+		p_states = np.array(ss_grp['particle splat state'], dtype=int)
+
+		return StartSplatTrackingData(start_times, start_pos, splat_times, splat_pos, p_states)
+
+
+def _native_byte_order(data):
+	"""
+	Converts frame data read from a trajectory file (which is often stored in big endian byte order) to the native
+	byte order, as the frames of eagerly read trajectories
+	"""
+	return np.asarray(data, dtype=data.dtype.newbyteorder('='))
+
+
+_raw_chunk_read_lock = threading.Lock()
+
+
+def _gzip_filter_pipeline(dataset):
+	"""
+	Returns the filter pipeline (list of hdf5 filter ids) of a chunked two dimensional dataset if its chunks can be
+	decoded without the hdf5 library (gzip compression, optionally with byte shuffling), None otherwise
+	"""
+	if dataset.chunks is None or dataset.compression != 'gzip' or len(dataset.shape) != 2:
+		return None
+
+	create_plist = dataset.id.get_create_plist()
+	filters = [create_plist.get_filter(i)[0] for i in range(create_plist.get_nfilters())]
+	if not set(filters) <= {h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE}:
+		return None
+	return filters
+
+
+def _read_decompressed_chunk(dataset, chunk_offset, filters):
+	"""
+	Reads a raw chunk of a gzip compressed dataset from the file and decodes it (see :py:func:`_read_dataset_block`)
+	"""
+	try:
+		# concurrent raw chunk reads are not serialized reliably by h5py (hdf5 errors and crashes were observed):
+		with _raw_chunk_read_lock:
+			filter_mask, chunk_data = dataset.id.read_direct_chunk(chunk_offset)
+	except RuntimeError:
+		if dataset.id.get_chunk_info_by_coord(chunk_offset).size != 0:
+			raise
+		return np.full(dataset.chunks, dataset.fillvalue, dtype=dataset.dtype)  # chunk was never written
+
+	# the filters are undone in reverse pipeline order, filters flagged in the filter mask were skipped for the chunk:
+	for i_filter in reversed(range(len(filters))):
+		if filter_mask & (1 << i_filter):
+			continue
+		if filters[i_filter] == h5py.h5z.FILTER_DEFLATE:
+			chunk_data = zlib.decompress(chunk_data)
+		else:
+			# the shuffle filter stores the bytes of the elements grouped by their position in the element:
+			chunk_data = np.frombuffer(chunk_data, dtype=np.uint8).reshape(dataset.dtype.itemsize, -1).T.tobytes()
+
+	return np.frombuffer(chunk_data, dtype=dataset.dtype).reshape(dataset.chunks)
+
+
+def _read_dataset_block(dataset, row_start, row_stop, col_start, col_stop):
+	"""
+	Reads a block of rows and columns of a two dimensional hdf5 dataset in native byte order.
+
+	h5py executes every call into the hdf5 library under a global lock, thus the hdf5 filters (e.g. the gzip
+	decompression) of multiple reading threads are never executed concurrently. The chunks of gzip compressed datasets
+	are therefore read raw from the file (under a lock) and decompressed with zlib, which releases the global
+	interpreter lock: Threads reading different frames only serialize on the raw chunk reads, the decompression runs
+	concurrently.
+	Datasets with other filters or storage layouts are read with h5py.
+	"""
+	native_dtype = dataset.dtype.newbyteorder('=')
+	row_start, row_stop, col_start, col_stop = int(row_start), int(row_stop), int(col_start), int(col_stop)
+	filters = _gzip_filter_pipeline(dataset)
+	if filters is None or row_stop <= row_start:
+		return np.asarray(dataset[row_start:row_stop, col_start:col_stop], dtype=native_dtype)
+
+	result = np.empty([row_stop - row_start, col_stop - col_start], dtype=native_dtype)
+	chunk_rows, chunk_cols = dataset.chunks
+	for chunk_row in range(row_start - row_start % chunk_rows, row_stop, chunk_rows):
+		r_lo, r_hi = max(row_start, chunk_row), min(row_stop, chunk_row + chunk_rows)
+		for chunk_col in range(col_start - col_start % chunk_cols, col_stop, chunk_cols):
+			c_lo, c_hi = max(col_start, chunk_col), min(col_stop, chunk_col + chunk_cols)
+			chunk = _read_decompressed_chunk(dataset, (chunk_row, chunk_col), filters)
+			result[r_lo - row_start: r_hi - row_start, c_lo - col_start: c_hi - col_start] = \
+				chunk[r_lo - chunk_row: r_hi - chunk_row, c_lo - chunk_col: c_hi - chunk_col]
+
+	return result
+
+
+class _PackedFrameDataset:
+	"""
+	View on the rows of a single time step frame in a packed dataset of a packed trajectory file. The view is
+	indexed like the dataset of a time step group (rows relative to the frame start), only the addressed rows are
+	read from the file.
+	"""
+
+	def __init__(self, dataset, start, stop):
+		self.dataset = dataset
+		self.start = int(start)
+		self.stop = int(stop)
+		self.shape = (self.stop - self.start,) + dataset.shape[1:]
+		self.dtype = dataset.dtype
+
+	def _file_rows(self, rows):
+		if isinstance(rows, slice):
+			start, stop, step = rows.indices(self.shape[0])
+			return slice(self.start + start, self.start + stop, step)
+		else:
+			return list(np.asarray(rows, dtype=np.int64) + self.start)
+
+	def __getitem__(self, key):
+		if isinstance(key, tuple):
+			return self.dataset[(self._file_rows(key[0]),) + key[1:]]
+		else:
+			return self.dataset[self._file_rows(key)]
+
+	def __array__(self, dtype=None):
+		data = self.dataset[self.start:self.stop]
+		return data if dtype is None else data.astype(dtype)
+
+
+class _PackedFrame:
+	"""
+	Time step frame of a packed trajectory file, mimics the hdf5 group of a time step
+	"""
+
+	def __init__(self, tra_group, start, stop):
+		self.tra_group = tra_group
+		self.start = start
+		self.stop = stop
+
+	def __getitem__(self, dataset_name):
+		return _PackedFrameDataset(self.tra_group[dataset_name], self.start, self.stop)
+
+
+class _LegacyHdf5TrajectoryReader(_TrajectoryFileReader):
+	"""
+	Low level reader for legacy hdf5 trajectory files, reads individual time step frames on request. The hdf5 file is
+	kept open until :py:meth:`close` is called.
+	"""
+
+	def __init__(self, trajectory_file_name, attributes=None, read_positions=True):
+		"""
+		Opens a legacy trajectory file for reading
+
+		:param trajectory_file_name: Name of the file to open
+		:type trajectory_file_name: str
+		:param attributes: Names of the particle attributes to read, all attributes are read if None
+		:type attributes: list of str
+		:param read_positions: If false, the particle positions are not read
+		:type read_positions: bool
+		"""
+		self.hdf5file = h5py.File(trajectory_file_name, 'r')
+		self.read_positions = read_positions
+		try:
+			self.tra_group = self.hdf5file['particle_trajectory']
+			self.file_version_id = 1
+			self.times = np.array(self.tra_group['times'])
+			self.n_timesteps = len(self.times)
+
+			self.attribute_names_float = None
+			if 'aux_parameters' in self.tra_group.keys():
+				self.attribute_names_float = _decode_attribute_names(
+					self.tra_group.attrs, 'auxiliary parameter names')
+			self.attribute_names_int = None
+
+			self.float_columns = None
+			self.int_columns = None
+			if attributes is not None:
+				self._select_attributes(attributes)
+		except Exception:
+			self.hdf5file.close()
+			raise
+
+	def read_frame(self, timestep_index):
+		"""
+		Reads a time step frame
+
+		:param timestep_index: Index of the time step to read
+		:type timestep_index: int
+		:return: Tuple of particle positions, float particle attributes and integer particle attributes,
+			components which are not present in the file or not read are None
+		"""
+		timestep_index = int(timestep_index)
+
+		positions = None
+		if self.read_positions:
+			positions = _native_byte_order(self.tra_group['positions'][:, :, timestep_index])
+
+		attributes_float = None
+		if self.attribute_names_float:
+			dataset = self.tra_group['aux_parameters']
+			if self.float_columns is None:
+				attributes_float = dataset[:, :, timestep_index]
+			else:
+				unique_columns, inverse = np.unique(self.float_columns, return_inverse=True)
+				attributes_float = dataset[:, list(unique_columns), timestep_index][:, inverse]
+			attributes_float = _native_byte_order(attributes_float)
+
+		return positions, attributes_float, None
+
+
+def _open_trajectory_file_reader(trajectory_file_name, attributes=None, read_positions=True):
+	"""
+	Opens a low level frame reader for a hdf5 trajectory file, the file format (legacy or version 2 / 3) is
+	detected from the file metadata
+	"""
+	with h5py.File(trajectory_file_name, 'r') as hdf5file:
+		is_legacy_file = 'file version' not in hdf5file['particle_trajectory'].attrs.keys()
+
+	if is_legacy_file:
+		return _LegacyHdf5TrajectoryReader(trajectory_file_name, attributes=attributes, read_positions=read_positions)
+	else:
+		return _Hdf5TrajectoryReader(trajectory_file_name, attributes=attributes, read_positions=read_positions)
+
+
+
+class LazyFrameSource:
+	"""
+	On demand frame source of a lazily read trajectory: Reads the individual time step frames (positions and particle
+	attributes) from an opened trajectory file and keeps the most recently used frames in a bounded least recently
+	used (LRU) cache.
+	"""
+
+	def __init__(self, reader, cache_size=64, timestep_indices=None):
+		"""
+		Constructs a new frame source
+
+		:param reader: Opened trajectory file reader which provides the frames
+		:param cache_size: Maximum number of frames kept in the frame cache
+		:type cache_size: int
+		:param timestep_indices: Indices of the time steps in the file which are provided by the frame source,
+			all time steps are provided if None
+		:type timestep_indices: numpy.ndarray
+		"""
+		if cache_size < 1:
+			raise ValueError('Frame cache size has to be at least one frame')
+
+		if timestep_indices is None:
+			timestep_indices = np.arange(reader.n_timesteps)
+
+		self.reader = reader
+		self.cache_size = cache_size
+		self.timestep_indices = timestep_indices
+		self.n_timesteps = len(timestep_indices)
+		self._cache = collections.OrderedDict()
+
+	def n_particles(self, timestep_index):
+		"""
+		Returns the number of particles in a time step frame without reading the frame data
+		"""
+		return self.reader.n_particles(self.timestep_indices[self._checked_index(timestep_index)])
+
+	def get_frame(self, timestep_index):
+		"""
+		Returns a frame from the frame cache or reads the frame from the trajectory file
+
+		:param timestep_index: Index of the time step
+		:type timestep_index: int
+		:return: Tuple of particle positions, float particle attributes and integer particle attributes
+		"""
+		timestep_index = self._checked_index(timestep_index)
+		if not self.reader.hdf5file:
+			raise ValueError('Frame access on closed trajectory file')
+
+		if timestep_index in self._cache:
+			self._cache.move_to_end(timestep_index)
+			return self._cache[timestep_index]
+
+		frame = self.reader.read_frame(self.timestep_indices[timestep_index])
+		self._cache[timestep_index] = frame
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+
+		return frame
+
+	def close(self):
+		"""
+		Clears the frame cache and closes the underlying trajectory file
+		"""
+		self._cache.clear()
+		self.reader.close()
+
+	def _checked_index(self, timestep_index):
+		timestep_index = int(timestep_index)
+		if timestep_index < 0:
+			timestep_index += self.n_timesteps
+		if timestep_index < 0 or timestep_index >= self.n_timesteps:
+			raise IndexError('Time step index out of range')
+		return timestep_index
+
+
+class LazyFrames:
+	"""
+	Lazily evaluated frame data (positions or particle attributes) of a trajectory. The frames are read on demand
+	from a :py:class:`LazyFrameSource`.
+
+	Lazy frames mimic the in memory representation of frame data:
+
+	* Static lazy frames can be indexed like a static ``numpy.ndarray`` with the shape ``[n particles,
+	  n columns, n time steps]``. Only the frames addressed by the time step index are read. Static lazy frames can be
+	  converted to a full ``numpy.ndarray`` with ``numpy.asarray``.
+	* Variable lazy frames behave like a ``list`` of ``numpy.ndarray`` with the shape ``[n particles, n columns]``,
+	  one per time step.
+	"""
+
+	def __init__(self, frame_source, component, n_columns, is_static):
+		"""
+		Constructs new lazy frame data
+
+		:param frame_source: The frame source providing the frames
+		:type frame_source: LazyFrameSource
+		:param component: Index of the frame component (0: positions, 1: float attributes, 2: integer attributes)
+		:type component: int
+		:param n_columns: Number of data columns in the frames
+		:type n_columns: int
+		:param is_static: Flag if the frame data is static
+		:type is_static: bool
+		"""
+		self.frame_source = frame_source
+		self.component = component
+		self.n_columns = n_columns
+		self.is_static = is_static
+		self.n_timesteps = frame_source.n_timesteps
+
+		if is_static:
+			n_particles = frame_source.n_particles(0) if self.n_timesteps > 0 else 0
+			self.shape = (n_particles, n_columns, self.n_timesteps)
+			self.ndim = 3
+
+	def frame(self, timestep_index):
+		"""
+		Returns the data of a single time step frame with the shape ``[n particles, n columns]``
+
+		:param timestep_index: Index of the time step
+		:type timestep_index: int
+		:rtype: numpy.ndarray
+		"""
+		return self.frame_source.get_frame(timestep_index)[self.component]
+
+	def __len__(self):
+		if self.is_static:
+			return self.shape[0]
+		else:
+			return self.n_timesteps
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+	def __getitem__(self, key):
+		if not self.is_static:
+			if isinstance(key, slice):
+				return [self.frame(i) for i in range(self.n_timesteps)[key]]
+			return self.frame(key)
+
+		if not isinstance(key, tuple):
+			key = (key,)
+		if len(key) > 3:
+			raise IndexError('Too many indices for static lazy frames')
+		particle_key, column_key, timestep_key = key + (slice(None),) * (3 - len(key))
+
+		if np.isscalar(timestep_key):
+			return self.frame(timestep_key)[particle_key, column_key]
+
+		timestep_indices = np.arange(self.n_timesteps)[timestep_key]
+		if timestep_indices.ndim != 1:
+			raise IndexError('Only one dimensional time step selections are supported for static lazy frames')
+
+		# numpy moves the time step dimension to the front if the particle and the time step index are
+		# both advanced indices (e.g. an integer and an index array), which is reproduced here:
+		if np.isscalar(particle_key) and not isinstance(timestep_key, slice):
+			stack_axis = 0
+		elif not isinstance(particle_key, slice) and not isinstance(timestep_key, slice):
+			raise IndexError('Combined array indexing of particles and time steps is not supported for static lazy frames')
+		else:
+			stack_axis = -1
+
+		frames = [self.frame(i)[particle_key, column_key] for i in timestep_indices]
+		if len(frames) == 0:
+			return np.empty(np.shape(np.zeros(self.shape[:2])[particle_key, column_key]) + (0,))
+		return np.stack(frames, axis=stack_axis)
+
+	def __array__(self, dtype=None, copy=None):
+		if not self.is_static:
+			raise TypeError('Variable lazy frames can not be converted to a single numpy.ndarray')
+
+		result = np.dstack([self.frame(i) for i in range(self.n_timesteps)])
+		if dtype is not None:
+			result = result.astype(dtype)
+		return result
+
 
 # -------------- Trajectory input -------------- #
 
 
-def read_json_trajectory_file(trajectory_filename):
+class _JsonStreamParser:
+	"""
+	Minimal incremental parser for large json documents: Reads the document in chunks from a text stream and decodes
+	individual json values with the standard library json decoder, so that only the currently decoded value has to
+	be held in memory.
+	"""
+
+	def __init__(self, text_stream, chunk_size=1 << 20):
+		self.stream = text_stream
+		self.chunk_size = chunk_size
+		self.buffer = ''
+		self.pos = 0
+		self.eof = False
+		self.decoder = json.JSONDecoder()
+
+	def _read_chunk(self, size):
+		"""
+		Appends the next chunk of the stream to the buffer, already consumed text is discarded
+		"""
+		chunk = self.stream.read(size)
+		if not chunk:
+			self.eof = True
+		self.buffer = self.buffer[self.pos:] + chunk
+		self.pos = 0
+
+	def peek(self):
+		"""
+		Returns the next non whitespace character without consuming it (an empty string at the end of the document)
+		"""
+		while True:
+			while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+				self.pos += 1
+			if self.pos < len(self.buffer) or self.eof:
+				return self.buffer[self.pos:self.pos + 1]
+			self._read_chunk(self.chunk_size)
+
+	def expect(self, characters):
+		"""
+		Consumes the next non whitespace character, which has to be one of the expected characters
+		"""
+		char = self.peek()
+		if char == '' or char not in characters:
+			raise ValueError('Malformed json document: Expected one of "' + characters + '", found "' + char + '"')
+		self.pos += 1
+		return char
+
+	def decode_value(self):
+		"""
+		Decodes and consumes the next json value
+		"""
+		self.peek()
+		read_size = self.chunk_size
+		while True:
+			try:
+				value, end = self.decoder.raw_decode(self.buffer, self.pos)
+				# a value at the end of the buffer could be truncated (e.g. a number), it is only accepted if the
+				# document continues after the value:
+				if end < len(self.buffer) or self.eof:
+					self.pos = end
+					return value
+			except json.JSONDecodeError:
+				if self.eof:
+					raise
+			self._read_chunk(read_size)
+			read_size *= 2
+
+
+def _streaming_slice_selector(timestep_slice):
+	"""
+	Returns a function which decides while streaming if the time step with a given index is part of a time step
+	slice, and a flag if the slice can be decided while streaming. Slices with negative start, stop or step can not be
+	decided while streaming, all time steps are selected by the function and the slice has to be applied afterwards
+	in this case.
 	"""
-	Reads a json trajectory file and returns a trajectory object
+	start, stop, step = 0, None, 1
+	streamable = True
+	if timestep_slice is not None:
+		if not isinstance(timestep_slice, slice):
+			raise TypeError('Time step slice has to be a slice object')
+		start = 0 if timestep_slice.start is None else timestep_slice.start
+		stop = timestep_slice.stop
+		step = 1 if timestep_slice.step is None else timestep_slice.step
+		if start < 0 or (stop is not None and stop < 0) or step <= 0:
+			start, stop, step = 0, None, 1
+			streamable = False
+
+	def is_selected(timestep_index):
+		if timestep_index < start or (stop is not None and timestep_index >= stop):
+			return False
+		return (timestep_index - start) % step == 0
+
+	return is_selected, streamable
+
+
+def read_json_trajectory_file(trajectory_filename, timestep_slice=None, time_range=None):
+	"""
+	Reads a json trajectory file and returns a trajectory object.
+
+	The ``steps`` of the json document are parsed incrementally, step by step, and written directly into
+	preallocated arrays. Therefore, the memory required for parsing is bounded by the size of a single time step.
 
 	:param trajectory_filename: File name of the file to read
 	:type trajectory_filename: str
+	:param timestep_slice: Slice of the time steps to read, e.g. ``slice(0, 100, 10)`` for every 10th of the first
+		100 time steps. If a time range is also given, the slice is applied to the time steps within the time range.
+	:type timestep_slice: slice
+	:param time_range: Range of simulated times ``(t_start, t_stop)``, only time steps with times within the
+		range (including the range limits) are read
+	:type time_range: tuple of two floats
 	:return: Trajectory object with trajectory data
 	:rtype: Trajectory
 	"""
 	if trajectory_filename[-8:] == ".json.gz":
 		with gzip.open(trajectory_filename) as tf:
-			tj = json.load(io.TextIOWrapper(tf))
+			step_data, tj = _parse_json_trajectory(io.TextIOWrapper(tf), timestep_slice, time_range)
 	else:
 		with open(trajectory_filename) as tf:
-			tj = json.load(tf)
-
-	steps = tj["steps"]
-	n_timesteps = len(steps)
-	nIons = len(steps[0]["ions"])
-
-	times = np.zeros(len(steps))
-	positions = np.zeros([nIons, 3, len(steps)])
+			step_data, tj = _parse_json_trajectory(tf, timestep_slice, time_range)
 
-	n_additional_parameters = len(steps[0]["ions"][0]) - 1
-	additional_parameters = np.zeros([nIons, n_additional_parameters, n_timesteps])
+	times, positions, additional_parameters = step_data
+	n_ions = positions.shape[0]
+	n_additional_parameters = additional_parameters.shape[1]
 	additional_parameters_names = ['attribute '+str(i+1) for i in range(n_additional_parameters)]
 
-	for i in range(n_timesteps):
-		for j in range(nIons):
-			positions[j, :, i] = np.array(steps[i]["ions"][j][0])
-			additional_parameters[j, :, i] = np.array(steps[i]["ions"][j][1:])
-
-		times[i] = float(steps[i]["time"])
-
-	masses = np.zeros([nIons])
-	masses_json = tj["ionMasses"]
-	for i in range(len(masses_json)):
-		masses[i] = float(masses_json[i])
-
-	splat_times = np.zeros([nIons])
-	splat_times_json = tj["splatTimes"]
-	for i in range(len(splat_times_json)):
-		splat_times[i] = float(splat_times_json[i])
+	masses = np.zeros([n_ions])
+	masses_json = np.array(tj["ionMasses"], dtype=float)
+	masses[:len(masses_json)] = masses_json
 
 	optional_attributes = {OptionalAttribute.PARTICLE_MASSES: masses}
 
@@ -524,215 +1626,861 @@ def read_json_trajectory_file(trajectory_filename):
 	return result
 
 
-def _read_hdf5_v2_trajectory(tra_group):
-	attribs = tra_group.attrs
-	file_version_id = attribs['file version'][0]
+def _parse_json_trajectory(text_stream, timestep_slice, time_range):
+	"""
+	Parses a json trajectory document from a text stream. The time steps are parsed one after another and the
+	selected time steps are written into preallocated time step arrays, which grow by doubling if required.
+
+	:return: Tuple of the time step data (times, positions and additional parameters of the selected time steps) and a
+		dictionary with the other top level values of the json document
+	"""
+	if time_range is not None and len(time_range) != 2:
+		raise ValueError('Time range has to be given as (t_start, t_stop)')
+	is_selected, streamable = _streaming_slice_selector(timestep_slice)
+
+	parser = _JsonStreamParser(text_stream)
+	document = {}
+	times, positions, additional_parameters = None, None, None
+	n_selected = 0
+	n_in_range = 0
+
+	def parse_step():
+		nonlocal times, positions, additional_parameters, n_selected, n_in_range
+
+		step = parser.decode_value()
+		time = float(step["time"])
+		ions = step["ions"]
+		if positions is None:
+			# the buffers are allocated with the first step, which determines the number of ions and parameters:
+			times = np.zeros([16])
+			positions = np.zeros([len(ions), 3, 16])
+			additional_parameters = np.zeros([len(ions), len(ions[0]) - 1, 16])
+
+		if time_range is not None and not (time_range[0] <= time <= time_range[1]):
+			return
+		n_in_range += 1
+		if not is_selected(n_in_range - 1):
+			return
+
+		if n_selected == len(times):
+			times = np.concatenate((times, np.zeros(times.shape)))
+			positions = np.dstack((positions, np.zeros(positions.shape)))
+			additional_parameters = np.dstack((additional_parameters, np.zeros(additional_parameters.shape)))
+
+		times[n_selected] = time
+		positions[:, :, n_selected] = [ion[0] for ion in ions]
+		additional_parameters[:, :, n_selected] = [ion[1:] for ion in ions]
+		n_selected += 1
+
+	parser.expect('{')
+	while parser.peek() != '}':
+		key = parser.decode_value()
+		parser.expect(':')
+		if key == 'steps':
+			parser.expect('[')
+			while parser.peek() != ']':
+				parse_step()
+				if parser.peek() == ',':
+					parser.expect(',')
+			parser.expect(']')
+		else:
+			document[key] = parser.decode_value()
+
+		if parser.peek() == ',':
+			parser.expect(',')
+	parser.expect('}')
+
+	if positions is None:
+		raise ValueError('Json trajectory contains no time steps')
+
+	times = times[:n_selected].copy()
+	positions = positions[:, :, :n_selected].copy()
+	additional_parameters = additional_parameters[:, :, :n_selected].copy()
+
+	if not streamable:
+		times = times[timestep_slice]
+		positions = positions[:, :, timestep_slice]
+		additional_parameters = additional_parameters[:, :, timestep_slice]
+
+	return (times, positions, additional_parameters), document
+
+
+def read_hdf5_trajectory_file(
+		trajectory_file_name, lazy=False, cache_size=64, timestep_slice=None, time_range=None,
+		attributes=None, positions=True, particle_indices=None, where=None, n_workers=None):
+	"""
+	Reads a version 2 or 3 hdf5 trajectory file (which allows also exported simulation frames
+	with variable number of particles.
+
+	If ``lazy`` is set, the trajectory data is not read into memory: The hdf5 file is kept open and the frames of the
+	trajectory are read on demand when they are accessed (e.g. by indexing the trajectory or with
+	:py:meth:`Trajectory.get_positions`). The most recently accessed frames are kept in a bounded cache. This allows
+	the analysis of trajectory files which are larger than the available memory. The file of a lazy trajectory is
+	closed with :py:meth:`Trajectory.close` or by using the trajectory as context manager.
+
+	:param trajectory_file_name: Name of the file to read
+	:type trajectory_file_name: str
+	:param lazy: If true, the trajectory frames are read on demand from the opened file
+	:type lazy: bool
+	:param cache_size: Maximum number of frames in the frame cache of a lazy trajectory
+	:type cache_size: int
+	:param timestep_slice: Slice of the time steps to read, e.g. ``slice(0, 100, 10)`` for every 10th of the first
+		100 time steps. If a time range is also given, the slice is applied to the time steps within the time range.
+	:type timestep_slice: slice
+	:param time_range: Range of simulated times ``(t_start, t_stop)``, only time steps with times within the
+		range (including the range limits) are read
+	:type time_range: tuple of two floats
+	:param attributes: Names of the particle attributes to read. Only the data columns of the named attributes are
+		read from the file. All particle attributes are read if None.
+	:type attributes: list of str
+	:param positions: If false, the particle positions are not read and the resulting trajectory contains only
+		particle attributes (see :py:class:`Trajectory`)
+	:type positions: bool
+	:param particle_indices: Indices of the particles to read, only the data of the selected particles is read from
+		the file. Particle indices can only be used with static trajectories.
+	:type particle_indices: list of int or numpy.ndarray
+	:param where: Particle attribute predicate ``(attribute name, value)``, e.g. ``('chemical id', 3)``. The
+		predicate is evaluated frame by frame during reading and only particles with the given attribute value are
+		read. A lazy trajectory read with a predicate is always a non static trajectory.
+	:type where: tuple of str and value
+	:param n_workers: Number of worker threads which read and decompress the trajectory frames concurrently.
+		Every worker reads contiguous blocks of time steps with its own file handle, the frames are written directly
+		into the resulting trajectory. The raw chunks of gzip compressed frames are decompressed by the workers
+		outside of the hdf5 library, since h5py serializes all hdf5 library calls. The frames are read serially if
+		None or 1. Parallel reading can not be combined with lazy reading.
+	:type n_workers: int
+	:return: Trajectory object with trajectory data
+	:rtype: Trajectory
+	"""
+	if lazy and n_workers is not None and n_workers > 1:
+		raise ValueError('Parallel reading with multiple workers is not possible for lazy trajectories')
+
+	reader_options = {
+		'attributes': attributes, 'read_positions': positions,
+		'particle_indices': particle_indices, 'where': where}
+	reader = _Hdf5TrajectoryReader(trajectory_file_name, **reader_options)
+
+	try:
+		timestep_indices = _select_timesteps(reader.times, timestep_slice, time_range)
+		if particle_indices is not None and \
+				len(set([reader.n_file_particles(ts_i) for ts_i in timestep_indices])) > 1:
+			raise ValueError('Particle indices can only be used with static trajectories')
+	except Exception:
+		reader.close()
+		raise
+
+	if lazy:
+		return _lazy_trajectory(reader, timestep_indices, cache_size)
+
+	times = reader.times[timestep_indices]
+	try:
+		# the particle numbers of the frames are known from the file metadata: static trajectories are assembled
+		# directly in preallocated arrays, without keeping the individual frames
+		static_n_particles = None
+		if reader.where is None and len(timestep_indices) > 0 and reader.is_static(timestep_indices):
+			static_n_particles = reader.n_particles(timestep_indices[0])
+		start_splat_data = reader.read_start_splat_data()
+
+		# packed files are read with a few large reads of the packed datasets instead of frame by frame:
+		if reader.packed and reader.particle_indices is None and reader.where is None and \
+				len(timestep_indices) > 0:
+			components = reader.read_packed_components(timestep_indices, n_workers)
+			if static_n_particles is not None:
+				components = [
+					None if component is None else _ragged_to_static(component, static_n_particles)
+					for component in components]
+			return _assemble_trajectory(
+				components[0], times, reader.attribute_names_float, components[1],
+				reader.attribute_names_int, components[2], start_splat_data, reader.file_version_id)
+
+		if n_workers is None or n_workers <= 1:
+			frames = (reader.read_frame(ts_i) for ts_i in timestep_indices)
+			return _trajectory_from_frames(
+				frames, times, reader.attribute_names_float, reader.attribute_names_int,
+				start_splat_data, reader.file_version_id, static_n_particles)
+	finally:
+		# the file is also closed before the worker threads are started, the workers use their own file handles
+		reader.close()
+
+	frames = _read_frames_parallel(trajectory_file_name, reader_options, timestep_indices, n_workers)
+	return _trajectory_from_frames(
+		frames, times, reader.attribute_names_float, reader.attribute_names_int,
+		start_splat_data, reader.file_version_id, static_n_particles)
+
+
+def _read_frames_worker(trajectory_file_name, reader_options, timestep_indices):
+	"""
+	Reads a block of time step frames from a trajectory file in a worker thread
+	"""
+	reader = _Hdf5TrajectoryReader(trajectory_file_name, **reader_options)
+	try:
+		return [reader.read_frame(ts_i) for ts_i in timestep_indices]
+	finally:
+		reader.close()
+
+
+def _read_frames_parallel(trajectory_file_name, reader_options, timestep_indices, n_workers):
+	"""
+	Reads time step frames from a trajectory file with a pool of worker threads. The time steps are split into
+	contiguous blocks (a few blocks per worker for load balancing), the frames are returned in time step order.
+	The number of read blocks which are not yet consumed is limited, to bound the memory for read frames.
+
+	:param trajectory_file_name: Name of the file to read
+	:type trajectory_file_name: str
+	:param reader_options: Keyword arguments for the trajectory readers of the workers
+	:type reader_options: dict
+	:param timestep_indices: Indices of the time steps to read
+	:type timestep_indices: numpy.ndarray
+	:param n_workers: Number of worker threads
+	:type n_workers: int
+	:return: Generator yielding the frames
+	"""
+	n_blocks = min(len(timestep_indices), 8 * n_workers)
+	if n_blocks == 0:
+		return
+	blocks = np.array_split(timestep_indices, n_blocks)
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+		pending = collections.deque()
+		for block in blocks:
+			pending.append(executor.submit(_read_frames_worker, trajectory_file_name, reader_options, block))
+			if len(pending) >= 2 * n_workers:
+				yield from pending.popleft().result()
+
+		while pending:
+			yield from pending.popleft().result()
+
 
-	n_timesteps = attribs['number of timesteps'][0]
+def _select_timesteps(times, timestep_slice=None, time_range=None):
+	"""
+	Determines the indices of the time steps selected by a time range and / or a time step slice
+
+	:param times: Vector of the times of all time steps
+	:type times: numpy.ndarray
+	:param timestep_slice: Slice of the time steps to select (applied after the time range selection)
+	:type timestep_slice: slice
+	:param time_range: Range of simulated times ``(t_start, t_stop)`` to select
+	:type time_range: tuple of two floats
+	:return: Vector of the selected time step indices
+	:rtype: numpy.ndarray
+	"""
+	timestep_indices = np.arange(len(times))
+
+	if time_range is not None:
+		if len(time_range) != 2:
+			raise ValueError('Time range has to be given as (t_start, t_stop)')
+		in_range = (times >= time_range[0]) & (times <= time_range[1])
+		timestep_indices = timestep_indices[in_range]
 
-	timesteps_group = tra_group['timesteps']
-	times = tra_group['times']
+	if timestep_slice is not None:
+		if not isinstance(timestep_slice, slice):
+			raise TypeError('Time step slice has to be a slice object')
+		timestep_indices = timestep_indices[timestep_slice]
 
-	particle_attributes_names = None
-	if 'auxiliary parameter names' in attribs.keys():
-		particle_attributes_names = [
-			name.decode('UTF-8') if isinstance(name, bytes) else name for name in
-			attribs['auxiliary parameter names']
-		]
+	return timestep_indices
 
-	positions = []
-	particle_attributes = []
 
-	n_ion_per_frame = []
-	for ts_i in range(n_timesteps):
-		ts_group = timesteps_group[str(ts_i)]
+def _read_timestep_hyperslab(dataset, timestep_indices):
+	"""
+	Reads selected time steps from a dataset with the time steps in the last dimension. Regular time step
+	selections are read as hyperslab, only the selected time steps are read from the file.
+
+	:param dataset: The hdf5 dataset to read from
+	:type dataset: h5py.Dataset
+	:param timestep_indices: Vector of time step indices to read
+	:type timestep_indices: numpy.ndarray
+	:return: Array with the selected time steps
+	:rtype: numpy.ndarray
+	"""
+	n_selected = len(timestep_indices)
+	if n_selected == 0:
+		return np.array(dataset[..., 0:0])
+
+	steps = np.diff(timestep_indices)
+	if n_selected == 1 or (steps[0] > 0 and np.all(steps == steps[0])):
+		step = steps[0] if n_selected > 1 else 1
+		return dataset[..., timestep_indices[0]:timestep_indices[-1] + 1:step]
 
-		ion_positions = np.array(ts_group['positions'])
+	# irregular selection: hdf5 point selections have to be in increasing order
+	unique_indices, inverse = np.unique(timestep_indices, return_inverse=True)
+	return dataset[..., list(unique_indices)][..., inverse]
 
-		n_ion_per_frame.append(np.shape(ion_positions)[0])
-		positions.append(ion_positions)
 
-		if particle_attributes_names:
-			particle_attributes.append(np.array(ts_group['aux_parameters']))
+def _trajectory_from_frames(
+		frames, times, attribute_names_float, attribute_names_int, start_splat_data, file_version_id,
+		static_n_particles=None):
+	"""
+	Assembles a trajectory from individually read frames
 
+	:param frames: Iterable of frames, every frame is a tuple of (positions, float attributes, integer attributes)
+	:param static_n_particles: Number of particles, if the frames are known to be static. The frames are then
+		written directly into preallocated static arrays. If None, the frames are collected first and it is
+		determined from the frames if the trajectory is static.
+	:type static_n_particles: int
+	:return: Trajectory object with trajectory data
+	:rtype: Trajectory
+	"""
+	if static_n_particles is not None and len(times) > 0:
+		positions, p_attr_final_float, p_attr_final_int = _fill_static_frame_components(
+			frames, static_n_particles, len(times))
+		return _assemble_trajectory(
+			positions, times, attribute_names_float, p_attr_final_float, attribute_names_int, p_attr_final_int,
+			start_splat_data, file_version_id)
+
+	frames = list(frames)
+
+	# the particle number of the frames is determined from the first present frame component:
+	n_ion_per_frame = [
+		np.shape([component for component in frame if component is not None][0])[0] for frame in frames]
 	unique_n_ions = len(set(n_ion_per_frame))
 
 	# if more than one number of ions are present in the frames, the trajectory is not static
 	# and has variable frames
 	# if the trajectory is static, transform the trajectory to the old format returned by
 	# legacy hdf5 and json files to allow compatibility with the visualization methods
-	if unique_n_ions > 1:
-		static_trajectory = False
-	else:
-		static_trajectory = True
-		positions = np.dstack(positions)
+	static_trajectory = unique_n_ions <= 1
+
+	positions = None
+	if len(frames) == 0 or frames[0][0] is not None:
+		positions = _stack_frame_component(frames, 0, 3, static_trajectory)
 
-	particle_attributes_dat = None
-	if particle_attributes_names:
-		particle_attributes_dat = particle_attributes
-		if static_trajectory:
-			particle_attributes_dat = np.dstack(np.array(particle_attributes_dat))
+	p_attr_final_float = None
+	if attribute_names_float:
+		p_attr_final_float = _stack_frame_component(frames, 1, len(attribute_names_float), static_trajectory)
+
+	p_attr_final_int = None
+	if attribute_names_int:
+		p_attr_final_int = _stack_frame_component(
+			frames, 2, len(attribute_names_int), static_trajectory, dtype=int)
+
+	return _assemble_trajectory(
+		positions, times, attribute_names_float, p_attr_final_float, attribute_names_int, p_attr_final_int,
+		start_splat_data, file_version_id)
+
+
+def _fill_static_frame_components(frames, n_particles, n_timesteps):
+	"""
+	Writes the components (positions, float and integer attributes) of static frames into preallocated
+	``[n particles, n columns, n time steps]`` arrays. The arrays are allocated with the shape and data type of the
+	components of the first frame (in native byte order), components which are None are not allocated.
+
+	:return: List of the three component arrays (or None for components which are not present)
+	"""
+	components = [None, None, None]
+	for ts_i, frame in enumerate(frames):
+		for c_i, frame_component in enumerate(frame):
+			if frame_component is None:
+				continue
+			if components[c_i] is None:
+				components[c_i] = np.empty(
+					[n_particles, np.shape(frame_component)[1], n_timesteps],
+					dtype=frame_component.dtype.newbyteorder('='))
+			components[c_i][:, :, ts_i] = frame_component
+
+	return components
+
+
+def _assemble_trajectory(
+		positions, times, attribute_names_float, p_attr_final_float, attribute_names_int, p_attr_final_int,
+		start_splat_data, file_version_id):
+	"""
+	Constructs a trajectory object from assembled frame data
+	"""
+	p_attribs = None
+	if attribute_names_float or attribute_names_int:
+		p_attribs = ParticleAttributes(
+			attribute_names_float, p_attr_final_float,
+			attribute_names_int, p_attr_final_int)
 
 	result = Trajectory(
 		positions=positions,
-		times=np.array(times),
-		particle_attributes=ParticleAttributes(particle_attributes_names, particle_attributes_dat),
+		times=times,
+		particle_attributes=p_attribs,
+		start_splat_data=start_splat_data,
 		file_version_id=file_version_id)
 
 	return result
 
 
-def read_hdf5_trajectory_file(trajectory_file_name):
+def _ragged_to_static(ragged_frames, n_particles):
 	"""
-    Reads a version 2 or 3 hdf5 trajectory file (which allows also exported simulation frames
-    with variable number of particles.
-
-    :param trajectory_file_name: Name of the file to read
-    :type trajectory_file_name: str
-    :return: Trajectory object with trajectory data
-    :rtype: Trajectory
-    """
-	with h5py.File(trajectory_file_name, 'r') as hdf5file:
-		tra_group = hdf5file['particle_trajectory']
-		attribs = tra_group.attrs
-		file_version_id = attribs['file version'][0]
-
-		if file_version_id == 2:
-			return _read_hdf5_v2_trajectory(tra_group)
+	Transforms ragged frames with a constant number of particles per frame to a static
+	``[n particles, n columns, n time steps]`` array
+	"""
+	n_timesteps = len(ragged_frames)
+	n_columns = ragged_frames.data.shape[1]
+	static_data = ragged_frames.data.reshape(n_timesteps, n_particles, n_columns).transpose(1, 2, 0)
+	return np.ascontiguousarray(static_data)
 
-		n_timesteps = attribs['number of timesteps'][0]
 
-		timesteps_group = tra_group['timesteps']
-		times = tra_group['times']
+def _stack_frame_component(frames, component, n_columns, static, dtype=None):
+	"""
+	Collects a component (positions, float or integer attributes) of individually read frames and stacks it
+	to a static ``[n particles, n columns, n time steps]`` array if the frames are static
 
-		particle_attributes_names_float = None
-		if 'attributes names' in attribs.keys():
-			particle_attributes_names_float = [
-				name.decode('UTF-8') if isinstance(name, bytes) else name for name in attribs['attributes names']
-			]
+	:return: numpy.ndarray for static frames, :py:class:`RaggedFrames` for variable frames
+	"""
+	component_frames = [frame[component] for frame in frames]
+	if not static:
+		return RaggedFrames.from_frames(component_frames, n_columns)
+	elif len(component_frames) == 0:
+		return np.empty([0, n_columns, 0], dtype=dtype)
+	else:
+		return np.dstack(np.array(component_frames, dtype=dtype))
 
-		particle_attributes_names_int = None
-		if 'integer attributes names' in attribs.keys():
-			particle_attributes_names_int = [
-				name.decode('UTF-8') if isinstance(name, bytes) else name for name in
-				attribs['integer attributes names']
-			]
 
-		positions = []
-		particle_attributes_float = []
-		particle_attributes_int = []
+def _lazy_trajectory(reader, timestep_indices, cache_size):
+	"""
+	Constructs a lazy trajectory with on demand frame access from an opened trajectory reader
+
+	:param reader: Opened trajectory file reader
+	:type reader: _Hdf5TrajectoryReader
+	:param timestep_indices: Indices of the time steps in the file which are part of the trajectory
+	:type timestep_indices: numpy.ndarray
+	:param cache_size: Maximum number of cached frames
+	:type cache_size: int
+	:return: Lazy trajectory object
+	:rtype: Trajectory
+	"""
+	try:
+		static_trajectory = reader.is_static(timestep_indices)
+		frame_source = LazyFrameSource(reader, cache_size, timestep_indices)
 
-		n_ion_per_frame = []
+		attr_float = None
+		if reader.attribute_names_float:
+			attr_float = LazyFrames(frame_source, 1, len(reader.attribute_names_float), static_trajectory)
 
-		for ts_i in range(n_timesteps):
-			ts_group = timesteps_group[str(ts_i)]
+		attr_int = None
+		if reader.attribute_names_int:
+			attr_int = LazyFrames(frame_source, 2, len(reader.attribute_names_int), static_trajectory)
 
-			if 'positions' in ts_group.keys():
-				ion_positions = np.array(ts_group['positions'])
-			else:
-				ion_positions = np.empty([0, 3])  # maintain correct dimensionality even in empty array
-			n_ion_per_frame.append(np.shape(ion_positions)[0])
+		p_attribs = None
+		if attr_float is not None or attr_int is not None:
+			p_attribs = ParticleAttributes(
+				reader.attribute_names_float, attr_float,
+				reader.attribute_names_int, attr_int)
 
-			positions.append(ion_positions)
+		positions = None
+		if reader.read_positions:
+			positions = LazyFrames(frame_source, 0, 3, static_trajectory)
 
-			if particle_attributes_names_float:
-				if n_ion_per_frame[ts_i] == 0:
-					particle_attributes_float.append(np.empty([0, len(particle_attributes_names_float)]))
-				else:
-					particle_attributes_float.append(np.array(ts_group['particle_attributes_float']))
-			if particle_attributes_names_int:
-				if n_ion_per_frame[ts_i] == 0:
-					particle_attributes_int.append(np.empty([0, len(particle_attributes_names_int)], dtype=int))
-				else:
-					particle_attributes_int.append(np.array(ts_group['particle_attributes_integer'], dtype=int))
-
-		unique_n_ions = len(set(n_ion_per_frame))
+		result = Trajectory(
+			positions=positions,
+			times=reader.times[timestep_indices],
+			particle_attributes=p_attribs,
+			start_splat_data=reader.read_start_splat_data(),
+			file_version_id=reader.file_version_id)
+	except Exception:
+		reader.close()
+		raise
 
-		# if more than one number of ions are present in the frames, the trajectory is not static
-		# and has variable frames
-		# if the trajectory is static, transform the trajectory to the old format returned by
-		# legacy hdf5 and json files to allow compatibility with the visualization methods
-		if unique_n_ions > 1:
-			static_trajectory = False
-		else:
-			static_trajectory = True
-			positions = np.dstack(positions)
+	return result
 
-		p_attr_final_float = None
-		if particle_attributes_names_float:
-			p_attr_final_float = particle_attributes_float
-			if static_trajectory:
-				p_attr_final_float = np.dstack(np.array(p_attr_final_float))
 
-		p_attr_final_int = None
-		if particle_attributes_names_int:
-			p_attr_final_int = particle_attributes_int
-			if static_trajectory:
-				p_attr_final_int = np.dstack(np.array(p_attr_final_int, dtype=int))
+def iter_hdf5_trajectory_frames(
+		trajectory_file_name, timestep_slice=None, time_range=None, attributes=None, positions=True):
+	"""
+	Iterates over the time step frames of a hdf5 trajectory file (legacy, version 2 or version 3 files) without
+	reading the whole trajectory into memory. Only the current frame is held in memory, which allows single pass
+	analyses of trajectory files with constant memory usage, e.g.:
 
-		p_attribs = ParticleAttributes(
-			particle_attributes_names_float, p_attr_final_float,
-			particle_attributes_names_int, p_attr_final_int)
-
-		start_splat_data = None
-		if 'start_splat' in tra_group.keys():
-			ss_grp = tra_group['start_splat']
-			start_pos = np.array(ss_grp['particle start locations'])
-			splat_pos = np.array(ss_grp['particle splat locations'])
-			start_times = np.array(ss_grp['particle start times'])
-			splat_times = np.array(ss_grp['particle splat times'])
-			p_states = np.array(ss_grp['particle splat state'], dtype=int)
-
-			start_splat_data = StartSplatTrackingData(
-				start_times, start_pos, splat_times, splat_pos, p_states
-			)
+	.. code-block:: python
 
-		result = Trajectory(
-			positions=positions,
-			times=np.array(times),
-			particle_attributes=p_attribs,
-			start_splat_data=start_splat_data,
-			file_version_id=file_version_id)
+		for time, positions, attributes_float, attributes_int in iter_hdf5_trajectory_frames(file_name):
+			n_particles = positions.shape[0]
 
-		return result
+	:param trajectory_file_name: Name of the file to read
+	:type trajectory_file_name: str
+	:param timestep_slice: Slice of the time steps to read, e.g. ``slice(0, 100, 10)`` for every 10th of the first
+		100 time steps. If a time range is also given, the slice is applied to the time steps within the time range.
+	:type timestep_slice: slice
+	:param time_range: Range of simulated times ``(t_start, t_stop)``, only time steps with times within the
+		range (including the range limits) are read
+	:type time_range: tuple of two floats
+	:param attributes: Names of the particle attributes to read, all particle attributes are read if None
+	:type attributes: list of str
+	:param positions: If false, the particle positions are not read (None is yielded instead)
+	:type positions: bool
+	:return: Generator yielding tuples of the time, the particle positions ``[n particles, 3]``, the float particle
+		attributes ``[n particles, n float attributes]`` and the integer particle attributes ``[n particles,
+		n integer attributes]`` of the individual frames. Particle attributes not present in the file are None.
+	"""
+	reader = _open_trajectory_file_reader(trajectory_file_name, attributes=attributes, read_positions=positions)
+	try:
+		timestep_indices = _select_timesteps(reader.times, timestep_slice, time_range)
+		for ts_i in timestep_indices:
+			frame_positions, attributes_float, attributes_int = reader.read_frame(ts_i)
+			yield reader.times[ts_i], frame_positions, attributes_float, attributes_int
+	finally:
+		reader.close()
 
 
-def read_legacy_hdf5_trajectory_file(trajectory_file_name):
+def read_legacy_hdf5_trajectory_file(trajectory_file_name, timestep_slice=None, time_range=None):
 	"""
 	Reads a legacy hdf5 trajectory file (with static particles per exported simulation frame)
 
 	:param trajectory_file_name: The name of the file to read
 	:type trajectory_file_name: str
+	:param timestep_slice: Slice of the time steps to read, e.g. ``slice(0, 100, 10)`` for every 10th of the first
+		100 time steps. If a time range is also given, the slice is applied to the time steps within the time range.
+	:type timestep_slice: slice
+	:param time_range: Range of simulated times ``(t_start, t_stop)``, only time steps with times within the
+		range (including the range limits) are read
+	:type time_range: tuple of two floats
 	:return: Trajectory object with trajectory data
 	:rtype: Trajectory
 	"""
-	hdf5file = h5py.File(trajectory_file_name, 'r')
+	with h5py.File(trajectory_file_name, 'r') as hdf5file:
+		tra_group = hdf5file['particle_trajectory']
+		attribs = tra_group.attrs
+		times = np.array(tra_group['times'])
 
-	tra_group = hdf5file['particle_trajectory']
-	attribs = tra_group.attrs
-	positions = tra_group['positions']
-	times = tra_group['times']
+		timestep_indices = _select_timesteps(times, timestep_slice, time_range)
+		positions = _read_timestep_hyperslab(tra_group['positions'], timestep_indices)
 
-	aux_parameters_names = None
-	aux_parameters = None
-	if 'aux_parameters' in tra_group.keys():
-		#aux_parameters_names = [name.decode('UTF-8') for name in attribs['auxiliary parameter names']]
-		aux_parameters_names = [
-			name.decode('UTF-8') if isinstance(name, bytes) else name for name in attribs['auxiliary parameter names']
-		]
-		aux_parameters = np.array(tra_group['aux_parameters'])
+		p_attribs = None
+		if 'aux_parameters' in tra_group.keys():
+			aux_parameters_names = _decode_attribute_names(attribs, 'auxiliary parameter names')
+			aux_parameters = _read_timestep_hyperslab(tra_group['aux_parameters'], timestep_indices)
+			p_attribs = ParticleAttributes(aux_parameters_names, aux_parameters)
 
 	result = Trajectory(
-		positions=np.array(positions),
-		times=np.array(times),
-		particle_attributes=ParticleAttributes(aux_parameters_names, aux_parameters),
+		positions=positions,
+		times=times[timestep_indices],
+		particle_attributes=p_attribs,
 		file_version_id=1)
 
 	return result
 
 
+# -------------- Trajectory cache -------------- #
+
+
+_NON_SEMANTIC_READER_OPTIONS = ('n_workers', 'lazy', 'cache_size')
+
+
+def read_cached_trajectory_file(trajectory_file_name, cache_dir=None, **reader_options):
+	"""
+	Reads a trajectory file (json, legacy hdf5 or version 2 / 3 hdf5) through a binary on-disk cache.
+
+	On the first read, the trajectory file is parsed with the reader for its file type and the resulting trajectory
+	data is stored as set of contiguous ``.npy`` files in the cache directory. Subsequent reads of the same file with
+	the same reader options load the cached data as memory mapped arrays (``numpy.load`` with ``mmap_mode='r'``),
+	which is almost instantaneous even for large trajectories. The cache entries are keyed by the absolute path of the
+	trajectory file and the reader options which select the read data (array options like particle indices by their
+	content), the number of reading workers is not part of the key. The modification
+	time and the size of the trajectory file are stored in the cache entry: A modified trajectory file is parsed
+	again and its cache entry is replaced. The data of a trajectory read from the cache is read only.
+
+	:param trajectory_file_name: Name of the trajectory file to read
+	:type trajectory_file_name: str
+	:param cache_dir: Directory of the trajectory cache, the directory ``.trajectory_cache`` next to the trajectory
+		file is used if None
+	:type cache_dir: str
+	:param reader_options: Additional keyword arguments for the trajectory reader (e.g. ``timestep_slice``), lazy
+		reading is not possible with the trajectory cache
+	:return: Trajectory object with trajectory data
+	:rtype: Trajectory
+	"""
+	if reader_options.get('lazy', False):
+		raise ValueError('Lazy trajectories can not be read through the trajectory cache')
+
+	trajectory_file_name = os.path.abspath(trajectory_file_name)
+	if cache_dir is None:
+		cache_dir = os.path.join(os.path.dirname(trajectory_file_name), '.trajectory_cache')
+
+	# options which do not change the read trajectory data (and options passed with their default None) are not
+	# part of the cache key:
+	cache_key = json.dumps([
+		trajectory_file_name,
+		sorted(
+			(key, _canonical_reader_option(value)) for key, value in reader_options.items()
+			if key not in _NON_SEMANTIC_READER_OPTIONS and value is not None)])
+	entry_dir = os.path.join(cache_dir, hashlib.sha1(cache_key.encode('UTF-8')).hexdigest())
+	meta_file_name = os.path.join(entry_dir, 'meta.json')
+
+	file_stat = os.stat(trajectory_file_name)
+	if os.path.exists(meta_file_name):
+		with open(meta_file_name) as meta_file:
+			meta = json.load(meta_file)
+		if meta.get('mtime_ns') == file_stat.st_mtime_ns and meta.get('size') == file_stat.st_size:
+			return _load_cached_trajectory(entry_dir)
+
+	trajectory = _read_trajectory_file_by_type(trajectory_file_name, **reader_options)
+
+	# a stale entry of a modified trajectory file is replaced:
+	write_cache_entry(cache_dir, entry_dir, lambda tmp_dir: _store_cached_trajectory(trajectory, tmp_dir, file_stat))
+
+	return _load_cached_trajectory(entry_dir)
+
+
+def _canonical_reader_option(value):
+	"""
+	Transforms a reader option to a canonical json serializable form for the cache key: Arrays are represented by
+	their data type, shape and a hash of their content, sequences and slices are transformed element wise
+	"""
+	if isinstance(value, np.ndarray):
+		content_hash = hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+		return ['ndarray', value.dtype.str, list(value.shape), content_hash]
+	elif isinstance(value, (list, tuple)):
+		return [type(value).__name__, [_canonical_reader_option(element) for element in value]]
+	elif isinstance(value, slice):
+		return ['slice', [_canonical_reader_option(v) for v in (value.start, value.stop, value.step)]]
+	elif isinstance(value, np.generic):
+		return value.item()
+	elif value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	else:
+		raise TypeError('Reader option ' + repr(value) + ' can not be used with the trajectory cache')
+
+
+def _read_trajectory_file_by_type(trajectory_file_name, **reader_options):
+	"""
+	Reads a trajectory file with the reader for its file type (determined from the file name and the file metadata)
+	"""
+	if trajectory_file_name.endswith('.json') or trajectory_file_name.endswith('.json.gz'):
+		return read_json_trajectory_file(trajectory_file_name, **reader_options)
+
+	with h5py.File(trajectory_file_name, 'r') as hdf5file:
+		is_legacy_file = 'file version' not in hdf5file['particle_trajectory'].attrs.keys()
+
+	if is_legacy_file:
+		return read_legacy_hdf5_trajectory_file(trajectory_file_name, **reader_options)
+	else:
+		return read_hdf5_trajectory_file(trajectory_file_name, **reader_options)
+
+
+def _store_frame_data(frame_data, is_static, entry_dir, name):
+	"""
+	Stores static frame data as one array, variable frame data as concatenated array with frame offsets
+	"""
+	if is_static:
+		np.save(os.path.join(entry_dir, name + '.npy'), np.asarray(frame_data))
+	else:
+		if not isinstance(frame_data, RaggedFrames):
+			frame_data = RaggedFrames.from_frames(frame_data)
+		np.save(os.path.join(entry_dir, name + '.npy'), frame_data.data)
+		np.save(os.path.join(entry_dir, name + '_offsets.npy'), frame_data.offsets)
+
+
+def _load_frame_data(is_static, entry_dir, name):
+	"""
+	Loads memory mapped frame data stored with :py:func:`_store_frame_data`
+	"""
+	data = np.load(os.path.join(entry_dir, name + '.npy'), mmap_mode='r')
+	if is_static:
+		return data
+
+	return RaggedFrames(data, np.load(os.path.join(entry_dir, name + '_offsets.npy')))
+
+
+def _store_cached_trajectory(trajectory, entry_dir, file_stat):
+	"""
+	Stores a trajectory as cache entry in a directory, together with the modification time and the size of the
+	trajectory file (given as ``os.stat`` result) the entry was created from
+	"""
+	is_static = trajectory.is_static_trajectory
+	meta = {
+		'mtime_ns': file_stat.st_mtime_ns,
+		'size': file_stat.st_size,
+		'is_static': is_static,
+		'file_version_id': int(trajectory.file_version_id),
+		'has_positions': trajectory.positions is not None,
+		'attribute_names_float': None,
+		'attribute_names_int': None,
+		'has_start_splat_data': trajectory.start_splat_data is not None,
+		'optional_attributes': []}
+
+	np.save(os.path.join(entry_dir, 'times.npy'), trajectory.times)
+	if trajectory.positions is not None:
+		_store_frame_data(trajectory.positions, is_static, entry_dir, 'positions')
+
+	p_attribs = trajectory.particle_attributes
+	if p_attribs is not None:
+		if p_attribs.attr_dat_float is not None:
+			meta['attribute_names_float'] = list(p_attribs.attr_names_float)
+			_store_frame_data(p_attribs.attr_dat_float, is_static, entry_dir, 'attributes_float')
+		if p_attribs.attr_dat_int is not None:
+			meta['attribute_names_int'] = list(p_attribs.attr_names_int)
+			_store_frame_data(p_attribs.attr_dat_int, is_static, entry_dir, 'attributes_int')
+
+	ss_data = trajectory.start_splat_data
+	if ss_data is not None:
+		for name in ('start_times', 'start_positions', 'splat_times', 'splat_positions', 'splat_states'):
+			np.save(os.path.join(entry_dir, name + '.npy'), getattr(ss_data, name))
+
+	if trajectory.optional_attributes:
+		for key, value in trajectory.optional_attributes.items():
+			meta['optional_attributes'].append(key.name)
+			np.save(os.path.join(entry_dir, 'optional_' + key.name + '.npy'), value)
+
+	with open(os.path.join(entry_dir, 'meta.json'), 'w') as meta_file:
+		json.dump(meta, meta_file)
+
+
+def _load_cached_trajectory(entry_dir):
+	"""
+	Loads a trajectory from a cache entry directory, the arrays of the trajectory are memory mapped
+	"""
+	with open(os.path.join(entry_dir, 'meta.json')) as meta_file:
+		meta = json.load(meta_file)
+	is_static = meta['is_static']
+
+	positions = None
+	if meta['has_positions']:
+		positions = _load_frame_data(is_static, entry_dir, 'positions')
+
+	attributes_float, attributes_int = None, None
+	if meta['attribute_names_float'] is not None:
+		attributes_float = _load_frame_data(is_static, entry_dir, 'attributes_float')
+	if meta['attribute_names_int'] is not None:
+		attributes_int = _load_frame_data(is_static, entry_dir, 'attributes_int')
+
+	p_attribs = None
+	if attributes_float is not None or attributes_int is not None:
+		p_attribs = ParticleAttributes(
+			meta['attribute_names_float'], attributes_float, meta['attribute_names_int'], attributes_int)
+
+	ss_data = None
+	if meta['has_start_splat_data']:
+		ss_data = StartSplatTrackingData(*[
+			np.load(os.path.join(entry_dir, name + '.npy'), mmap_mode='r') for name in
+			('start_times', 'start_positions', 'splat_times', 'splat_positions', 'splat_states')])
+
+	optional_attributes = None
+	if meta['optional_attributes']:
+		optional_attributes = {
+			OptionalAttribute[name]: np.load(os.path.join(entry_dir, 'optional_' + name + '.npy'), mmap_mode='r')
+			for name in meta['optional_attributes']}
+
+	return Trajectory(
+		positions=positions,
+		times=np.load(os.path.join(entry_dir, 'times.npy')),
+		particle_attributes=p_attribs,
+		start_splat_data=ss_data,
+		optional_attributes=optional_attributes,
+		file_version_id=meta['file_version_id'])
+
+
 # -------------- Trajectory output / translation -------------- #
 
+def write_hdf5_trajectory_file(
+		trajectory: Trajectory, trajectory_file_name, compression='gzip', compression_opts=None, chunks=True,
+		packed=False):
+	"""
+	Writes a trajectory to a version 3 hdf5 trajectory file, which can be read again with
+	:py:func:`read_hdf5_trajectory_file`. This allows to store trajectories, e.g. the result of a particle
+	selection or filtering, for later reuse.
+
+	By default, the file is written in the layout of IDSimF trajectory files with one hdf5 group per time step.
+	With ``packed`` set, a packed layout is written instead: All frames are stored in one chunked dataset per
+	quantity (positions, float attributes and integer attributes) and the frames are addressed by a vector of frame
+	offsets. Reading a packed file requires only a few large reads instead of reads from thousands of small
+	hdf5 groups, which is considerably faster. Packed files can only be read with IDSimPy.
+
+	:param trajectory: The trajectory to write, a trajectory without particle positions can not be written
+	:type trajectory: Trajectory
+	:param trajectory_file_name: Name of the file to write
+	:type trajectory_file_name: str
+	:param compression: hdf5 compression filter of the frame datasets (e.g. 'gzip' or 'lzf'), the frame data is
+		not compressed if None
+	:type compression: str
+	:param compression_opts: Options of the compression filter, e.g. the compression level for 'gzip'
+	:param chunks: Chunk shape of the frame datasets ``(n rows, n columns)``, chunk shapes larger than a dataset are
+		reduced to the dataset shape. If True, the chunk shape is chosen automatically. If None, the datasets are
+		not chunked (which is only possible without compression).
+	:type chunks: tuple of two int or bool
+	:param packed: If true, the packed trajectory file layout is written
+	:type packed: bool
+	"""
+	if trajectory.positions is None:
+		raise ValueError('Trajectory contains no particle positions and can not be written to a trajectory file')
+
+	n_timesteps = trajectory.n_timesteps
+	p_attribs = trajectory.particle_attributes
+	frame_data = [trajectory.positions, None, None]
+	attribute_names_float = None
+	attribute_names_int = None
+	if p_attribs is not None:
+		if p_attribs.attr_names_float:
+			attribute_names_float = p_attribs.attr_names_float
+			frame_data[1] = p_attribs.attr_dat_float
+		if p_attribs.attr_names_int:
+			attribute_names_int = p_attribs.attr_names_int
+			frame_data[2] = p_attribs.attr_dat_int
+	dataset_names = ['positions', 'particle_attributes_float', 'particle_attributes_integer']
+
+	def create_frame_dataset(group, name, data):
+		dataset_chunks = chunks
+		if isinstance(chunks, tuple):
+			dataset_chunks = tuple(max(1, min(chunk, dim)) for chunk, dim in zip(chunks, data.shape))
+		if data.size == 0:
+			# empty datasets can not be chunked:
+			group.create_dataset(name, data=data)
+		else:
+			group.create_dataset(
+				name, data=data, compression=compression, compression_opts=compression_opts, chunks=dataset_chunks)
+
+	with h5py.File(trajectory_file_name, 'w') as h5f:
+		tra_group = h5f.create_group('particle_trajectory')
+		tra_group.attrs['file version'] = [3]
+		tra_group.attrs['number of timesteps'] = [n_timesteps]
+		if attribute_names_float:
+			tra_group.attrs['attributes names'] = [name.encode('UTF-8') for name in attribute_names_float]
+		if attribute_names_int:
+			tra_group.attrs['integer attributes names'] = [name.encode('UTF-8') for name in attribute_names_int]
+		tra_group.create_dataset('times', data=np.asarray(trajectory.times))
+
+		if packed:
+			tra_group.attrs['layout'] = 'packed'
+			frame_lengths = [np.shape(_frame_of_frame_data(frame_data[0], ts_i))[0] for ts_i in range(n_timesteps)]
+			tra_group.create_dataset('frame offsets', data=np.concatenate(([0], np.cumsum(frame_lengths))))
+			for data, name in zip(frame_data, dataset_names):
+				if data is None:
+					continue
+				if isinstance(data, RaggedFrames):
+					packed_data = data.data
+				elif isinstance(data, np.ndarray):
+					packed_data = np.transpose(data, (2, 0, 1)).reshape(-1, data.shape[1])
+				else:
+					packed_data = np.concatenate(
+						[np.reshape(_frame_of_frame_data(data, ts_i), (frame_lengths[ts_i], -1))
+						 for ts_i in range(n_timesteps)])
+				create_frame_dataset(tra_group, name, packed_data)
+		else:
+			ts_group = tra_group.create_group('timesteps')
+			for ts_i in range(n_timesteps):
+				frame_group = ts_group.create_group(str(ts_i))
+				for data, name in zip(frame_data, dataset_names):
+					if data is None:
+						continue
+					frame = np.asarray(_frame_of_frame_data(data, ts_i))
+					# empty frames contain no datasets in IDSimF trajectory files:
+					if frame.shape[0] > 0:
+						create_frame_dataset(frame_group, name, frame)
+
+		ss_data = trajectory.start_splat_data
+		if ss_data is not None:
+			ss_grp = tra_group.create_group('start_splat')
+			ss_grp.create_dataset('particle start locations', data=ss_data.start_positions)
+			ss_grp.create_dataset('particle splat locations', data=ss_data.splat_positions)
+			ss_grp.create_dataset('particle start times', data=ss_data.start_times)
+			ss_grp.create_dataset('particle splat times', data=ss_data.splat_times)
+			ss_grp.create_dataset('particle splat state', data=ss_data.splat_states)
+
+
+def _frame_of_frame_data(frame_data, timestep_index):
+	"""
+	Returns a single time step frame ``[n particles, n columns]`` of frame data (positions or particle attributes)
+	"""
+	if isinstance(frame_data, (RaggedFrames, LazyFrames)):
+		return frame_data.frame(timestep_index)
+	elif isinstance(frame_data, np.ndarray):
+		return frame_data[:, :, timestep_index]
+	else:
+		return frame_data[timestep_index]
+
+
 def export_trajectory_to_vtk(trajectory: Trajectory, vtk_file_base_name):
 	"""
 	Translates and exports an ion trajectory to a set of legacy VTK ascii files
@@ -753,17 +2501,142 @@ POINTS """
 
 	for i in range(n_steps):
 		vtk_file_name = vtk_file_base_name + "%05d" % i + ".vtk"
+		ion_positions = trajectory.get_positions(i)
 		with open(vtk_file_name, 'w') as vtk_file:
-			vtk_file.write(header + str(trajectory.get_n_particles()) + " float\n")
+			vtk_file.write(header + str(ion_positions.shape[0]) + " float\n")
+			np.savetxt(vtk_file, ion_positions, fmt='%s', delimiter=' ')
+
+
+def export_trajectory_to_vtp(trajectory: Trajectory, vtp_file_base_name, attributes=True, n_workers=None):
+	"""
+	Exports a trajectory to a time series of binary VTK XML poly data files (``.vtp``), one per time step, and a
+	ParaView data collection file (``.pvd``) which combines the time step files with the simulated times. The
+	particles are exported as vertices, the particle attributes are exported as point data arrays. Static and
+	variable trajectories can be exported.
 
-			ion_positions = trajectory.get_positions(i)
-			for i_pos in ion_positions[:, :]:
-				vtk_file.write(str(i_pos[0]) + " " + str(i_pos[1]) + " " + str(i_pos[2]) + " \n")
+	The poly data files are named ``<vtp_file_base_name><time step index>.vtp``, the collection file is named
+	``<vtp_file_base_name>.pvd``.
+
+	:param trajectory: The trajectory to export
+	:type trajectory: Trajectory
+	:param vtp_file_base_name: The base name of the files to generate
+	:type vtp_file_base_name: str
+	:param attributes: If true, the particle attributes are exported. Alternatively, a list of the names of the
+		particle attributes to export.
+	:type attributes: bool or list of str
+	:param n_workers: Number of worker processes which write the time step files concurrently. The frames are
+		passed to the workers as they are written, only a few frames per worker are held in memory at once. The files
+		are written serially if None or 1.
+	:type n_workers: int
+	"""
+	if trajectory.positions is None:
+		raise ValueError('Trajectory contains no particle positions and can not be exported')
+
+	p_attribs = trajectory.particle_attributes
+	if p_attribs is None or attributes is False:
+		attribute_names = []
+	elif attributes is True:
+		attribute_names = p_attribs.attribute_names
+	else:
+		attribute_names = list(attributes)
+
+	vtp_file_names = [vtp_file_base_name + "%05d" % i + ".vtp" for i in range(trajectory.n_timesteps)]
+
+	def frames():
+		for ts_i, vtp_file_name in enumerate(vtp_file_names):
+			attribute_data = [p_attribs.get(name, ts_i) for name in attribute_names]
+			yield vtp_file_name, trajectory.get_positions(ts_i), attribute_names, attribute_data
+
+	if n_workers is None or n_workers <= 1:
+		for frame in frames():
+			_write_vtp_frame(*frame)
+	else:
+		# the frames are submitted in a bounded window, only the frames of the pending tasks are held in memory:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+			pending = collections.deque()
+			for frame in frames():
+				pending.append(executor.submit(_write_vtp_frame, *frame))
+				if len(pending) >= 4 * n_workers:
+					pending.popleft().result()
+
+			while pending:
+				pending.popleft().result()
+
+	with open(vtp_file_base_name + ".pvd", 'w') as pvd_file:
+		pvd_file.write('<?xml version="1.0"?>\n')
+		pvd_file.write('<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n')
+		pvd_file.write('  <Collection>\n')
+		for time, vtp_file_name in zip(trajectory.times, vtp_file_names):
+			pvd_file.write('    <DataSet timestep="{}" group="" part="0" file="{}"/>\n'.format(
+				repr(float(time)), os.path.basename(vtp_file_name)))
+		pvd_file.write('  </Collection>\n')
+		pvd_file.write('</VTKFile>\n')
+
+
+def _native_contiguous(data):
+	"""
+	Returns frame data as C-contiguous array in native byte order, as required by the VTK array conversion
+	"""
+	data = np.asarray(data)
+	return np.ascontiguousarray(data, dtype=data.dtype.newbyteorder('='))
+
+
+def _write_vtp_frame(vtp_file_name, positions, attribute_names, attribute_data):
+	"""
+	Writes the particles of a time step frame as vertices to a binary VTK XML poly data file. The frame data is
+	passed to VTK as whole arrays.
+
+	:param vtp_file_name: Name of the file to write
+	:type vtp_file_name: str
+	:param positions: Particle positions with the shape ``[n particles, 3]``
+	:type positions: numpy.ndarray
+	:param attribute_names: Names of the exported particle attributes
+	:type attribute_names: list of str
+	:param attribute_data: Particle attribute vectors, one per attribute name
+	:type attribute_data: list of numpy.ndarray
+	"""
+	positions = _native_contiguous(positions)
+	n_particles = positions.shape[0]
+
+	points = vtk.vtkPoints()
+	points.SetData(numpy_support.numpy_to_vtk(positions))
+
+	vertex_indices = np.arange(n_particles + 1, dtype=numpy_support.get_numpy_array_type(vtk.VTK_ID_TYPE))
+	vertices = vtk.vtkCellArray()
+	vertices.SetData(
+		numpy_support.numpy_to_vtkIdTypeArray(vertex_indices, deep=True),
+		numpy_support.numpy_to_vtkIdTypeArray(vertex_indices[:-1], deep=True))
+
+	poly_data = vtk.vtkPolyData()
+	poly_data.SetPoints(points)
+	poly_data.SetVerts(vertices)
+
+	point_data = poly_data.GetPointData()
+	for name, data in zip(attribute_names, attribute_data):
+		vtk_array = numpy_support.numpy_to_vtk(_native_contiguous(data))
+		vtk_array.SetName(name)
+		point_data.AddArray(vtk_array)
+
+	writer = vtk.vtkXMLPolyDataWriter()
+	writer.SetFileName(vtp_file_name)
+	writer.SetInputData(poly_data)
+	writer.SetDataModeToAppended()
+	writer.EncodeAppendedDataOff()
+	if writer.Write() != 1:
+		raise IOError('Writing of VTK file ' + vtp_file_name + ' failed')
 
 
 # -------------- Data Processing Methods -------------- #
 
 
+def _is_in_memory_trajectory(trajectory):
+	"""
+	Checks if the frame data of a trajectory is held in memory (is not lazily read)
+	"""
+	return not isinstance(trajectory.positions, LazyFrames) and \
+		(trajectory.particle_attributes is None or trajectory.particle_attributes._is_in_memory())
+
+
 def filter_attribute(trajectory, attribute_name, value):
 	"""
 	Filters select ions according to a value of a specified particle attribute.
@@ -784,14 +2657,33 @@ def filter_attribute(trajectory, attribute_name, value):
 	:rtype: Trajectory
 	"""
 
+	p_attribs = trajectory.particle_attributes
+	if _is_in_memory_trajectory(trajectory):
+		#  select the particles of all time steps in one vectorized pass with a mask over all frame rows
+		is_float, column = p_attribs.attr_name_map[attribute_name]
+		attribute_data = p_attribs.attr_dat_float if is_float else p_attribs.attr_dat_int
+		row_mask = _ragged_frame_column(attribute_data, column) == value
+
+		new_positions = None
+		if trajectory.positions is not None:
+			new_positions = _select_ragged_rows(trajectory.positions, row_mask)
+
+		return Trajectory(
+			positions=new_positions,
+			particle_attributes=p_attribs._select_ragged_rows(row_mask),
+			times=trajectory.times)
+
 	n_ts = trajectory.n_timesteps
 
-	#  iterate through time steps and construct time step wise selected index arrays
-	filtered_indexes = [
-		np.nonzero(trajectory.particle_attributes.get(attribute_name, i) == value)[0]
-		for i in range(n_ts)
-	]
-	new_positions = [trajectory.get_positions(i)[filtered_indexes[i], :] for i in range(n_ts)]
+	#  iterate through time steps and construct time step wise selected index arrays and positions
+	#  (in one pass, to access every frame of lazily read trajectories only once)
+	filtered_indexes = []
+	new_positions = []
+	for i in range(n_ts):
+		ts_indexes = np.nonzero(trajectory.particle_attributes.get(attribute_name, i) == value)[0]
+		filtered_indexes.append(ts_indexes)
+		new_positions.append(trajectory.get_positions(i)[ts_indexes, :])
+
 	new_particle_attributes = trajectory.particle_attributes.select(filtered_indexes)
 
 	result = Trajectory(
@@ -837,7 +2729,8 @@ def select(trajectory, selector_data, value):
 		# filtered particles per time step could variate: generate a vector per time step
 		static_selector = False
 		n_ts = len(selector_data)
-		selected_indices = [np.nonzero(selector_data[i] == value)[0] for i in range(n_ts)]
+		if not _is_in_memory_trajectory(trajectory):
+			selected_indices = [np.nonzero(selector_data[i] == value)[0] for i in range(n_ts)]
 
 	else:
 		raise TypeError('Wrong data type for selector_data. One dimensional numpy array or list of one dimensional '
@@ -851,6 +2744,14 @@ def select(trajectory, selector_data, value):
 		else:
 			raise TypeError('Variable trajectory can not be filtered with static selector_data')
 
+	elif _is_in_memory_trajectory(trajectory):
+		#  select with a mask over all frame rows in one vectorized pass
+		row_mask = np.concatenate([np.ravel(selector_data[i]) for i in range(n_ts)]) == value
+		new_positions = _select_ragged_rows(trajectory.positions, row_mask)
+		new_particle_attributes = None
+		if trajectory.particle_attributes is not None:
+			new_particle_attributes = trajectory.particle_attributes._select_ragged_rows(row_mask)
+
 	else:
 		new_positions = [trajectory.get_positions(i)[selected_indices[i], :] for i in range(n_ts)]
 		new_particle_attributes = trajectory.particle_attributes.select(selected_indices)
@@ -864,35 +2765,95 @@ def select(trajectory, selector_data, value):
 	return result
 
 
-def center_of_charge(trajectory):
+def center_of_charge(trajectory, charge_attribute=None):
 	"""
 	Calculates the center of charge of an ensemble of particles in a Trajectory.
 
+	The particle charges are taken from the particle attribute ``charge_attribute`` if it is specified, which allows
+	charges changing between the time steps (e.g. in reactive simulations). Otherwise, the optional trajectory
+	attribute ``OptionalAttribute.PARTICLE_CHARGES``, a vector with one charge per particle, is used as charge
+	weights if it is present.
+
 	**Note:**
-	If there is no explicit information about the particle charges in the input trajectory object
-	(the optional trajectory attribute ``OptionalAttribute.PARTICLE_MASSES`` is not present) *all* particles are
-	assumed to be singly positively charged.
+	If there is no explicit information about the particle charges in the input trajectory object (no charge
+	attribute is specified and the optional trajectory attribute ``OptionalAttribute.PARTICLE_CHARGES`` is not
+	present) *all* particles are assumed to be singly positively charged.
 
 	:param trajectory: Trajectory to calculate the center of charge for
 	:type trajectory: Trajectory
+	:param charge_attribute: Name of the particle attribute with the particle charges, the charges are not taken from
+		the particle attributes if None
+	:type charge_attribute: str
 	:return: Vector of the spatial position of the center of mass: Array with time steps as first and spatial dimension
 		(x,y,z) as second dimension
 	:rtype: numpy.ndarray
 	"""
 	n_timesteps = trajectory.n_timesteps
-	coc = np.zeros((n_timesteps, 3))
 
 	particle_charges = None
-	if trajectory.optional_attributes and OptionalAttribute.PARTICLE_CHARGES in trajectory.optional_attributes:
-		particle_charges = trajectory.optional_attributes[OptionalAttribute.PARTICLE_CHARGES]
-
-	for i in range(n_timesteps):
-		p_pos = trajectory.get_positions(i)
+	if charge_attribute is None and trajectory.optional_attributes and \
+			OptionalAttribute.PARTICLE_CHARGES in trajectory.optional_attributes:
+		particle_charges = np.asarray(trajectory.optional_attributes[OptionalAttribute.PARTICLE_CHARGES])
+
+	positions = trajectory.positions
+	with np.errstate(invalid='ignore', divide='ignore'):
+		if isinstance(positions, LazyFrames):
+			#  lazy trajectories are reduced frame by frame, empty frames have no defined center of charge
+			coc = np.full((n_timesteps, 3), np.nan)
+			for i in range(n_timesteps):
+				p_pos = trajectory.get_positions(i)
+				n_particles = p_pos.shape[0]
+				if n_particles == 0:
+					continue
+
+				if charge_attribute is not None:
+					weights = np.ravel(trajectory.particle_attributes.get(charge_attribute, i))
+				elif particle_charges is not None:
+					weights = particle_charges[:n_particles]
+				else:
+					coc[i, :] = np.sum(p_pos, axis=0) / n_particles
+					continue
+				coc[i, :] = np.sum(p_pos * weights[:, np.newaxis], axis=0) / np.sum(weights)
+			return coc
 
-		x_mean = np.average(p_pos[:, 0], weights=particle_charges)
-		y_mean = np.average(p_pos[:, 1], weights=particle_charges)
-		z_mean = np.average(p_pos[:, 2], weights=particle_charges)
+		if trajectory.is_static_trajectory:
+			#  the particle dimension of the [n particles, 3, n time steps] position array is reduced in one pass
+			if charge_attribute is not None:
+				charges = trajectory.particle_attributes.get(charge_attribute)
+				return np.einsum('ik,ijk->kj', charges, positions) / np.sum(charges, axis=0)[:, np.newaxis]
+			elif particle_charges is not None:
+				return np.tensordot(particle_charges, positions, axes=(0, 0)).T / np.sum(particle_charges)
+			else:
+				return np.einsum('ijk->kj', positions) / np.shape(positions)[0]
+
+		#  all frames of variable trajectories are reduced in one segmented pass over the concatenated frame rows
+		if not isinstance(positions, RaggedFrames):
+			positions = RaggedFrames.from_frames(positions, 3)
+
+		weights = None
+		if charge_attribute is not None:
+			p_attribs = trajectory.particle_attributes
+			is_float, column = p_attribs.attr_name_map[charge_attribute]
+			weights = _ragged_frame_column(p_attribs.attr_dat_float if is_float else p_attribs.attr_dat_int, column)
+		elif particle_charges is not None:
+			# the charges are given per particle index in the individual frames:
+			frame_indices = positions.frame_indices
+			weights = particle_charges[np.arange(len(frame_indices)) - positions.offsets[frame_indices]]
+
+		coc = np.full((n_timesteps, 3), np.nan)
+		frame_lengths = positions.frame_lengths
+		non_empty = frame_lengths > 0
+		if not np.any(non_empty):
+			return coc
+
+		frame_starts = positions.offsets[:-1][non_empty]
+		if weights is None:
+			position_sums = np.add.reduceat(positions.data, frame_starts, axis=0)
+			weight_sums = frame_lengths[non_empty]
+		else:
+			position_sums = np.add.reduceat(positions.data * weights[:, np.newaxis], frame_starts, axis=0)
+			weight_sums = np.add.reduceat(weights, frame_starts)
 
-		coc[i, :] = np.array([x_mean, y_mean, z_mean])
+		coc[non_empty, :] = position_sums / weight_sums[:, np.newaxis]
 
 	return coc
@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import os
+import io
+import subprocess
+import hashlib
+import collections
+import concurrent.futures
+import functools
 import numpy as np
+import matplotlib as mpl
+import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
 from matplotlib import animation
 from matplotlib.image import NonUniformImage
 from . import trajectory as tra
 
 __all__ = (
+	'DensityBinning',
+	'compute_density_cube',
+	'save_animation',
 	'plot_particle_traces',
 	'plot_density_xz',
 	'animate_xz_density',
@@ -18,6 +30,461 @@ __all__ = (
 	'render_scatter_animation')
 
 
+# Density binning ##########################
+
+class DensityBinning:
+	"""
+	Bins particles into the cells of a two dimensional grid, e.g. to render density plots of particle ensembles.
+
+	The binning is equivalent to ``numpy.histogram2d`` with explicit bin edges: The bins are half open intervals,
+	except of the last bin in every dimension which includes its upper edge, particles outside of the grid are ignored.
+	The bin edges are validated once on construction. The bin index of every particle is then determined once per
+	call of :py:meth:`histogram` (with integer arithmetic for uniform bin edges) and the particle counts and any
+	number of weighted channels are accumulated from the same bin indices with ``numpy.bincount``.
+	"""
+
+	def __init__(self, xedges, yedges):
+		"""
+		Constructor
+
+		:param xedges: the edges of the bins in the first dimension
+		:type xedges: list / array of float
+		:param yedges: the edges of the bins in the second dimension
+		:type yedges: list / array of float
+		"""
+		self.xedges = np.asarray(xedges, dtype=float)
+		self.yedges = np.asarray(yedges, dtype=float)
+		for edges in (self.xedges, self.yedges):
+			if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+				raise ValueError('Bin edges have to be a monotonically increasing vector of at least two edges')
+
+		self.shape = (len(self.xedges) - 1, len(self.yedges) - 1)
+		self._x_uniform = self._is_uniform(self.xedges)
+		self._y_uniform = self._is_uniform(self.yedges)
+
+	@staticmethod
+	def _is_uniform(edges):
+		bin_widths = np.diff(edges)
+		return np.allclose(bin_widths, bin_widths[0], rtol=1e-12, atol=0)
+
+	@staticmethod
+	def _bin_index(values, edges, uniform):
+		"""
+		Calculates the bin index of values in one dimension, values outside of the edges get the index -1
+		"""
+		values = np.asarray(values, dtype=float)
+		n_bins = len(edges) - 1
+		if uniform:
+			#  the computed index is corrected by comparison with the neighboring edges, which guarantees the same
+			#  binning as the comparison based binning for values on (or next to) the edges
+			index = (values - edges[0]) * (n_bins / (edges[-1] - edges[0]))
+			index = np.clip(np.nan_to_num(index), 0, n_bins - 1).astype(np.intp)
+			index -= values < edges[index]
+			index += (values >= edges[index + 1]) & (index < n_bins - 1)
+		else:
+			index = np.searchsorted(edges, values, side='right') - 1
+			index[values == edges[-1]] = n_bins - 1
+
+		index[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+		return index
+
+	def bin_indices(self, x, y):
+		"""
+		Calculates the flat bin index (in row major order of the grid) of particles
+
+		:param x: particle positions in the first dimension
+		:type x: numpy.ndarray
+		:param y: particle positions in the second dimension
+		:type y: numpy.ndarray
+		:return: vector with the flat bin index of the particles, particles outside of the grid get the index -1
+		:rtype: numpy.ndarray
+		"""
+		x_index = self._bin_index(x, self.xedges, self._x_uniform)
+		y_index = self._bin_index(y, self.yedges, self._y_uniform)
+		flat_index = x_index * self.shape[1] + y_index
+		flat_index[(x_index < 0) | (y_index < 0)] = -1
+		return flat_index
+
+	def histogram(self, x, y, *weights):
+		"""
+		Bins particles and returns the particle counts and the sums of an arbitrary number of particle weights in
+		the bins
+
+		:param x: particle positions in the first dimension
+		:type x: numpy.ndarray
+		:param y: particle positions in the second dimension
+		:type y: numpy.ndarray
+		:param weights: weight vectors (one value per particle) to sum in the bins
+		:type weights: numpy.ndarray
+		:return: tuple of the particle counts and the weight sums in the bins, all with the shape
+			[number of bins in x, number of bins in y]
+		"""
+		return tuple([h[0] for h in self.histogram_frames(x, y, None, 1, *weights)])
+
+	def histogram_frames(self, x, y, frame_indices, n_frames, *weights):
+		"""
+		Bins the particles of multiple frames (e.g. time steps) at once and returns the particle counts and the sums
+		of an arbitrary number of particle weights in the bins of every frame
+
+		:param x: particle positions in the first dimension
+		:type x: numpy.ndarray
+		:param y: particle positions in the second dimension
+		:type y: numpy.ndarray
+		:param frame_indices: frame index of every particle (all particles belong to frame 0 if None)
+		:type frame_indices: numpy.ndarray
+		:param n_frames: number of frames
+		:type n_frames: int
+		:param weights: weight vectors (one value per particle) to sum in the bins
+		:type weights: numpy.ndarray
+		:return: tuple of the particle counts and the weight sums in the bins, all with the shape
+			[n_frames, number of bins in x, number of bins in y]
+		"""
+		flat_index = self.bin_indices(x, y)
+		in_grid = flat_index >= 0
+		n_bins = self.shape[0] * self.shape[1]
+		cube_shape = (n_frames,) + self.shape
+
+		cube_index = flat_index[in_grid]
+		if frame_indices is not None:
+			cube_index += np.asarray(frame_indices, dtype=np.intp)[in_grid] * n_bins
+
+		result = [np.bincount(cube_index, minlength=n_frames * n_bins).astype(float).reshape(cube_shape)]
+		for w in weights:
+			w = np.asarray(w, dtype=float)[in_grid]
+			result.append(np.bincount(cube_index, weights=w, minlength=n_frames * n_bins).reshape(cube_shape))
+
+		return tuple(result)
+
+
+def _density_cube_fingerprint(trajectory, timestep_indices, weights):
+	"""
+	Calculates a fingerprint of the trajectory data a density cube is computed from: A hash of the particle numbers,
+	the positions and the weights of the particles in the selected time steps
+	"""
+	fingerprint = hashlib.sha1()
+	for ts in timestep_indices:
+		positions = np.ascontiguousarray(trajectory.get_positions(ts))
+		fingerprint.update(positions.dtype.str.encode('UTF-8'))
+		fingerprint.update(np.int64(positions.shape[0]).tobytes())
+		fingerprint.update(positions.tobytes())
+		if weights is not None:
+			fingerprint.update(np.ascontiguousarray(np.ravel(trajectory.particle_attributes.get(weights, ts))).tobytes())
+	return fingerprint.hexdigest()
+
+
+def _load_cached_density_cube(cache_file, xedges, zedges, weights, timestep_indices, times, fingerprint):
+	"""
+	Loads a density cube from a cache file, returns None if there is no cache file or the cache file was computed with
+	different parameters or from different trajectory data
+	"""
+	if not os.path.exists(cache_file):
+		return None
+
+	with np.load(cache_file) as cached:
+		if 'trajectory_fingerprint' in cached.files and str(cached['trajectory_fingerprint']) == fingerprint and \
+				str(cached['weights']) == str(weights) and \
+				np.array_equal(cached['xedges'], xedges) and np.array_equal(cached['zedges'], zedges) and \
+				np.array_equal(cached['timestep_indices'], timestep_indices) and \
+				np.array_equal(cached['times'], times):
+			return cached['density_cube']
+
+	return None
+
+
+def compute_density_cube(
+		trajectory, xedges, zedges, weights=None,
+		timestep_indices=None, cache_file=None, cache_key=None, max_chunk_size=1 << 22):
+	"""
+	Computes the particle density in a z-x projection for multiple time steps of a trajectory at once. The particles
+	of many time steps are binned in one vectorized pass (see :py:class:`DensityBinning`), which is considerably faster
+	than binning the time steps individually. Density animations can render a precomputed density cube without any
+	further binning.
+
+	The density cube can be cached in a file: If the cache file exists and was computed with the same bin edges,
+	weights, time step indices and time step times from the same trajectory data, the cached density cube is
+	returned. Otherwise the density cube is computed and written to the cache file. The trajectory data is identified
+	by a hash of the particle positions (and weights) of the selected time steps, which is stored in the cache file.
+	Note that computing this hash requires a full pass over the selected trajectory data (for lazily read trajectories
+	all selected time steps are read from the file again), a cache hit saves only the binning. If the trajectory data
+	can be identified otherwise, e.g. by the name, size and modification time of the trajectory file, a ``cache_key``
+	can be given instead, which skips the hashing of the trajectory data.
+
+	:param trajectory: Trajectory object with the particle trajectory data
+	:type trajectory: Trajectory
+	:param xedges: the edges of the density bins in x direction
+	:type xedges: list / array of float
+	:param zedges: the edges of the density bins in z direction
+	:type zedges: list / array of float
+	:param weights: name of a particle attribute to sum in the density bins, the particles are counted if None
+	:type weights: str
+	:param timestep_indices: indices of the time steps to compute the density for, all time steps if None
+	:type timestep_indices: list / array of int
+	:param cache_file: name of a file (numpy ``.npz`` file) to cache the density cube in, no caching if None
+	:type cache_file: str
+	:param cache_key: key identifying the trajectory data in the cache file, the trajectory data is hashed if None
+	:type cache_key: str
+	:param max_chunk_size: maximum number of particles binned at once
+	:type max_chunk_size: int
+	:return: density cube with the shape [number of time steps, number of bins in x, number of bins in z]
+	:rtype: numpy.ndarray
+	"""
+	binning = DensityBinning(xedges, zedges)
+	if timestep_indices is None:
+		timestep_indices = np.arange(trajectory.n_timesteps)
+	timestep_indices = np.asarray(timestep_indices, dtype=np.int64)
+	times = np.asarray(trajectory.times)[timestep_indices]
+	weights_name = '' if weights is None else weights
+
+	if cache_file is not None:
+		if cache_key is not None:
+			fingerprint = 'key:' + str(cache_key)
+		else:
+			fingerprint = _density_cube_fingerprint(trajectory, timestep_indices, weights)
+		density_cube = _load_cached_density_cube(
+			cache_file, binning.xedges, binning.yedges, weights_name, timestep_indices, times, fingerprint)
+		if density_cube is not None:
+			return density_cube
+
+	density_cube = np.zeros((len(timestep_indices),) + binning.shape)
+
+	def bin_chunk(chunk_start, chunk_positions, chunk_weights):
+		frame_indices = np.repeat(np.arange(len(chunk_positions)), [len(p) for p in chunk_positions])
+		positions = np.concatenate(chunk_positions)
+		chunk_weights = [np.concatenate(chunk_weights)] if weights is not None else []
+		density_cube[chunk_start: chunk_start + len(chunk_positions)] = binning.histogram_frames(
+			positions[:, 0], positions[:, 2], frame_indices, len(chunk_positions), *chunk_weights)[-1]
+
+	#  time steps are collected into chunks of at most max_chunk_size particles, which are binned at once
+	chunk_start = 0
+	chunk_positions = []
+	chunk_weights = []
+	chunk_size = 0
+	for i, ts in enumerate(timestep_indices):
+		chunk_positions.append(trajectory.get_positions(ts))
+		if weights is not None:
+			chunk_weights.append(np.ravel(trajectory.particle_attributes.get(weights, ts)))
+		chunk_size += len(chunk_positions[-1])
+
+		if chunk_size >= max_chunk_size or i == len(timestep_indices) - 1:
+			bin_chunk(chunk_start, chunk_positions, chunk_weights)
+			chunk_start = i + 1
+			chunk_positions = []
+			chunk_weights = []
+			chunk_size = 0
+
+	if cache_file is not None:
+		with open(cache_file, 'wb') as cf:
+			np.savez(
+				cf, density_cube=density_cube, xedges=binning.xedges, zedges=binning.yedges,
+				weights=np.array(weights_name), timestep_indices=timestep_indices, times=times,
+				trajectory_fingerprint=np.array(fingerprint))
+
+	return density_cube
+
+
+# Animation rendering ######################
+
+def _ffmpeg_command(result_filename, frame_size, fps, extra_args):
+	"""
+	Assembles the ffmpeg command line which encodes raw RGBA frames read from a pipe into a video file, the encoder
+	parameters are the same as of the ffmpeg movie writer of matplotlib
+	"""
+	codec = mpl.rcParams['animation.codec']
+	if extra_args is None:
+		extra_args = mpl.rcParams['animation.ffmpeg_args']
+
+	output_args = ['-vcodec', codec]
+	if codec == 'h264' and '-pix_fmt' not in extra_args:
+		output_args += ['-pix_fmt', 'yuv420p']  # the h264 default (yuv444p) is not supported by many players
+
+	return [
+		mpl.rcParams['animation.ffmpeg_path'], '-f', 'rawvideo', '-vcodec', 'rawvideo',
+		'-s', '{:d}x{:d}'.format(*frame_size), '-pix_fmt', 'rgba', '-framerate', str(fps),
+		'-loglevel', 'error', '-i', 'pipe:'] + output_args + list(extra_args) + ['-y', result_filename]
+
+
+def _render_frame(figure, update, frame, frame_file, size_inches, dpi, savefig_kwargs):
+	"""
+	Renders an animation frame and writes it as raw RGBA data to a file object
+	"""
+	update(frame)
+	figure.set_size_inches(*size_inches)  # all frames must have the same size
+	with mpl.rc_context({'savefig.bbox': None}):
+		figure.savefig(frame_file, format='rgba', dpi=dpi, **savefig_kwargs)
+
+
+_render_worker_state = {}
+
+
+def _init_render_worker(animation_factory, first_frame, size_inches, dpi, savefig_kwargs):
+	"""
+	Initializes an animation rendering worker process: The worker creates its own animation figure with the animation
+	factory and renders the first frame of the animation once, since artists can keep state from their first rendering
+	(e.g. the color normalization of images is scaled to the data of the first drawn frame)
+	"""
+	figure, update = animation_factory()
+	_render_worker_state.update(
+		{'figure': figure, 'update': update, 'render_parameters': (size_inches, dpi, savefig_kwargs)})
+	_render_frames_worker([first_frame])
+
+
+def _render_frames_worker(frames):
+	"""
+	Renders animation frames in a rendering worker process and returns the raw RGBA data of the frames
+	"""
+	result = []
+	for frame in frames:
+		with io.BytesIO() as frame_buffer:
+			_render_frame(
+				_render_worker_state['figure'], _render_worker_state['update'], frame, frame_buffer,
+				*_render_worker_state['render_parameters'])
+			result.append(frame_buffer.getvalue())
+	return result
+
+
+def save_animation(
+		animation_factory, frames, result_filename, fps=20, extra_args=None, dpi=None,
+		n_workers=None, frames_per_task=8):
+	"""
+	Renders an animation to a video file with ffmpeg.
+
+	The animation is defined by an animation factory, which creates the figure of the animation together with a frame
+	update function, and by the data of the animation frames: Every frame is rendered by calling the update function
+	with the frame data and saving the figure as raw RGBA image, the images are piped into an ffmpeg process which
+	encodes the video.
+
+	With multiple workers, the frames are rendered concurrently by a pool of worker processes: Every worker creates
+	its own animation figure with the animation factory and gets blocks of frame data to render. The rendered frames
+	are written in frame order into the ffmpeg process, thus the resulting video file is identical to the serially
+	rendered video. The update function has therefore to render every frame independently of the previously rendered
+	frames, which is the case for all animations in this module.
+
+	:param animation_factory: Callable without arguments which creates the figure of the animation and returns the
+		figure and the frame update function as tuple ``(figure, update)``. The update function takes the data of a
+		frame and updates the artists of the figure. For parallel rendering, the animation factory has to be picklable
+		(e.g. a module level function or a ``functools.partial`` of it), since it is called in the worker processes.
+	:type animation_factory: callable
+	:param frames: the data of the animation frames, passed to the update function (and transferred to the worker
+		processes with parallel rendering)
+	:type frames: sequence (e.g. list or numpy.ndarray)
+	:param result_filename: name of the video file to write
+	:type result_filename: str
+	:param fps: frames per second in the rendered video
+	:type fps: int
+	:param extra_args: additional ffmpeg arguments, e.g. ``['-vcodec', 'libx264']``
+	:type extra_args: list of str
+	:param dpi: the resolution of the rendered frames, the matplotlib default for saving is used if None
+	:type dpi: float
+	:param n_workers: Number of worker processes which render the frames concurrently. The animation is rendered
+		serially if None or 1.
+	:type n_workers: int
+	:param frames_per_task: number of frames rendered by a worker at once
+	:type frames_per_task: int
+	"""
+	if len(frames) == 0:
+		raise ValueError('The animation has no frames to render')
+
+	figure, update = animation_factory()
+	try:
+		# determine the frame parameters as matplotlib.animation.Animation.save:
+		if dpi is None:
+			dpi = mpl.rcParams['savefig.dpi']
+		if dpi == 'figure':
+			dpi = figure.dpi
+		facecolor = mpl.rcParams['savefig.facecolor']
+		if facecolor == 'auto':
+			facecolor = figure.get_facecolor()
+		r, g, b, a = mcolors.to_rgba(facecolor)
+		savefig_kwargs = {'facecolor': a * np.array([r, g, b]) + 1 - a, 'transparent': False}
+
+		# h264 requires even frame sizes in pixels:
+		if mpl.rcParams['animation.codec'] == 'h264':
+			figure.set_size_inches(*animation.adjusted_figsize(*figure.get_size_inches(), dpi, 2))
+		size_inches = tuple(figure.get_size_inches())
+		frame_size = (int(size_inches[0] * dpi), int(size_inches[1] * dpi))
+
+		command = _ffmpeg_command(result_filename, frame_size, fps, extra_args)
+		ffmpeg = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+		try:
+			if n_workers is None or n_workers <= 1:
+				for frame in frames:
+					_render_frame(figure, update, frame, ffmpeg.stdin, size_inches, dpi, savefig_kwargs)
+			else:
+				with concurrent.futures.ProcessPoolExecutor(
+						max_workers=n_workers, initializer=_init_render_worker,
+						initargs=(animation_factory, frames[0], size_inches, dpi, savefig_kwargs)) as executor:
+
+					# the number of pending frame blocks is limited to bound the memory for rendered frames
+					pending = collections.deque()
+					for i_start in range(0, len(frames), frames_per_task):
+						frame_block = frames[i_start: i_start + frames_per_task]
+						pending.append(executor.submit(_render_frames_worker, frame_block))
+						if len(pending) >= 2 * n_workers:
+							for frame_data in pending.popleft().result():
+								ffmpeg.stdin.write(frame_data)
+
+					while pending:
+						for frame_data in pending.popleft().result():
+							ffmpeg.stdin.write(frame_data)
+
+			_, ffmpeg_errors = ffmpeg.communicate()
+		except BaseException:
+			ffmpeg.kill()
+			ffmpeg.communicate()
+			raise
+
+		if ffmpeg.returncode != 0:
+			raise subprocess.CalledProcessError(ffmpeg.returncode, command, stderr=ffmpeg_errors)
+	finally:
+		plt.close(figure)
+
+
+def _read_project_trajectory(project_name, file_type):
+	"""
+	Reads the trajectory file of a simulation project
+
+	:param project_name: simulation project to read (given as project basename)
+	:type project_name: str
+	:param file_type: type of the trajectory file,
+		'hdf5' for hdf5,
+		'legacy_hdf5' for old legacy hdf5 format,
+		'json' for uncompressed json,
+		'compressed' for compressed json
+	:type file_type: str
+	:return: the trajectory of the simulation project
+	:rtype: Trajectory
+	"""
+	trajectory_file_name = _project_trajectory_file_name(project_name, file_type)
+	if file_type == 'hdf5':
+		return tra.read_hdf5_trajectory_file(trajectory_file_name)
+	elif file_type == 'legacy_hdf5':
+		return tra.read_legacy_hdf5_trajectory_file(trajectory_file_name)
+	else:
+		return tra.read_json_trajectory_file(trajectory_file_name)
+
+
+def _project_trajectory_file_name(project_name, file_type):
+	"""
+	Returns the name of the trajectory file of a simulation project (see :py:func:`_read_project_trajectory`)
+	"""
+	if file_type in ('hdf5', 'legacy_hdf5'):
+		return project_name + "_trajectories.hd5"
+	elif file_type == 'compressed':
+		return project_name + "_trajectories.json.gz"
+	elif file_type == 'json':
+		return project_name + "_trajectories.json"
+	else:
+		raise ValueError('illegal file type flag (not legacy_hdf5, hdf5, json or compressed)')
+
+
+def _file_identity(file_name):
+	"""
+	Returns a string identifying the current content of a file by its absolute path, size and modification time
+	"""
+	file_stat = os.stat(file_name)
+	return '{}:{}:{}'.format(os.path.abspath(file_name), file_stat.st_size, file_stat.st_mtime_ns)
+
+
 # Simple Plot Methods ######################
 
 
@@ -130,14 +597,81 @@ def plot_density_xz(
 
 # density plots #########################################################
 
+def _xz_density_edges(trajectory, xedges, zedges):
+	"""
+	Determines the bin edges of a density plot of a static trajectory in a z-x projection from the density plot
+	parameters (see :py:func:`animate_xz_density`)
+	"""
+	if not trajectory.is_static_trajectory:
+		raise TypeError('XZ density animation is currently only implemented for static trajectories')
+
+	x_pos = trajectory.positions[:, 0, :]
+	z_pos = trajectory.positions[:, 2, :]
+
+	if xedges is None:
+		xedges = np.linspace(np.min(x_pos), np.max(x_pos), 50)
+	elif type(xedges) == int:
+		xedges = np.linspace(np.min(x_pos), np.max(x_pos), xedges)
+
+	if zedges is None:
+		zedges = np.linspace(np.min(z_pos), np.max(z_pos), 50)
+	elif type(zedges) == int:
+		zedges = np.linspace(np.min(z_pos), np.max(z_pos), zedges)
+
+	return np.asarray(xedges, dtype=float), np.asarray(zedges, dtype=float)
+
+
+def _xz_density_frames(trajectory, xedges, zedges, timestep_indices, density_cube):
+	"""
+	Determines the bin edges and the particle densities of the rendered frames of a density animation in a z-x
+	projection (see :py:func:`animate_xz_density`)
+	"""
+	xed, zed = _xz_density_edges(trajectory, xedges, zedges)
+	if density_cube is None:
+		frame_densities = compute_density_cube(trajectory, xed, zed, timestep_indices=timestep_indices)
+	else:
+		frame_densities = density_cube[timestep_indices]
+
+	return xed, zed, frame_densities
+
+
+def _xz_density_figure(xedges, zedges, figsize, axis_equal, first_density):
+	"""
+	Creates the figure of a density animation in a z-x projection and the frame update function, which takes the
+	particle density of a frame (see :py:func:`animate_xz_density`)
+	"""
+	fig = plt.figure(figsize=figsize)
+
+	ax = fig.add_subplot(111)
+	im = NonUniformImage(ax, interpolation='nearest')
+	xcenters = xedges[:-1] + 0.5 * (xedges[1:] - xedges[:-1])
+	zcenters = zedges[:-1] + 0.5 * (zedges[1:] - zedges[:-1])
+	im.set_data(xcenters, zcenters, first_density.T)
+	ax.add_image(im)
+	im.set_extent(im.get_extent())  # workaround for minor issue in matplotlib ocurring in jupyter lab
+	ax.set_xlim(xedges[0], xedges[-1])
+	ax.set_ylim(zedges[0], zedges[-1])
+	if axis_equal:
+		ax.set_aspect('equal')
+
+	def update(density):
+		im.set_data(xcenters, zcenters, density.T)
+
+	return fig, update
+
+
 def animate_xz_density(
 		trajectory,
 		xedges=None, zedges=None,
 		figsize=(7, 7), interval=1, n_frames=10,
-		output_mode='animation', axis_equal=True):
+		output_mode='animation', axis_equal=True, density_cube=None):
 	"""
 	Animates an density plot of a static simulation trajectory in a z-x projection. Still frames can also be rendered.
 
+	The densities of all rendered frames are computed at once before the rendering (see
+	:py:func:`compute_density_cube`). Alternatively, a precomputed density cube for all time steps of the trajectory
+	can be passed, the animation is then rendered without any further binning of particles.
+
 	:param trajectory: Trajectory object with the particle trajectory data to be animated
 	:type trajectory: Trajectory
 	:param xedges: the edges of the bins of the density plot (2d histogram bins) in x direction, 
@@ -156,58 +690,29 @@ def animate_xz_density(
 	:type output_mode: str
 	:param axis_equal: if true, the axis are rendered with equal scaling
 	:type axis_equal: bool
+	:param density_cube: precomputed density cube for all time steps of the trajectory with the given bin edges,
+		computed with :py:func:`compute_density_cube` if None
+	:type density_cube: numpy.ndarray
 
 	:return: animation or figure
 	"""
 
-	if not trajectory.is_static_trajectory:
-		raise TypeError('XZ density animation is currently only implemented for static trajectories')
-
-	x_pos = trajectory.positions[:, 0, :]
-	z_pos = trajectory.positions[:, 2, :]
-
-	x_min = np.min(x_pos)
-	x_max = np.max(x_pos)
-	z_min = np.min(z_pos)
-	z_max = np.max(z_pos)
-
-	if xedges is None:
-		xedges = np.linspace(x_min, x_max, 50)
-	elif type(xedges) == int:
-		xedges = np.linspace(x_min, x_max, xedges)
-
-	if zedges is None:
-		zedges = np.linspace(z_min, z_max, 50)
-	elif type(zedges) == int:
-		zedges = np.linspace(z_min, z_max, zedges)
-
-	hist_vals, xed, zed = np.histogram2d(x_pos[:, 0], z_pos[:, 0], bins=(xedges, zedges))
-	hist_vals = hist_vals.T
-	fig = plt.figure(figsize=figsize)
+	if output_mode == 'singleFrame':
+		timestep_indices = np.array([n_frames * interval])
+	else:
+		timestep_indices = np.arange(n_frames) * interval
 
-	ax = fig.add_subplot(111)
-	im = NonUniformImage(ax, interpolation='nearest')
-	xcenters = xed[:-1] + 0.5 * (xed[1:] - xed[:-1])
-	zcenters = zed[:-1] + 0.5 * (zed[1:] - zed[:-1])
-	im.set_data(xcenters, zcenters, hist_vals)
-	ax.images.append(im)
-	im.set_extent(im.get_extent())  # workaround for minor issue in matplotlib ocurring in jupyter lab
-	ax.set_xlim(xed[0], xed[-1])
-	ax.set_ylim(zed[0], zed[-1])
-	if axis_equal:
-		ax.set_aspect('equal')
+	xed, zed, frame_densities = _xz_density_frames(trajectory, xedges, zedges, timestep_indices, density_cube)
+	fig, update = _xz_density_figure(xed, zed, figsize, axis_equal, frame_densities[0])
 
 	def animate(i):
-		ts_number = i * interval
-		h_vals, _, _ = np.histogram2d(x_pos[:, ts_number], z_pos[:, ts_number], bins=(xedges, zedges))
-		h_vals = h_vals.T
-		im.set_data(xcenters, zcenters, h_vals)
+		update(frame_densities[i])
 
 	if output_mode == 'animation':
 		anim = animation.FuncAnimation(fig, animate, frames=n_frames, blit=False)
 		return anim
 	elif output_mode == 'singleFrame':
-		animate(n_frames)
+		animate(0)
 		return fig
 
 
@@ -215,10 +720,15 @@ def render_xz_density_animation(
 		project_name, result_name,
 		xedges=None, zedges=None,
 		figsize=(7, 7), interval=1, n_frames=None,
-		axis_equal=True, file_type='hdf5'):
+		axis_equal=True, file_type='hdf5', density_cache_file=None, n_workers=None):
 	"""
 	Renders an animation of particle density
 
+	If a density cache file is given, the particle densities of all time steps are cached in the file (see
+	:py:func:`compute_density_cube`), which allows to re-render the animation (e.g. with different intervals) without
+	binning the particles again. The cached densities are identified by the name, size and modification time of the
+	trajectory file, the trajectory data is not hashed.
+
 	:param project_name: simulation project to import and render (given as project basename)
 	:type project_name: str
 	:param result_name: basename for the rendering result
@@ -244,68 +754,41 @@ def render_xz_density_animation(
 		'compressed' for compressed json
 		'hdf5' for compressed hdf5
 	:type file_type: str
+	:param density_cache_file: name of a file to cache the particle densities in, no caching if None
+	:type density_cache_file: str
+	:param n_workers: number of worker processes rendering the animation frames (see :py:func:`save_animation`),
+		the animation is rendered serially if None or 1
+	:type n_workers: int
 	"""
-	if file_type == 'hdf5':
-		file_ext = "_trajectories.hd5"
-		tr = tra.read_hdf5_trajectory_file(project_name + file_ext)
-	elif file_type == 'legacy_hdf5':
-		file_ext = "_trajectories.hd5"
-		tr = tra.read_legacy_hdf5_trajectory_file(project_name + file_ext)
-	elif file_type == 'compressed':
-		file_ext = "_trajectories.json.gz"
-		tr = tra.read_json_trajectory_file(project_name + file_ext)
-	elif file_type == 'json':
-		file_ext = "_trajectories.json"
-		tr = tra.read_json_trajectory_file(project_name + file_ext)
-	else:
-		raise ValueError('illegal file type flag (not hdf5, json or compressed)')
+	tr = _read_project_trajectory(project_name, file_type)
 
 	if not n_frames:
 		n_frames = tr.n_timesteps
 
-	ani = animate_xz_density(
-		tr, xedges=xedges, zedges=zedges, n_frames=n_frames, figsize=figsize,
-		axis_equal=axis_equal, interval=interval, output_mode='animation')
+	density_cube = None
+	if density_cache_file is not None:
+		xedges, zedges = _xz_density_edges(tr, xedges, zedges)
+		density_cube = compute_density_cube(
+			tr, xedges, zedges, cache_file=density_cache_file,
+			cache_key=_file_identity(_project_trajectory_file_name(project_name, file_type)))
 
-	ani.save(result_name + "_densityXZ.mp4", fps=20, extra_args=['-vcodec', 'libx264'])
+	# the densities are computed once, the rendering workers get only the densities of the frames they render:
+	xedges, zedges, frame_densities = _xz_density_frames(
+		tr, xedges, zedges, np.arange(n_frames) * interval, density_cube)
 
+	animation_factory = functools.partial(_xz_density_figure, xedges, zedges, figsize, axis_equal, frame_densities[0])
+	save_animation(
+		animation_factory, frame_densities, result_name + "_densityXZ.mp4", fps=20, extra_args=['-vcodec', 'libx264'],
+		n_workers=n_workers)
 
-def animate_xz_density_comparison_plot(
-		trajectories, selected, n_frames, interval,
-		select_mode='substance', output_mode='video', mode='lin',
-		s_lim=3, n_bins=100, basesize=17, alpha=1, colormap=plt.cm.coolwarm,
-		annotate_string=""):
-	"""
-	Animate the densities of two mostly symmetric ion clouds (probably from a QIT simulation) in a z-x projection.
-	The ion ensembles have to have an invariant number of particles across all time steps (static simulation
-	trajectories).
 
-	:param trajectories: Tuple of two Trajectory objects with the data to animate
-	:type trajectories: tuple of Trajectory
-	:param selected: two element list with values to select particles which should be rendered
-	:type selected: list of two selector values
-	:param n_frames: number of frames to export
-	:type n_frames: int
-	:param interval: interval in terms of data frames in the input data between the animation frames
-	:type interval: int
-	:param select_mode: defines the mode for selection of particles:
-		None for not selecting at all,
-		"mass" for selecting by mass,
-		"substance" for chemical substance / chemical id
-	:param output_mode: render either a video ("video") or single frames as image files ("singleFrame")
-	:param mode: scale density linearly ("lin") or logarithmically ("log")
-	:param s_lim: spatial limits of the rendered spatial domain
-			(given as distance from the origin of the coordinate system or explicit limits: [xlo, xhi, zlo, zhi]
-	:param n_bins: number of density bins in the spatial directions or list of bin numbers ([x z])
-	:type n_bins: int or list of two ints
-	:param basesize: the base (vertical) size of the plot
-	:type basesize: float
-	:param alpha: blending factor for graphical blending the densities of the two species
-	:param colormap: a colormap for the density rendering (a pure species will end up on one side of the colormap)
-	:param annotate_string: an optional string which is rendered into the animation as annotation
-	:return: animation object or figure (depends on the file mode)
+def _xz_density_comparison_frames(
+		trajectories, selected, n_frames, interval, select_mode, output_mode, s_lim, n_bins, density_cubes):
+	"""
+	Determines the spatial limits, the bin edges and the frame data (the particle densities of the selected particles
+	of both trajectories and the time) of the rendered frames of a density comparison animation in a z-x projection
+	(see :py:func:`animate_xz_density_comparison_plot`)
 	"""
-
 	if select_mode is None:
 		select_parameter = None
 	elif select_mode == 'mass':
@@ -337,21 +820,6 @@ def animate_xz_density_comparison_plot(
 			'number of frames * interval (' + str(n_frames * interval) +
 			') is longer than trajectory (' + str(len(times_a)) + ')')
 
-	if selected[0] == "all":
-		dat_a = trajectories[0]
-	else:
-		dat_a = tra.select(trajectories[0], select_parameter[0], selected[0])
-
-	if selected[1] == "all":
-		dat_b = trajectories[1]
-	else:
-		dat_b = tra.select(trajectories[1], select_parameter[1], selected[1])
-
-	if output_mode == 'video':
-		plt.figure(figsize=[10, 10])
-	elif output_mode == 'singleFrame':
-		plt.figure(figsize=[6, 6])
-
 	if not hasattr(s_lim, "__iter__"):  # is not iterable
 		limits = [-s_lim, s_lim, -s_lim, s_lim]
 	else:
@@ -364,6 +832,36 @@ def animate_xz_density_comparison_plot(
 
 	xedges = np.linspace(limits[0], limits[1], bins[0])
 	zedges = np.linspace(limits[2], limits[3], bins[1])
+
+	if output_mode == 'singleFrame':
+		timestep_indices = np.array([n_frames * interval])
+	else:
+		timestep_indices = np.arange(n_frames) * interval
+
+	if density_cubes is None:
+		frame_densities = []
+		for i_tra in range(2):
+			if selected[i_tra] == "all":
+				dat = trajectories[i_tra]
+			else:
+				dat = tra.select(trajectories[i_tra], select_parameter[i_tra], selected[i_tra])
+			frame_densities.append(compute_density_cube(dat, xedges, zedges, timestep_indices=timestep_indices))
+	else:
+		frame_densities = [cube[timestep_indices] for cube in density_cubes]
+
+	frames = [
+		(frame_densities[0][i], frame_densities[1][i], times_a[ts_number])
+		for i, ts_number in enumerate(timestep_indices)]
+
+	return limits, xedges, zedges, frames
+
+
+def _xz_density_comparison_figure(limits, xedges, zedges, mode, basesize, alpha, colormap, annotate_string):
+	"""
+	Creates the figure of a density comparison animation in a z-x projection and the frame update function, which
+	takes the particle densities of both trajectories and the time of a frame
+	(see :py:func:`animate_xz_density_comparison_plot`)
+	"""
 	h_vals = np.random.rand(len(xedges), len(zedges))
 	fig_ratio = (limits[3] - limits[2]) / (limits[1] - limits[0])
 	fig = plt.figure(figsize=(basesize, basesize * fig_ratio + basesize / 10.0))
@@ -381,16 +879,10 @@ def animate_xz_density_comparison_plot(
 	plt.xlabel("x (mm)")
 	plt.ylabel("z (mm)")
 
-	def animate(i):
-		ts_number = i * interval
-
-		x_a = dat_a.get_positions(ts_number)[:, 0]
-		z_a = dat_a.get_positions(ts_number)[:, 2]
-		h_a, zedges2, xedges2 = np.histogram2d(z_a, x_a, bins=(zedges, xedges))
-
-		x_b = dat_b.get_positions(ts_number)[:, 0]
-		z_b = dat_b.get_positions(ts_number)[:, 2]
-		h_b, zedges2, xedges2 = np.histogram2d(z_b, x_b, bins=(zedges, xedges))
+	def update(frame):
+		density_a, density_b, time = frame
+		h_a = density_a.T
+		h_b = density_b.T
 
 		nf_a = np.max(h_a)
 		nf_b = np.max(h_b)
@@ -413,16 +905,77 @@ def animate_xz_density_comparison_plot(
 			img_data_rgb[:, :, 3] = abs_dens_log * alpha
 
 		im1.set_array(img_data_rgb)
-		text_time.set_text("t=" + str(times_a[ts_number]) + u"s" + " " + annotate_string)
+		text_time.set_text("t=" + str(time) + u"s" + " " + annotate_string)
 
 		return im1
 
+	return fig, update
+
+
+def animate_xz_density_comparison_plot(
+		trajectories, selected, n_frames, interval,
+		select_mode='substance', output_mode='video', mode='lin',
+		s_lim=3, n_bins=100, basesize=17, alpha=1, colormap=plt.cm.coolwarm,
+		annotate_string="", density_cubes=None):
+	"""
+	Animate the densities of two mostly symmetric ion clouds (probably from a QIT simulation) in a z-x projection.
+	The ion ensembles have to have an invariant number of particles across all time steps (static simulation
+	trajectories).
+
+	The densities of all rendered frames are computed at once before the rendering (see
+	:py:func:`compute_density_cube`). Alternatively, precomputed density cubes of the selected particles for all time
+	steps can be passed.
+
+	:param trajectories: Tuple of two Trajectory objects with the data to animate
+	:type trajectories: tuple of Trajectory
+	:param selected: two element list with values to select particles which should be rendered
+	:type selected: list of two selector values
+	:param n_frames: number of frames to export
+	:type n_frames: int
+	:param interval: interval in terms of data frames in the input data between the animation frames
+	:type interval: int
+	:param select_mode: defines the mode for selection of particles:
+		None for not selecting at all,
+		"mass" for selecting by mass,
+		"substance" for chemical substance / chemical id
+	:param output_mode: render either a video ("video") or single frames as image files ("singleFrame")
+	:param mode: scale density linearly ("lin") or logarithmically ("log")
+	:param s_lim: spatial limits of the rendered spatial domain
+			(given as distance from the origin of the coordinate system or explicit limits: [xlo, xhi, zlo, zhi]
+	:param n_bins: number of density bins in the spatial directions or list of bin numbers ([x z])
+	:type n_bins: int or list of two ints
+	:param basesize: the base (vertical) size of the plot
+	:type basesize: float
+	:param alpha: blending factor for graphical blending the densities of the two species
+	:param colormap: a colormap for the density rendering (a pure species will end up on one side of the colormap)
+	:param annotate_string: an optional string which is rendered into the animation as annotation
+	:param density_cubes: precomputed density cubes of the selected particles of the two trajectories for all time
+		steps with the bin edges given by ``s_lim`` and ``n_bins``, computed with :py:func:`compute_density_cube`
+		if None
+	:type density_cubes: tuple of two numpy.ndarray
+	:return: animation object or figure (depends on the file mode)
+	"""
+
+	limits, xedges, zedges, frames = _xz_density_comparison_frames(
+		trajectories, selected, n_frames, interval, select_mode, output_mode, s_lim, n_bins, density_cubes)
+
+	if output_mode == 'video':
+		plt.figure(figsize=[10, 10])
+	elif output_mode == 'singleFrame':
+		plt.figure(figsize=[6, 6])
+
+	fig, update = _xz_density_comparison_figure(
+		limits, xedges, zedges, mode, basesize, alpha, colormap, annotate_string)
+
+	def animate(i):
+		return update(frames[i])
+
 	# call the animator.  blit=True means only re-draw the parts that have changed.
 	if output_mode == 'video':
 		anim = animation.FuncAnimation(fig, animate, frames=n_frames, blit=False)
 		return anim
 	elif output_mode == 'singleFrame':
-		animate(n_frames)
+		animate(0)
 		return fig
 
 
@@ -430,7 +983,7 @@ def render_xz_density_comparison_animation(
 		project_names, selected, result_name,
 		select_mode='substance', n_frames=400, interval=1,
 		s_lim=7, n_bins=50, base_size=12,
-		annotation="", mode="lin", file_type='hdf5'):
+		annotation="", mode="lin", file_type='hdf5', n_workers=None):
 	"""
 	Reads two trajectories, renders XZ density projection of two ion clouds in the trajectories and writes
 	a video file with the result.
@@ -461,70 +1014,29 @@ def render_xz_density_comparison_animation(
 		'legacy_hdf5' for old legacy hdf5 format,
 		'json' for uncompressed json,
 		'compressed' for compressed json
-
+	:param n_workers: number of worker processes rendering the animation frames (see :py:func:`save_animation`),
+		the animation is rendered serially if None or 1
+	:type n_workers: int
 	"""
+	trajectories = tuple([_read_project_trajectory(pn, file_type) for pn in project_names])
 
-	if file_type == 'hdf5':
-		file_ext = "_trajectories.hd5"
-		tj0 = tra.read_hdf5_trajectory_file(project_names[0] + file_ext)
-		tj1 = tra.read_hdf5_trajectory_file(project_names[1] + file_ext)
-	elif file_type == 'legacy_hdf5':
-		file_ext = "_trajectories.hd5"
-		tj0 = tra.read_legacy_hdf5_trajectory_file(project_names[0] + file_ext)
-		tj1 = tra.read_legacy_hdf5_trajectory_file(project_names[1] + file_ext)
-	elif file_type == 'compressed':
-		file_ext = "_trajectories.json.gz"
-		tj0 = tra.read_json_trajectory_file(project_names[0] + file_ext)
-		tj1 = tra.read_json_trajectory_file(project_names[1] + file_ext)
-	elif file_type == 'json':
-		file_ext = "_trajectories.json"
-		tj0 = tra.read_json_trajectory_file(project_names[0] + file_ext)
-		tj1 = tra.read_json_trajectory_file(project_names[1] + file_ext)
-	else:
-		raise ValueError('illegal file type flag (not hdf5, json or compressed)')
+	# the densities are computed once, the rendering workers get only the densities of the frames they render:
+	limits, xedges, zedges, frames = _xz_density_comparison_frames(
+		trajectories, selected, n_frames, interval, select_mode, 'video', s_lim, n_bins, None)
 
-	anim = animate_xz_density_comparison_plot(
-		(tj0, tj1), selected, n_frames, interval,
-		mode=mode, s_lim=s_lim, select_mode=select_mode, n_bins=n_bins,
-		basesize=base_size, annotate_string=annotation)
-	anim.save(result_name + "_densitiesComparisonXZ.mp4", fps=20, extra_args=['-vcodec', 'libx264'])
+	animation_factory = functools.partial(
+		_xz_density_comparison_figure, limits, xedges, zedges, mode, base_size, 1, plt.cm.coolwarm, annotation)
+	save_animation(
+		animation_factory, frames, result_name + "_densitiesComparisonXZ.mp4", fps=20,
+		extra_args=['-vcodec', 'libx264'], n_workers=n_workers)
 
 
 # scatter plots #############################################################
-def animate_scatter_plot(
-		trajectory, xlim=None, ylim=None, zlim=None,
-		n_frames=None, interval=1,
-		color_parameter=None, crange=None, cmap=plt.cm.get_cmap('viridis'),
-		alpha=0.1, figsize=(13, 5)):
+def _static_scatter_frames(trajectory, xlim, ylim, zlim, n_frames, interval, color_parameter, crange):
 	"""
-	Generates a scatter animation of the particles in a static ion trajectory.
-
-	:param trajectory: Static particle trajectory with data to animate
-	:type trajectory: Trajectory
-	:param xlim: limits of the plot in x direction (if None, the maximum of the x position range is used)
-	:type xlim: tuple of two floats
-	:param ylim: limits of the plot in y direction (if None, the maximum of the y position range is used)
-	:type ylim: tuple of two floats
-	:param zlim: limits of the plot in z direction (if None, the maximum of the z position range is used)
-	:type zlim: tuple of two floats
-	:param n_frames: number of rendered frames, (if None the maximum number of frames is rendered)
-	:type n_frames: int
-	:param interval: interval in terms of data frames in the input data between the animation frames
-	:type interval: int
-	:param color_parameter: name of an additional parameter of the trajectory used for coloring or a vector of manual
-		values for coloring
-	:type color_parameter: str or iterable (ndarray, list, tuple)
-	:param crange: manual color range, given as tuple. Colormap spans from c_range[0] to c_range[1]
-	:type crange: two element tuple of numeric
-	:param cmap: a matplotlib colormap for colorization of the scatter plot
-	:type cmap: matplotlib.colors.Colormap
-	:param alpha: an alpha value for the plots
-	:type alpha: float
-	:return: an animation object with the animation
-	:param figsize: size of the figure of the plot
-	:type figsize: tuple of two numbers
+	Determines the frame data (particle positions, color values and time), the plot limits and the color range of the
+	rendered frames of a scatter animation of a static trajectory (see :py:func:`animate_scatter_plot`)
 	"""
-	fig = plt.figure(figsize=figsize)
 	positions = trajectory.positions
 	n_timesteps = trajectory.n_timesteps
 
@@ -545,80 +1057,153 @@ def animate_scatter_plot(
 			'number of frames * interval (' + str(n_frames * interval) +
 			') is longer than trajectory (' + str(n_timesteps) + ')')
 
-	def create_plot(xindex, yindex, x_li, y_li):
-		if color_parameter is None:
-			scatterplot = plt.scatter(positions[:, xindex, 0], positions[:, yindex, 0], s=10, alpha=alpha)
-		else:
-			if crange is None:
-				frame_range_max = np.max(c_param)
-				frame_range_min = np.min(c_param)
-				scatterplot = plt.scatter(
-					positions[:, xindex, 0], positions[:, yindex, 0], s=10,
-					alpha=alpha, c=c_param[:, 0],
-					vmin=frame_range_min, vmax=frame_range_max, cmap=cmap)
-			else:
-				scatterplot = plt.scatter(
-					positions[:, xindex, 0], positions[:, yindex, 0], s=10,
-					alpha=alpha, c=c_param[:, 0], vmin=crange[0], vmax=crange[1], cmap=cmap)
+	limits = []
+	for dim, lim in enumerate((xlim, ylim, zlim)):
+		if not lim:
+			lim = (np.min(positions[:, dim, :]), np.max(positions[:, dim, :]))
+		limits.append(lim)
 
-		if y_li:
-			plt.ylim(y_li)
-		else:
-			plt.ylim((np.min(positions[:, yindex, :]), np.max(positions[:, yindex, :])))
+	if c_param is not None and crange is None:
+		crange = (np.min(c_param), np.max(c_param))
+
+	frames = [
+		(positions[:, :, ts], None if c_param is None else c_param[:, ts], trajectory.times[ts])
+		for ts in np.arange(n_frames) * interval]
+
+	return frames, limits, c_param is not None, crange
+
+
+def _variable_scatter_frames(trajectory, xlim, ylim, zlim, n_frames, interval, color_parameter, crange):
+	"""
+	Determines the frame data (particle positions, color values and time), the plot limits and the color range of the
+	rendered frames of a scatter animation of a trajectory with varying particle number
+	(see :py:func:`animate_variable_scatter_plot`)
+	"""
+	n_timesteps = trajectory.n_timesteps
+
+	if not n_frames:
+		n_frames = int(np.floor(n_timesteps / interval))
+
+	if n_frames * interval > n_timesteps:
+		raise ValueError(
+			'number of frames * interval (' + str(n_frames * interval) +
+			') is longer than trajectory (' + str(n_timesteps) + ')')
+
+	timestep_indices = np.arange(n_frames) * interval
+	frame_positions = [trajectory.get_positions(ts) for ts in timestep_indices]
+
+	frame_c_param = None
+	if not (color_parameter is None):
+		if type(color_parameter) is str:
+			frame_c_param = [
+				np.asarray(trajectory.particle_attributes.get(color_parameter, ts)) for ts in timestep_indices]
+		elif hasattr(color_parameter, "__iter__"):  # is iterable
+			color_parameter = list(color_parameter)
+			if len(color_parameter) != n_timesteps:
+				raise ValueError(
+					'custom color parameter has ' + str(len(color_parameter)) +
+					' value vectors, one per time step (' + str(n_timesteps) + ') is required')
+			frame_c_param = [np.asarray(color_parameter[ts]) for ts in timestep_indices]
+
+		for fpos, fcp in zip(frame_positions, frame_c_param):
+			if len(fcp) != fpos.shape[0]:
+				raise ValueError('length of the color parameter differs from the number of particles in a frame')
+
+	# limits and color range from all rendered frames in one pass:
+	all_positions = np.concatenate([fpos[:, :3] for fpos in frame_positions])
+	if all_positions.shape[0] > 0:
+		pos_min = np.min(all_positions, axis=0)
+		pos_max = np.max(all_positions, axis=0)
+	else:
+		pos_min = np.zeros(3)
+		pos_max = np.ones(3)
+
+	if not xlim:
+		xlim = (pos_min[0], pos_max[0])
+	if not ylim:
+		ylim = (pos_min[1], pos_max[1])
+	if not zlim:
+		zlim = (pos_min[2], pos_max[2])
+
+	if frame_c_param is not None and crange is None:
+		all_c_param = np.concatenate(frame_c_param)
+		if all_c_param.shape[0] > 0:
+			crange = (np.min(all_c_param), np.max(all_c_param))
+
+	frames = [
+		(frame_positions[i], None if frame_c_param is None else frame_c_param[i], trajectory.times[ts])
+		for i, ts in enumerate(timestep_indices)]
+
+	return frames, (xlim, ylim, zlim), frame_c_param is not None, crange
 
-		if x_li:
-			plt.xlim(x_li)
-		else:
-			plt.xlim((np.min(positions[:, xindex, :]), np.max(positions[:, xindex, :])))
 
+def _scatter_figure(limits, colored, crange, cmap, alpha, figsize, blit=False):
+	"""
+	Creates the figure of a scatter animation and the frame update function, which takes the particle positions, the
+	color values (None if not colored) and the time of a frame. If the animation is blitted, the time annotation is
+	placed inside the axes, since blitting only restores the axes regions.
+	"""
+	xlim, ylim, zlim = limits
+	fig = plt.figure(figsize=figsize)
 
+	def create_plot(x_li, y_li):
+		if not colored:
+			scatterplot = plt.scatter(np.empty(0), np.empty(0), s=10, alpha=alpha)
+		else:
+			scatterplot = plt.scatter(np.empty(0), np.empty(0), s=10, alpha=alpha, c=np.empty(0), cmap=cmap)
+			if crange is not None:
+				scatterplot.set_clim(crange[0], crange[1])
+
+		plt.xlim(x_li)
+		plt.ylim(y_li)
 		return scatterplot
 
-	plt.subplot(1, 2, 1)
-	scat_xy = create_plot(0, 1, xlim, ylim)
+	ax_xy = plt.subplot(1, 2, 1)
+	scat_xy = create_plot(xlim, ylim)
 	plt.xlabel("x position")
 	plt.ylabel("y position")
 
 	plt.subplot(1, 2, 2)
-	scat_xz = create_plot(0, 2, xlim, zlim)
+	scat_xz = create_plot(xlim, zlim)
 	plt.xlabel("x position")
 	plt.ylabel("z position")
 
-	text_time = plt.annotate(
-		"t=xxx", xy=(0.02, 0.96), xycoords="figure fraction",
-		horizontalalignment="left", verticalalignment="top",
-		fontsize=13);
+	if blit:
+		text_time = ax_xy.annotate(
+			"", xy=(0.02, 0.98), xycoords="axes fraction",
+			horizontalalignment="left", verticalalignment="top",
+			fontsize=13)
+	else:
+		text_time = plt.annotate(
+			"t=xxx", xy=(0.02, 0.96), xycoords="figure fraction",
+			horizontalalignment="left", verticalalignment="top",
+			fontsize=13)
 
-	def update_scatter_plot(i, pos, scat1, scat2, text_time):
-		ts = i * interval
-		time = trajectory.times[ts]
-		scat1.set_offsets(np.transpose(np.vstack([pos[:, 0, ts], pos[:, 1, ts]])))
-		scat2.set_offsets(np.transpose(np.vstack([pos[:, 0, ts], pos[:, 2, ts]])))
+	def update(frame):
+		positions, c_values, time = frame
+		scat_xy.set_offsets(positions[:, [0, 1]])
+		scat_xz.set_offsets(positions[:, [0, 2]])
 
-		if not (c_param is None):
-			scat1.set_array(c_param[:, ts])
-			scat2.set_array(c_param[:, ts])
+		if c_values is not None:
+			scat_xy.set_array(c_values)
+			scat_xz.set_array(c_values)
 
 		text_time.set_text(u"t= {: .2e} s".format(time))
 
-		return scat1, scat2, text_time
+		return scat_xy, scat_xz, text_time
 
-	ani = animation.FuncAnimation(
-		fig, update_scatter_plot, frames=range(n_frames),
-		fargs=(positions, scat_xy, scat_xz, text_time))
-	return ani
+	return fig, update
 
-def animate_variable_scatter_plot(
-		trajectory, xlim=None, ylim=None, zlim=None, n_frames=None, interval=1,
-		color_parameter=None, crange=None, cmap=plt.cm.get_cmap('viridis'), alpha=0.1, figsize=(13, 5)):
-	"""
-	TODO:/ FIXME: Usage of color parameter is not yet implemented
-	(only color parameter as aux parameter here)
 
-	Generates a scatter animation of the particles in an ion trajectory
-	with varying particle number in the simulation frames
+def animate_scatter_plot(
+		trajectory, xlim=None, ylim=None, zlim=None,
+		n_frames=None, interval=1,
+		color_parameter=None, crange=None, cmap=plt.cm.get_cmap('viridis'),
+		alpha=0.1, figsize=(13, 5)):
+	"""
+	Generates a scatter animation of the particles in a static ion trajectory.
 
-	:param trajectory: a particle trajectory to be animated
+	:param trajectory: Static particle trajectory with data to animate
 	:type trajectory: Trajectory
 	:param xlim: limits of the plot in x direction (if None, the maximum of the x position range is used)
 	:type xlim: tuple of two floats
@@ -643,111 +1228,62 @@ def animate_variable_scatter_plot(
 	:param figsize: size of the figure of the plot
 	:type figsize: tuple of two numbers
 	"""
-	fig = plt.figure(figsize=figsize)
-	n_timesteps = trajectory.n_timesteps
-	pos = trajectory.positions
-
-	if trajectory.particle_attributes:
-		p_attrib = trajectory.particle_attributes
-		p_attrib_names = trajectory.particle_attributes.attribute_names
-
-	c_param = None
-	if not (color_parameter is None):
-
-		if type(color_parameter) is str:
-			c_param = p_attrib.get(color_parameter)
-		elif hasattr(color_parameter, "__iter__"):  # is iterable
-			raise NotImplementedError('Usage of a custom color parameter array is not yet implemented')
-			#  c_param = np.tile(color_parameter, (n_timesteps, 1)).T
-
-	if not n_frames:
-		n_frames = int(np.floor(n_timesteps / interval))
-
-	if n_frames * interval > n_timesteps:
-		raise ValueError(
-			'number of frames * interval (' + str(n_frames * interval) +
-			') is longer than trajectory (' + str(n_timesteps) + ')')
-
-	def render_scatter_plot(i):
-		plt.clf()  # clear figure for a fresh plot
-
-		ts_pos = pos[i]
-
-		if ts_pos.shape[0] == 0:
-			empty_frame = True
-		else:
-			empty_frame = False
-
-		# ts_ap = ap[i]
+	frames, limits, colored, crange = _static_scatter_frames(
+		trajectory, xlim, ylim, zlim, n_frames, interval, color_parameter, crange)
+	fig, update = _scatter_figure(limits, colored, crange, cmap, alpha, figsize)
 
-		plt.subplot(1, 2, 1)
-		if color_parameter is None:
-			plt.scatter(ts_pos[:, 0], ts_pos[:, 1], s=10, alpha=alpha)
-		else:
-			# ts_cp = c_param[i]
-			if crange is None:
-				plt.scatter(ts_pos[:, 0], ts_pos[:, 1], s=10, alpha=alpha, c=c_param[i], cmap=cmap)
-			else:
-				plt.scatter(ts_pos[:, 0], ts_pos[:, 1], s=10, alpha=alpha,
-				            c=c_param[i], vmin=crange[0], vmax=crange[1], cmap=cmap)
-
-		plt.xlabel("x position")
-		plt.ylabel("y position")
-
-		if ylim:
-			plt.ylim(ylim)
-		elif not empty_frame:
-			plt.ylim((np.min(ts_pos[:, 1]), np.max(ts_pos[:, 1])))
-		else:
-			plt.ylim(0, 1)
-
-		if xlim:
-			plt.xlim(xlim)
-		elif not empty_frame:
-			plt.xlim((np.min(ts_pos[:, 0]), np.max(ts_pos[:, 0])))
-		else:
-			plt.xlim(0, 1)
+	ani = animation.FuncAnimation(fig, update, frames=frames)
+	return ani
 
-		plt.subplot(1, 2, 2)
-		if color_parameter is None:
-			plt.scatter(ts_pos[:, 0], ts_pos[:, 2], s=10, alpha=alpha)
-		else:
-			if crange is None:
-				plt.scatter(ts_pos[:, 0], ts_pos[:, 2], s=10, alpha=alpha, c=c_param[i], cmap=cmap)
-			else:
-				plt.scatter(ts_pos[:, 0], ts_pos[:, 2], s=10, alpha=alpha,
-				            c=c_param[i], vmin=crange[0], vmax=crange[1], cmap=cmap)
-		plt.xlabel("x position")
-		plt.ylabel("z position")
-
-		if zlim:
-			plt.ylim(zlim)
-		elif not empty_frame:
-			plt.ylim((np.min(ts_pos[:, 2]), np.max(ts_pos[:, 2])))
-		else:
-			plt.ylim(0, 1)
 
+def animate_variable_scatter_plot(
+		trajectory, xlim=None, ylim=None, zlim=None, n_frames=None, interval=1,
+		color_parameter=None, crange=None, cmap=plt.cm.get_cmap('viridis'), alpha=0.1, figsize=(13, 5)):
+	"""
+	Generates a scatter animation of the particles in an ion trajectory
+	with varying particle number in the simulation frames
 
-		if xlim:
-			plt.xlim(xlim)
-		elif not empty_frame:
-			plt.xlim((np.min(ts_pos[:, 0]), np.max(ts_pos[:, 0])))
-		else:
-			plt.xlim(0, 1)
+	The scatter plot artists are created once and updated for every frame, the animation supports blitting. Plot
+	limits and the color range which are not given explicitly are determined from all rendered frames.
 
-		text_time = plt.annotate(
-			u"t= {: .2e} s".format(trajectory.times[i]), xy=(0.02, 0.96), xycoords="figure fraction",
-			horizontalalignment="left", verticalalignment="top",
-			fontsize=13);
+	:param trajectory: a particle trajectory to be animated
+	:type trajectory: Trajectory
+	:param xlim: limits of the plot in x direction (if None, the maximum of the x position range is used)
+	:type xlim: tuple of two floats
+	:param ylim: limits of the plot in y direction (if None, the maximum of the y position range is used)
+	:type ylim: tuple of two floats
+	:param zlim: limits of the plot in z direction (if None, the maximum of the z position range is used)
+	:type zlim: tuple of two floats
+	:param n_frames: number of rendered frames, (if None the maximum number of frames is rendered)
+	:type n_frames: int
+	:param interval: interval in terms of data frames in the input data between the animation frames
+	:type interval: int
+	:param color_parameter: name of an additional parameter of the trajectory used for coloring or custom values
+		for coloring, given as sequence with one vector of values per time step of the trajectory (the vectors have
+		the lengths of the particle numbers in the time steps)
+	:type color_parameter: str or iterable of iterables
+	:param crange: manual color range, given as tuple. Colormap spans from c_range[0] to c_range[1]
+	:type crange: two element tuple of numeric
+	:param cmap: a matplotlib colormap for colorization of the scatter plot
+	:type cmap: matplotlib.colors.Colormap
+	:param alpha: an alpha value for the plots
+	:type alpha: float
+	:return: an animation object with the animation
+	:param figsize: size of the figure of the plot
+	:type figsize: tuple of two numbers
+	"""
+	frames, limits, colored, crange = _variable_scatter_frames(
+		trajectory, xlim, ylim, zlim, n_frames, interval, color_parameter, crange)
+	fig, update = _scatter_figure(limits, colored, crange, cmap, alpha, figsize, blit=True)
 
-	ani = animation.FuncAnimation(fig, render_scatter_plot, frames=range(n_frames))
+	ani = animation.FuncAnimation(fig, update, frames=frames, blit=True)
 	return ani
 
 
 def render_scatter_animation(
 		project_name, result_name, xlim=None, ylim=None, zlim=None, n_frames=None, interval=1,
 		color_parameter=None, crange=None, cmap=plt.cm.get_cmap('viridis'), alpha=0.1, fps=20,
-		figsize=(13, 5), file_type='hdf5'):
+		figsize=(13, 5), file_type='hdf5', n_workers=None):
 	"""
 	Reads an ion trajectory file, generates a scatter animation of the particles in an ion trajectory and
 	writes a video file with the animation
@@ -784,29 +1320,21 @@ def render_scatter_animation(
 		'compressed' for compressed json
 		'hdf5' for compressed hdf5
 	:type file_type: str
+	:param n_workers: number of worker processes rendering the animation frames (see :py:func:`save_animation`),
+		the animation is rendered serially if None or 1
+	:type n_workers: int
 	"""
-	if file_type == 'hdf5':
-		file_ext = "_trajectories.hd5"
-		tr = tra.read_hdf5_trajectory_file(project_name + file_ext)
-	elif file_type == 'legacy_hdf5':
-		file_ext = "_trajectories.hd5"
-		tr = tra.read_legacy_hdf5_trajectory_file(project_name + file_ext)
-	elif file_type == 'compressed':
-		file_ext = "_trajectories.json.gz"
-		tr = tra.read_json_trajectory_file(project_name + file_ext)
-	elif file_type == 'json':
-		file_ext = "_trajectories.json"
-		tr = tra.read_json_trajectory_file(project_name + file_ext)
-	else:
-		raise ValueError('illegal file type flag (not legacy_hdf5, hdf5, json or compressed)')
+	tr = _read_project_trajectory(project_name, file_type)
 
 	if tr.is_static_trajectory:
-		plot_fct = animate_scatter_plot
+		frames, limits, colored, crange = _static_scatter_frames(
+			tr, xlim, ylim, zlim, n_frames, interval, color_parameter, crange)
 	else:
-		plot_fct = animate_variable_scatter_plot
-
-	ani = plot_fct(
-		tr, xlim=xlim, ylim=ylim, zlim=zlim, n_frames=n_frames, interval=interval,
-		color_parameter=color_parameter, crange=crange, cmap=cmap, alpha=alpha, figsize=figsize)
-
-	ani.save(result_name + "_scatter.mp4", fps=fps, extra_args=['-vcodec', 'libx264'])
+		frames, limits, colored, crange = _variable_scatter_frames(
+			tr, xlim, ylim, zlim, n_frames, interval, color_parameter, crange)
+
+	animation_factory = functools.partial(
+		_scatter_figure, limits, colored, crange, cmap, alpha, figsize, not tr.is_static_trajectory)
+	save_animation(
+		animation_factory, frames, result_name + "_scatter.mp4", fps=fps, extra_args=['-vcodec', 'libx264'],
+		n_workers=n_workers)
@@ -3,12 +3,28 @@
 import numpy as np
 import gzip
 import io
+import os
+import json
+import hashlib
+import itertools
+import collections
+from .._cache_util import write_cache_entry
 
 
-def import_comsol_3d_csv_grid(filename):
+def import_comsol_3d_csv_grid(filename, field_names=None, cache=False, cache_dir=None):
 	"""
 	Imports a csv file with multiple 3d scalar fields exported from comsol.
 
+	The file is parsed as stream: The data of the individual fields is parsed block wise directly into the field
+	arrays, the file content is never held in memory as a whole. The data arrays of the fields are transposed views
+	(in x,y,z index order) on the data in the order of the csv file.
+
+	With ``cache`` set, the imported grid points and fields are stored as binary ``.npy`` files in a cache directory.
+	Repeated imports of the unmodified file load the cached data as memory mapped arrays instead of parsing the
+	file again. A cache entry is valid as long as the modification time and the size of the csv file are unchanged,
+	or, if the modification time has changed, as long as the content hash of the csv file is unchanged. The field
+	data of an import from the cache is read only.
+
 	  Result dictionary contains:
 
 	    * grid_points: Array of vectors with the positions of the grid points in the x,y,z directions
@@ -16,28 +32,169 @@ def import_comsol_3d_csv_grid(filename):
 	    * fields: Array of scalar fields, which are dictionaries with a name and the scalar data in 'data'
 
 	:param str filename: the file name to import
+	:param field_names: Names of the fields to import (e.g. ``['% V (V)']``), all fields are imported if None.
+		The data of the other fields is skipped without parsing.
+	:type field_names: list of str
+	:param bool cache: If true, the import is done through the binary import cache
+	:param str cache_dir: Directory of the import cache, the directory ``.comsol_cache`` next to the csv file is used
+		if None
 	:return: Result dictionary as defined above
 	"""
+	if cache:
+		grid_points, fields = _import_cached_comsol_3d_csv_grid(filename, field_names, cache_dir)
+	else:
+		grid_points, fields = _parse_comsol_3d_csv_grid(filename, field_names)
+
+	meshgrid = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')
+
+	return {"grid_points": grid_points, "meshgrid": meshgrid, "fields": fields}
+
 
+def _parse_comsol_3d_csv_grid(filename, field_names):
+	"""
+	Parses a comsol csv grid file as stream, returns the grid points and the list of fields
+	"""
 	if filename[-3:] == ".gz":
-		with gzip.open(filename, 'rt') as f:
-			raw_dat_str = f.read()
+		f = gzip.open(filename, 'rt')
 	else:
-		with open(filename, 'rt') as f:
-			raw_dat_str = f.read()
+		f = open(filename, 'rt')
+
+	with f:
+		header_lines = []
+		for line in f:
+			if line.rstrip('\n') == '% Data':
+				break
+			header_lines.append(line)
+
+		grid_points = parse_spatial_dimensions(''.join(header_lines))
+		grid_dims = [len(x) for x in grid_points]
+		n_rows = grid_dims[1] * grid_dims[2]
+
+		fields = []
+		imported_names = []
+		field_name_line = f.readline()
+		while field_name_line:
+			field_name = field_name_line.rstrip('\n')
+			if field_names is None or field_name in field_names:
+				fields.append({"name": field_name, 'data': _read_comsol_field_data(f, grid_dims)})
+				imported_names.append(field_name)
+			else:
+				collections.deque(itertools.islice(f, n_rows), maxlen=0)
+
+			# advance to the next data chunk:
+			line = f.readline()
+			while line and line.strip() == '':
+				line = f.readline()
+			if line and line.rstrip('\n') != '% Data':
+				raise ValueError('Unexpected content after field data: ' + line.strip())
+			field_name_line = f.readline()
+
+	if field_names is not None:
+		missing_names = [name for name in field_names if name not in imported_names]
+		if missing_names:
+			raise ValueError('Fields ' + str(missing_names) + ' are not present in ' + filename)
+
+	return grid_points, fields
+
+
+def _read_comsol_field_data(f, dims, block_rows=65536):
+	"""
+	Reads the data lines of a field from a comsol csv file stream into a preallocated array. The lines are parsed
+	block wise.
 
-	raw_dat_tokenized = raw_dat_str.split("% Data\n")
+	:param f: Opened text stream, positioned at the first data line of the field
+	:param dims: 3 dim array with the number of points in the spatial (x,y,z) dimensions
+	:param int block_rows: Number of data lines parsed at once
+	:return: Field data with the shape ``[x, y, z]``
+	"""
+	x_len, y_len, z_len = dims
+	n_rows = y_len * z_len
 
-	raw_dat_header = raw_dat_tokenized[0]
-	raw_dat_fields = raw_dat_tokenized[1:]
+	# the data lines run over x values, the lines are ordered with the y index running fastest:
+	raw_dat = np.empty([n_rows, x_len])
+	for start in range(0, n_rows, block_rows):
+		n_block = min(block_rows, n_rows - start)
+		lines = list(itertools.islice(f, n_block))
+		if len(lines) < n_block:
+			raise ValueError('Incomplete field data in comsol csv file')
+		raw_dat[start:start + n_block, :] = np.loadtxt(lines, delimiter=',', ndmin=2)
 
-	grid_points = parse_spatial_dimensions(raw_dat_header)
-	grid_dims = [len(x) for x in grid_points]
+	return raw_dat.reshape([z_len, y_len, x_len]).transpose(2, 1, 0)
 
-	fields = [parse_comsol_csv_data_chunk(raw_field, grid_dims) for raw_field in raw_dat_fields]
-	meshgrid = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')
 
-	return {"grid_points": grid_points, "meshgrid": meshgrid, "fields": fields}
+def _import_cached_comsol_3d_csv_grid(filename, field_names, cache_dir):
+	"""
+	Imports a comsol csv grid file through the binary import cache, returns the grid points and the list of fields
+	"""
+	filename = os.path.abspath(filename)
+	if cache_dir is None:
+		cache_dir = os.path.join(os.path.dirname(filename), '.comsol_cache')
+
+	cache_key = json.dumps([filename, field_names])
+	entry_dir = os.path.join(cache_dir, hashlib.sha1(cache_key.encode('UTF-8')).hexdigest())
+	meta_file_name = os.path.join(entry_dir, 'meta.json')
+
+	file_stat = os.stat(filename)
+	if os.path.exists(meta_file_name):
+		with open(meta_file_name) as meta_file:
+			meta = json.load(meta_file)
+		if meta['size'] == file_stat.st_size:
+			if meta['mtime_ns'] == file_stat.st_mtime_ns:
+				return _load_cached_comsol_grid(entry_dir, meta)
+			elif meta['sha1'] == _file_sha1(filename):
+				# unchanged content with new modification time (e.g. a copied file): update the cache entry
+				meta['mtime_ns'] = file_stat.st_mtime_ns
+				_write_json_atomically(meta, meta_file_name)
+				return _load_cached_comsol_grid(entry_dir, meta)
+
+	grid_points, fields = _parse_comsol_3d_csv_grid(filename, field_names)
+	meta = {
+		'mtime_ns': file_stat.st_mtime_ns, 'size': file_stat.st_size, 'sha1': _file_sha1(filename),
+		'field_names': [field['name'] for field in fields]}
+
+	def write_entry(tmp_dir):
+		for dim_name, vec in zip(('x', 'y', 'z'), grid_points):
+			np.save(os.path.join(tmp_dir, 'grid_' + dim_name + '.npy'), vec)
+		for i, field in enumerate(fields):
+			np.save(os.path.join(tmp_dir, 'field_' + str(i) + '.npy'), field['data'])
+		_write_json_atomically(meta, os.path.join(tmp_dir, 'meta.json'))
+
+	write_cache_entry(cache_dir, entry_dir, write_entry)
+
+	return _load_cached_comsol_grid(entry_dir, meta)
+
+
+def _load_cached_comsol_grid(entry_dir, meta):
+	"""
+	Loads the grid points and the memory mapped fields from an import cache entry
+	"""
+	grid_points = tuple(np.load(os.path.join(entry_dir, 'grid_' + dim_name + '.npy')) for dim_name in ('x', 'y', 'z'))
+	fields = [
+		{"name": name, 'data': np.load(os.path.join(entry_dir, 'field_' + str(i) + '.npy'), mmap_mode='r')}
+		for i, name in enumerate(meta['field_names'])]
+
+	return grid_points, fields
+
+
+def _file_sha1(filename, block_size=1 << 20):
+	"""
+	Calculates the sha1 hash of the content of a file
+	"""
+	file_hash = hashlib.sha1()
+	with open(filename, 'rb') as f:
+		for block in iter(lambda: f.read(block_size), b''):
+			file_hash.update(block)
+	return file_hash.hexdigest()
+
+
+def _write_json_atomically(obj, filename):
+	"""
+	Writes an object as json file, the file is replaced atomically
+	"""
+	tmp_filename = filename + '.tmp'
+	with open(tmp_filename, 'w') as f:
+		json.dump(obj, f)
+	os.replace(tmp_filename, filename)
 
 
 # ---------------- utlilty functions / methods ----------------------
@@ -51,11 +208,7 @@ def parse_grid_vector(vec_str, delimiter=','):
 	:param str delimiter: the delimiter in the vector line
 	:return: numpy array with the vector values
 	"""
-	vec_str_spl = vec_str.split(delimiter)
-	vec_len = len(vec_str_spl)
-	vec = np.zeros([vec_len])
-	for i in range(vec_len):
-		vec[i] = float(vec_str_spl[i])
+	vec = np.array(vec_str.split(delimiter), dtype=float)
 
 	return (vec)
 
@@ -73,11 +226,7 @@ def parse_comsol_csv_data_chunk(raw_chunk, dims):
 	field_raw_dat = np.genfromtxt(io.BytesIO(raw_field.encode()), delimiter=',')
 
 	x_len, y_len, z_len = dims
-	field_dat = np.zeros([x_len, y_len, z_len])
-	for k in range(z_len):
-		for j in range(y_len):
-			l_pos = j + k * y_len
-			field_dat[:, j, k] = field_raw_dat[l_pos, :]
+	field_dat = np.ascontiguousarray(np.reshape(field_raw_dat, [z_len, y_len, x_len]).transpose(2, 1, 0))
 
 	return {"name": field_name, 'data': field_dat}
 
@@ -1,68 +1,70 @@
 # -*- coding: utf-8 -*-
 
+import os
+import zlib
+import itertools
+import collections
+import concurrent.futures
 import numpy as np
 import matplotlib.pyplot as plt
 import vtk
+from vtk.util import numpy_support
 import h5py
 
 
-def transform_2d_axial_to_3d(R_axi, Z_axi, V_axi, radial_component=False):
+def transform_2d_axial_to_3d(R_axi, Z_axi, V_axi, radial_component=False, chunk_size=None):
 	"""
 	Transforms 2d axial symmetric data into 3d cartesian data.
 	The symmetry axis which is used for the rotation is the y axis in cartesian coordinates.
 
+	The values on the cartesian grid are linearly interpolated in radial direction from the axial symmetric data.
+	The interpolation is vectorized over the grid, with ``chunk_size`` the grid is processed in slabs of axial
+	grid points to limit the size of temporary arrays.
+
 	*Note:* The data is expected to be given as meshgrid in ij indexing.
+
+	:param R_axi: Radial coordinates of the axial symmetric grid
+	:param Z_axi: Axial coordinates of the axial symmetric grid
+	:param V_axi: Values on the axial symmetric grid
+	:param radial_component: If true, the values are radial vector components, which are rotated into the x and z
+		components of a vector field
+	:type radial_component: bool
+	:param chunk_size: Number of axial grid points processed at once, all grid points are processed at once if None
+	:type chunk_size: int
+	:return: Tuple of the cartesian meshgrid (X, Y, Z) and the transformed values
 	"""
 
 	grid_r = R_axi[:, 0]
 	len_r = len(grid_r)
 	grid_z = Z_axi[0, :]
+	len_z = len(grid_z)
 
 	X, Y, Z = np.meshgrid(grid_r, grid_z, grid_r, indexing='ij')
 
+	r_if, r_ic, in_grid, dn_f, dn_c, phi = _radial_interpolation_plane(grid_r)
+
 	if not radial_component:
 		result = np.zeros(np.shape(X))
 	else:
-		# prepare result for 2 component radial vector values:
+		# prepare result for 2 component radial vector values and rotation of the radial component:
 		result = np.zeros(np.shape(X)+(2,))
+		sin_phi = np.sin(phi)[:, np.newaxis, :]
+		cos_phi = np.cos(phi)[:, np.newaxis, :]
 
-	# iterate through entire 3d cartesian space domain:
-	for i in range(len(grid_r)):
-		for j in range(len(grid_z)):
-			for k in range(len(grid_r)):
-				x = X[i, j, k]
-				z = Z[i, j, k]
-
-				r = np.sqrt(x*x + z*z)  # radial distance
-				r_ic = np.searchsorted(grid_r, r)  # upper cell index in r direction were the current distance fits
-				r_if = r_ic - 1  # lower cell index
-
-				# simple linear interpolation:
-				if r_ic < len_r:
-
-					# distance to the lower grid point:
-					d_f = r - grid_r[r_if]
-
-					# normalize distances:
-					dn_f = d_f / (grid_r[r_ic] - grid_r[r_if])
-					dn_c = 1 - dn_f
-
-					# calculate interpolated value (distances are switched because low distance mean high weight of the value):
-					res = dn_c * V_axi[r_if, j] + dn_f * V_axi[r_ic, j]
+	if chunk_size is None:
+		chunk_size = max(len_z, 1)
+	for j_start in range(0, len_z, chunk_size):
+		j_slice = slice(j_start, min(j_start + chunk_size, len_z))
 
-					if radial_component == True:
-						# rotate radial component:
-						phi = np.arctan2(x, z)
-						result[i, j, k, 0] = np.sin(phi)*res
-						result[i, j, k, 1] = np.cos(phi)*res
-					else:
-						result[i, j, k] = res
+		# interpolated values with (i, j, k) indexing:
+		res = _interpolate_radial(V_axi[:, j_slice], r_if, r_ic, dn_f, dn_c)
 
-				else:
-					if radial_component == True:
-						result[i, j, k, :] = [0,0]
-					else:
-						result[i, j, k] = 0
+		# nodes outside of the radial grid are zero:
+		if radial_component:
+			result[:, j_slice, :, 0] = np.where(in_grid[:, np.newaxis, :], sin_phi * res, 0.0)
+			result[:, j_slice, :, 1] = np.where(in_grid[:, np.newaxis, :], cos_phi * res, 0.0)
+		else:
+			result[:, j_slice, :] = np.where(in_grid[:, np.newaxis, :], res, 0.0)
 
 	#flip LR:
 	X_f = np.concatenate([X[:, :, ::-1], X], axis=2)
@@ -91,139 +93,408 @@ def transform_2d_axial_to_3d(R_axi, Z_axi, V_axi, radial_component=False):
 	return (X_c, Y_c, Z_c, result_c)
 
 
-def write_3d_vector_fields_to_hdf5(dat, result_filename, scale_factor=1.0):
+def _radial_interpolation_plane(grid_r):
+	"""
+	Calculates the radial interpolation cells and weights for the nodes of the positive quadrant of the cartesian
+	x-z plane (perpendicular to the symmetry axis) from the radial grid of axial symmetric data.
+
+	:return: Tuple of lower and upper radial cell indices, mask of the nodes within the radial grid, normalized
+		distances to the lower and the upper grid point and the rotation angle of the nodes, all (i, k) indexed
+	"""
+	len_r = len(grid_r)
+
+	# radial distance of the nodes in the x-z plane, (i, k) indexed:
+	x = grid_r[:, np.newaxis]
+	z = grid_r[np.newaxis, :]
+	r = np.sqrt(x*x + z*z)
+	r_ic = np.searchsorted(grid_r, r)  # upper cell index in r direction were the distance fits
+	r_if = r_ic - 1  # lower cell index
+	in_grid = r_ic < len_r
+	r_ic = np.where(in_grid, r_ic, len_r - 1)
+	r_if = np.where(in_grid, r_if, len_r - 2)
+
+	# simple linear interpolation (distances are switched because low distance mean high weight of the value):
+	d_f = r - grid_r[r_if]
+	dn_f = d_f / (grid_r[r_ic] - grid_r[r_if])
+	dn_c = 1 - dn_f
+
+	phi = np.arctan2(x, z)
+
+	return r_if, r_ic, in_grid, dn_f, dn_c, phi
 
-	x_vec, y_vec, z_vec = [np.array(x) * scale_factor for x in dat["grid_points"]]
-	fields_dat = dat["fields"]
 
-	xlen = len(x_vec)
-	ylen = len(y_vec)
-	zlen = len(z_vec)
+def _interpolate_radial(V_axi, r_if, r_ic, dn_f, dn_c):
+	"""
+	Interpolates axial symmetric data radially for nodes of the x-z plane
+
+	:param V_axi: Axial symmetric data ``[n r, n axial]``
+	:return: Interpolated values with (i, j, k) indexing, j is the axial index
+	"""
+	return (dn_c[:, :, np.newaxis] * V_axi[r_if] + dn_f[:, :, np.newaxis] * V_axi[r_ic]).transpose(0, 2, 1)
+
+
+def write_2d_axial_fields_to_3d_hdf5(
+		R_axi, Z_axi, fields, result_filename, scale_factor=1.0, dtype='f', compression=None, compression_opts=None,
+		chunks=None):
+	"""
+	Transforms 2d axial symmetric fields into 3d cartesian fields (see :py:func:`transform_2d_axial_to_3d`) and writes
+	them directly to a HDF5 field file for IDSimF (in the format written by :py:func:`write_3d_scalar_fields_to_hdf5`
+	and :py:func:`write_3d_vector_fields_to_hdf5`).
+
+	The 3d fields are computed and written slab wise (in x direction). Neither the cartesian meshgrid nor the full
+	3d fields are held in memory, which allows the generation of fields larger than the available memory. The
+	written data is identical to the data written from the results of :py:func:`transform_2d_axial_to_3d`.
+
+	*Note:* The data is expected to be given as meshgrid in ij indexing.
 
+	:param R_axi: Radial coordinates of the axial symmetric grid
+	:param Z_axi: Axial coordinates of the axial symmetric grid
+	:param fields: List of fields, every field is a dictionary with a "name" and the field "data". The data of scalar
+		fields is an array of values on the axial symmetric grid. The data of vector fields is a tuple of the radial
+		and the axial component on the axial symmetric grid, the radial component is rotated into the x and z
+		components and the axial component becomes the y component of the 3d vector field.
+	:type fields: list of dict
+	:param result_filename: Name of the HDF5 file to write
+	:type result_filename: str
+	:param scale_factor: Scale factor for the grid point coordinates
+	:type scale_factor: float
+	:param dtype: Floating point precision of the written grid points and field data
+	:param compression: HDF5 compression filter of the field datasets, the data is not compressed if None
+	:type compression: str
+	:param compression_opts: Options of the compression filter
+	:param chunks: Chunk shape ``(n x, n y, n z)`` of the field datasets, True for automatic chunking
+	:type chunks: tuple of three int or bool
+	"""
+	grid_r = R_axi[:, 0]
+	len_r = len(grid_r)
+	grid_z = Z_axi[0, :]
+	r_if, r_ic, in_grid, dn_f, dn_c, phi = _radial_interpolation_plane(grid_r)
+
+	# the cartesian domain is the positive quadrant mirrored in x and z direction, the mirrored nodes map to the
+	# quadrant nodes with these indices:
+	quadrant_indices = np.concatenate([np.arange(len_r)[::-1], np.arange(len_r)])
+	mirror_signs = np.concatenate([-np.ones(len_r), np.ones(len_r)])
+	plane = [a[quadrant_indices][:, quadrant_indices] for a in (r_if, r_ic, in_grid, dn_f, dn_c)]
+	sin_phi = np.sin(phi)[quadrant_indices][:, quadrant_indices]
+	cos_phi = np.cos(phi)[quadrant_indices][:, quadrant_indices]
+
+	def get_slab(x_slice, data):
+		slab_r_if, slab_r_ic, slab_in_grid, slab_dn_f, slab_dn_c = [a[x_slice] for a in plane]
+		slab_in_grid = slab_in_grid[:, np.newaxis, :]
+		if isinstance(data, (tuple, list)):
+			res_r = _interpolate_radial(data[0], slab_r_if, slab_r_ic, slab_dn_f, slab_dn_c)
+			res_a = _interpolate_radial(data[1], slab_r_if, slab_r_ic, slab_dn_f, slab_dn_c)
+			# the rotated radial components change their sign in the mirrored domains:
+			return np.stack([
+				np.where(slab_in_grid, sin_phi[x_slice, np.newaxis, :] * res_r, 0.0) *
+				mirror_signs[x_slice, np.newaxis, np.newaxis],
+				np.where(slab_in_grid, res_a, 0.0),
+				np.where(slab_in_grid, cos_phi[x_slice, np.newaxis, :] * res_r, 0.0) * mirror_signs],
+				axis=3)
+		else:
+			res = _interpolate_radial(data, slab_r_if, slab_r_ic, slab_dn_f, slab_dn_c)
+			return np.where(slab_in_grid, res, 0.0)
+
+	grid_c = np.concatenate([grid_r[::-1] * -1.0, grid_r])
 	with h5py.File(result_filename, "w") as fh:
-		# write grid points / grid coordinates:
-		points_group = fh.create_group('grid_points')
-		points_group.create_dataset('x', (xlen,), 'f', x_vec)
-		points_group.create_dataset('y', (ylen,), 'f', y_vec)
-		points_group.create_dataset('z', (zlen,), 'f', z_vec)
+		grid_shape = _write_hdf5_grid_points(fh, [grid_c, grid_z, grid_c], scale_factor, dtype)
 
 		fields_group = fh.create_group('fields')
-		for fi in fields_dat:
-			# f_group = fields_group.create_group(fi["name"])
-			# write scalar field to group:
+		for fi in fields:
+			field_shape = grid_shape + (3,) if isinstance(fi['data'], (tuple, list)) else grid_shape
+			dataset = _create_hdf5_field_dataset(
+				fields_group, fi['name'], field_shape, dtype, compression, compression_opts, chunks)
+			_write_hdf5_field_slabs(dataset, lambda x_slice, data=fi['data']: get_slab(x_slice, data))
+
+
+def write_3d_vector_fields_to_hdf5(
+		dat, result_filename, scale_factor=1.0, dtype='f', compression=None, compression_opts=None, chunks=None,
+		n_workers=None):
+	"""
+	Writes three dimensional vector fields on a rectilinear grid to a HDF5 field file for IDSimF.
+
+	The vector components are written slab wise (in x direction) into the field datasets, a combined copy of the
+	vector components of a whole field is never created.
+
+	:param dat: Field data, a dictionary with the grid point vectors in x, y and z direction ("grid_points") and a list
+		of fields ("fields"), every field is a dictionary with a "name" and the field "data" (list of the three
+		component arrays with the shape ``[n x, n y, n z]``)
+	:type dat: dict
+	:param result_filename: Name of the HDF5 file to write
+	:type result_filename: str
+	:param scale_factor: Scale factor for the grid point coordinates
+	:type scale_factor: float
+	:param dtype: Floating point precision of the written grid points and field data (e.g. ``'f'`` / ``numpy.float32``
+		or ``'d'`` / ``numpy.float64``)
+	:param compression: HDF5 compression filter of the field datasets, the data is not compressed if None. Use
+		``'gzip'`` for files read by IDSimF, other filters (e.g. ``'lzf'``) are not available in IDSimF.
+	:type compression: str
+	:param compression_opts: Options of the compression filter, e.g. the compression level for ``'gzip'``
+	:param chunks: Chunk shape ``(n x, n y, n z)`` of the field datasets, chunk shapes larger than the grid are
+		reduced to the grid shape. If True, the chunk shape is chosen automatically. The datasets are not chunked
+		if None and no compression is used.
+	:type chunks: tuple of three int or bool
+	:param n_workers: Number of worker threads which compute the slabs and compress the chunks of gzip compressed
+		datasets concurrently. The slabs are written serially if None or 1.
+	:type n_workers: int
+	"""
+	with h5py.File(result_filename, "w") as fh:
+		grid_shape = _write_hdf5_grid_points(fh, dat["grid_points"], scale_factor, dtype)
+
+		fields_group = fh.create_group('fields')
+		for fi in dat["fields"]:
 			clen = len(fi['data'])  # vector components length
-			field_shape = (xlen, ylen, zlen, clen)
-			data_combined = np.stack(fi['data'], axis=3)
+			dataset = _create_hdf5_field_dataset(
+				fields_group, fi['name'], grid_shape + (clen,), dtype, compression, compression_opts, chunks)
+			_write_hdf5_field_slabs(dataset, lambda x_slice, data=fi['data']: np.stack(
+				[np.asarray(component[x_slice]) for component in data], axis=3), n_workers=n_workers)
 
-			fields_group.create_dataset(fi['name'], field_shape, 'f', data_combined)
 
+def _write_hdf5_grid_points(fh, grid_points, scale_factor, dtype):
+	"""
+	Writes the grid point vectors of a HDF5 field file, returns the grid shape
+	"""
+	x_vec, y_vec, z_vec = [np.array(x) * scale_factor for x in grid_points]
 
-def write_3d_vector_fields_as_vtk_point_data(dat,result_filename,scale_factor=1.0):
-	vtk_p = vtk.vtkPoints()
-	x_vec, y_vec, z_vec = [np.array(x)*scale_factor for x in dat["grid_points"]]
-	fields_dat = dat["fields"]
+	points_group = fh.create_group('grid_points')
+	points_group.create_dataset('x', (len(x_vec),), dtype, x_vec)
+	points_group.create_dataset('y', (len(y_vec),), dtype, y_vec)
+	points_group.create_dataset('z', (len(z_vec),), dtype, z_vec)
 
-	xlen = len(x_vec)
-	ylen = len(y_vec)
-	zlen = len(z_vec)
+	return len(x_vec), len(y_vec), len(z_vec)
 
-	vtk_fields = []
-	for fi in fields_dat:
-		vfi = vtk.vtkDoubleArray()
-		vfi.SetNumberOfComponents(3)
-		vfi.SetName(fi['name'])
-		vtk_fields.append(vfi)
-
-	n_fields = len(vtk_fields)
-
-	#x_dat = fields_dat[component_indices[0]]['data']
-	#y_dat = fields_dat[component_indices[1]]['data']
-	#z_dat = fields_dat[component_indices[2]]['data']
-
-	for zi in range(zlen):
-		for yi in range(ylen):
-			for xi in range(xlen):
-				vtk_p.InsertNextPoint([x_vec[xi], y_vec[yi], z_vec[zi]])
-				for i in range(n_fields):
-					vtk_fields[i].InsertNextTuple([
-						fields_dat[i]['data'][0][xi, yi, zi],
-						fields_dat[i]['data'][1][xi, yi, zi],
-						fields_dat[i]['data'][2][xi, yi, zi]
-					])
-
-	vtk_grid = vtk.vtkStructuredGrid()
-	vtk_grid.SetDimensions(xlen,ylen,zlen)
-	vtk_grid.SetPoints(vtk_p)
-	for i in range(n_fields):
-		vtk_grid.GetPointData().AddArray(vtk_fields[i])
-
-	#print(vtk_grid)
-	writer = vtk.vtkXMLStructuredGridWriter()
-	writer.SetFileName(result_filename)
-	writer.SetInputData(vtk_grid)
-	writer.Write()
 
+def _create_hdf5_field_dataset(fields_group, name, field_shape, dtype, compression, compression_opts, chunks):
+	"""
+	Creates a (chunked and compressed) field dataset in a HDF5 field file
+	"""
+	if isinstance(chunks, tuple):
+		# chunks span all vector components:
+		chunks = tuple(max(1, min(chunk, dim)) for chunk, dim in zip(chunks, field_shape)) + field_shape[3:]
+	if compression is not None and chunks is None:
+		chunks = True
 
-def write_3d_scalar_fields_to_hdf5(dat, result_filename, scale_factor=1.0):
+	return fields_group.create_dataset(
+		name, field_shape, dtype, compression=compression, compression_opts=compression_opts, chunks=chunks)
 
-	x_vec, y_vec, z_vec = [np.array(x)*scale_factor for x in dat["grid_points"]]
-	fields_dat = dat["fields"]
 
-	xlen = len(x_vec)
-	ylen = len(y_vec)
-	zlen = len(z_vec)
-	field_shape = (xlen, ylen, zlen)
+def _write_hdf5_field_slabs(dataset, get_slab, max_slab_size=1 << 24, n_workers=None):
+	"""
+	Writes field data slab wise (in x direction) into a field dataset. The slabs span whole chunks of chunked
+	datasets, thus every chunk is written (and compressed) only once.
+
+	With multiple workers, the slabs are computed by a pool of worker threads. The chunks of gzip compressed datasets
+	are also compressed by the workers (zlib releases the GIL while compressing) and written as raw compressed chunks,
+	the datasets of the file are only written by the calling thread.
+
+	:param dataset: The field dataset to write
+	:param get_slab: Function returning the field data for a slice of x indices
+	:param max_slab_size: Maximum number of values in a slab (at least one chunk is written at once)
+	:param n_workers: Number of worker threads, the slabs are computed and written serially if None or 1
+	:type n_workers: int
+	"""
+	x_len = dataset.shape[0]
+	values_per_plane = max(1, int(np.prod(dataset.shape[1:])))
+	slab_planes = max(1, max_slab_size // values_per_plane)
+	if dataset.chunks is not None:
+		chunk_planes = dataset.chunks[0]
+		slab_planes = max(chunk_planes, (slab_planes // chunk_planes) * chunk_planes)
+	x_slices = [slice(x_start, min(x_start + slab_planes, x_len)) for x_start in range(0, x_len, slab_planes)]
+
+	if n_workers is None or n_workers <= 1:
+		for x_slice in x_slices:
+			dataset[x_slice] = get_slab(x_slice)
+		return
+
+	# only the plain deflate filter can be applied outside of HDF5:
+	compress_chunks = dataset.compression == 'gzip' and not dataset.shuffle and not dataset.fletcher32 and \
+		dataset.scaleoffset is None
+
+	def prepare_slab(x_slice):
+		slab = np.asarray(get_slab(x_slice), dtype=dataset.dtype)
+		if compress_chunks:
+			return _compress_hdf5_slab_chunks(slab, x_slice.start, dataset.chunks, dataset.compression_opts)
+		return slab
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+		# the number of prepared slabs which are not yet written is limited, to bound the memory usage:
+		pending = collections.deque()
+
+		def write_next_slab():
+			x_slice, future = pending.popleft()
+			if compress_chunks:
+				for chunk_offset, compressed_chunk in future.result():
+					dataset.id.write_direct_chunk(chunk_offset, compressed_chunk)
+			else:
+				dataset[x_slice] = future.result()
+
+		for x_slice in x_slices:
+			pending.append((x_slice, executor.submit(prepare_slab, x_slice)))
+			if len(pending) >= 2 * n_workers:
+				write_next_slab()
+		while pending:
+			write_next_slab()
+
+
+def _compress_hdf5_slab_chunks(slab, x_start, chunks, compression_level):
+	"""
+	Splits a field slab into the chunks of a dataset and compresses the chunks with the deflate (gzip) filter of HDF5.
+	Chunks at the boundary of the dataset are padded to the full chunk shape, as they are stored by HDF5.
 
+	:return: List of the chunk offsets in the dataset and the compressed chunk data
+	"""
+	result = []
+	chunk_ranges = [range(0, dim, chunk) for dim, chunk in zip(slab.shape, chunks)]
+	for chunk_start in itertools.product(*chunk_ranges):
+		chunk_data = slab[tuple(slice(start, start + chunk) for start, chunk in zip(chunk_start, chunks))]
+		if chunk_data.shape != tuple(chunks):
+			padded_chunk = np.zeros(chunks, dtype=slab.dtype)
+			padded_chunk[tuple(slice(0, dim) for dim in chunk_data.shape)] = chunk_data
+			chunk_data = padded_chunk
+		compressed_chunk = zlib.compress(np.ascontiguousarray(chunk_data).tobytes(), compression_level)
+		result.append(((x_start + chunk_start[0],) + chunk_start[1:], compressed_chunk))
+	return result
+
+
+def write_3d_vector_fields_as_vtk_point_data(dat, result_filename, scale_factor=1.0):
+	"""
+	Writes three dimensional vector fields on a rectilinear grid as point data to a VTK XML file.
+
+	The VTK data set type is chosen by the file extension of the result file: A rectilinear grid for ``.vtr`` files,
+	an image (which requires equally spaced grid points) for ``.vti`` files and a structured grid with explicit grid
+	points otherwise (e.g. for ``.vts`` files).
+
+	:param dat: Field data, a dictionary with the grid point vectors in x, y and z direction ("grid_points") and a list
+		of fields ("fields"), every field is a dictionary with a "name" and the field "data" (list of the three
+		component arrays with the shape ``[n x, n y, n z]``)
+	:type dat: dict
+	:param result_filename: Name of the VTK file to write
+	:type result_filename: str
+	:param scale_factor: Scale factor for the grid point coordinates
+	:type scale_factor: float
+	"""
+	vtk_fields = []
+	for fi in dat["fields"]:
+		field_data = np.column_stack([np.ravel(component, order='F') for component in fi['data']])
+		vtk_fields.append((fi['name'], field_data))
+
+	_write_grid_point_data_to_vtk(dat["grid_points"], vtk_fields, result_filename, scale_factor)
+
+
+def write_3d_scalar_fields_to_hdf5(
+		dat, result_filename, scale_factor=1.0, dtype='f', compression=None, compression_opts=None, chunks=None,
+		n_workers=None):
+	"""
+	Writes three dimensional scalar fields on a rectilinear grid to a HDF5 field file for IDSimF.
+
+	The fields are written slab wise (in x direction), see :py:func:`write_3d_vector_fields_to_hdf5` for the
+	precision, compression and chunking options.
+
+	:param dat: Field data, a dictionary with the grid point vectors in x, y and z direction ("grid_points") and a list
+		of fields ("fields"), every field is a dictionary with a "name" and the field "data" (array with the shape
+		``[n x, n y, n z]``)
+	:type dat: dict
+	:param result_filename: Name of the HDF5 file to write
+	:type result_filename: str
+	:param scale_factor: Scale factor for the grid point coordinates
+	:type scale_factor: float
+	:param dtype: Floating point precision of the written grid points and field data
+	:param compression: HDF5 compression filter of the field datasets, the data is not compressed if None
+	:type compression: str
+	:param compression_opts: Options of the compression filter
+	:param chunks: Chunk shape ``(n x, n y, n z)`` of the field datasets, True for automatic chunking
+	:type chunks: tuple of three int or bool
+	:param n_workers: Number of worker threads which compute and compress the slabs concurrently
+	:type n_workers: int
+	"""
 	with h5py.File(result_filename, "w") as fh:
-		# write grid points / grid coordinates:
-		points_group = fh.create_group('grid_points')
-		points_group.create_dataset('x', (xlen,), 'f', x_vec)
-		points_group.create_dataset('y', (ylen,), 'f', y_vec)
-		points_group.create_dataset('z', (zlen,), 'f', z_vec)
+		grid_shape = _write_hdf5_grid_points(fh, dat["grid_points"], scale_factor, dtype)
 
 		fields_group = fh.create_group('fields')
-		for fi in fields_dat:
-			#f_group = fields_group.create_group(fi["name"])
-			# write scalar field to group:
-			fields_group.create_dataset(fi['name'], field_shape, 'f', fi['data'])
+		for fi in dat["fields"]:
+			dataset = _create_hdf5_field_dataset(
+				fields_group, fi['name'], grid_shape, dtype, compression, compression_opts, chunks)
+			_write_hdf5_field_slabs(
+				dataset, lambda x_slice, data=fi['data']: np.asarray(data[x_slice]), n_workers=n_workers)
 
 
 def write_3d_scalar_fields_as_vtk_point_data(dat, result_filename, scale_factor=1.0):
-	vtk_p = vtk.vtkPoints()
-	x_vec,y_vec,z_vec = [np.array(x)*scale_factor for x in dat["grid_points"]]
-	fields_dat = dat["fields"]
+	"""
+	Writes three dimensional scalar fields on a rectilinear grid as point data to a VTK XML file.
+
+	The VTK data set type is chosen by the file extension of the result file, see
+	:py:func:`write_3d_vector_fields_as_vtk_point_data`.
+
+	:param dat: Field data, a dictionary with the grid point vectors in x, y and z direction ("grid_points") and a list
+		of fields ("fields"), every field is a dictionary with a "name" and the field "data" (array with the shape
+		``[n x, n y, n z]``)
+	:type dat: dict
+	:param result_filename: Name of the VTK file to write
+	:type result_filename: str
+	:param scale_factor: Scale factor for the grid point coordinates
+	:type scale_factor: float
+	"""
+	vtk_fields = [(fi["name"], np.ravel(fi["data"], order='F')) for fi in dat["fields"]]
+	_write_grid_point_data_to_vtk(dat["grid_points"], vtk_fields, result_filename, scale_factor)
 
-	xlen = len(x_vec)
-	ylen = len(y_vec)
-	zlen = len(z_vec)
 
-	vtk_fields = []
-	for fi in fields_dat:
-		vfi = vtk.vtkDoubleArray()
-		vfi.SetName(fi["name"])
-		vtk_fields.append(vfi)
-
-	n_fields = len(vtk_fields)
-
-	for zi in range(zlen):
-		for yi in range(ylen):
-			for xi in range(xlen):
-				vtk_p.InsertNextPoint([x_vec[xi],y_vec[yi],z_vec[zi]])
-				for i in range(n_fields):
-					vtk_fields[i].InsertNextValue(fields_dat[i]["data"][xi, yi, zi])
-
-	vtk_grid = vtk.vtkStructuredGrid()
-	vtk_grid.SetDimensions(xlen,ylen,zlen)
-	vtk_grid.SetPoints(vtk_p)
-	for i in range(n_fields):
-		vtk_grid.GetPointData().AddArray(vtk_fields[i])
-
-	#print(vtk_grid)
-	writer = vtk.vtkXMLStructuredGridWriter()
+def _write_grid_point_data_to_vtk(grid_points, fields, result_filename, scale_factor):
+	"""
+	Writes point data on a rectilinear grid to a VTK XML file. The grid coordinates and the field data are passed to
+	VTK as whole arrays.
+
+	:param grid_points: Grid point vectors in x, y and z direction
+	:param fields: List of tuples of field name and field data, the field data is given in VTK point order (x index
+		running fastest) with one row per grid point
+	:param result_filename: Name of the VTK file to write, the extension determines the VTK data set type
+	:param scale_factor: Scale factor for the grid point coordinates
+	"""
+	x_vec, y_vec, z_vec = [np.array(x, dtype=float) * scale_factor for x in grid_points]
+	dimensions = (len(x_vec), len(y_vec), len(z_vec))
+	extension = os.path.splitext(result_filename)[1].lower()
+
+	if extension == '.vtr':
+		vtk_grid = vtk.vtkRectilinearGrid()
+		vtk_grid.SetDimensions(*dimensions)
+		vtk_grid.SetXCoordinates(numpy_support.numpy_to_vtk(x_vec))
+		vtk_grid.SetYCoordinates(numpy_support.numpy_to_vtk(y_vec))
+		vtk_grid.SetZCoordinates(numpy_support.numpy_to_vtk(z_vec))
+		writer = vtk.vtkXMLRectilinearGridWriter()
+	elif extension == '.vti':
+		spacing = []
+		for vec in (x_vec, y_vec, z_vec):
+			steps = np.diff(vec)
+			if len(steps) > 0 and not np.allclose(steps, steps[0]):
+				raise ValueError('VTK image data requires equally spaced grid points')
+			spacing.append(steps[0] if len(steps) > 0 else 1.0)
+		vtk_grid = vtk.vtkImageData()
+		vtk_grid.SetDimensions(*dimensions)
+		vtk_grid.SetOrigin(x_vec[0], y_vec[0], z_vec[0])
+		vtk_grid.SetSpacing(*spacing)
+		writer = vtk.vtkXMLImageDataWriter()
+	else:
+		X, Y, Z = np.meshgrid(x_vec, y_vec, z_vec, indexing='ij')
+		points = np.column_stack([np.ravel(C, order='F') for C in (X, Y, Z)]).astype(np.float32)
+		vtk_p = vtk.vtkPoints()
+		vtk_p.SetData(numpy_support.numpy_to_vtk(points))
+		vtk_grid = vtk.vtkStructuredGrid()
+		vtk_grid.SetDimensions(*dimensions)
+		vtk_grid.SetPoints(vtk_p)
+		writer = vtk.vtkXMLStructuredGridWriter()
+
+	for name, field_data in fields:
+		vfi = numpy_support.numpy_to_vtk(np.ascontiguousarray(field_data, dtype=float))
+		vfi.SetName(name)
+		vtk_grid.GetPointData().AddArray(vfi)
+
+	# raw binary appended data avoids the costly base64 encoding of the field data:
 	writer.SetFileName(result_filename)
 	writer.SetInputData(vtk_grid)
+	writer.SetDataModeToAppended()
+	writer.EncodeAppendedDataOff()
 	writer.Write()
 
+
 def plot_3d_grid(meshgrid, field_dat, Xi):
 	'''
 	Plots a field imported from a comsol 3d csv file.
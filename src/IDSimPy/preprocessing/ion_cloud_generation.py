@@ -5,25 +5,54 @@ ion_cloud_generation: Generation of ion cloud initialization files
 """
 
 import numpy as np
+from ..analysis.constants import JOULE_PER_EV, KG_PER_AMU
 
 
-def write_cloud_file(ion_cloud, filename):
+def write_cloud_file(ion_cloud, filename, chunk_size=65536):
 	"""
 	Writes an ion cloud to an ion cloud file
 
+	The ion cloud is written as semicolon separated text file, as expected by IDSimF. If the file name ends with
+	``.npy``, the ion cloud is written in a compact binary format (a numpy ``.npy`` file with the ion cloud array)
+	instead, which can be read back with :py:func:`read_cloud_file`.
+
 	:param ion_cloud: an np.array with the columns:
-		[x pos, y pos, z pos, x velo, y velo, z velo, charge (in elem. charges), mass (in amu)]
+		[x pos, y pos, z pos, x velo, y velo, z velo, charge (in elem. charges), mass (in amu), time of birth]
 	:type ion_cloud: numpy.Array
 	:param filename: name of the file in which the tabular ion cloud data is written to
 	:type filename: str
+	:param chunk_size: number of ions formatted at once when a text ion cloud file is written
+	:type chunk_size: int
 	"""
+	ion_cloud = np.asarray(ion_cloud)
+	if filename.endswith('.npy'):
+		np.save(filename, ion_cloud)
+		return
+
+	n_ions = np.shape(ion_cloud)[0]
+	line_format = '%s;' * np.shape(ion_cloud)[1] + '\n'
 	with open(filename, 'w') as file:
-		for i_ion in range(np.shape(ion_cloud)[0]):
-			line = ion_cloud[i_ion, :]
-			for v in line:
-				file.write(str(v) + ';')
+		for i_start in range(0, n_ions, chunk_size):
+			chunk = ion_cloud[i_start: i_start + chunk_size, :]
+			file.write((line_format * np.shape(chunk)[0]) % tuple(chunk.ravel().tolist()))
+
+
+def read_cloud_file(filename):
+	"""
+	Reads an ion cloud file, either a semicolon separated text ion cloud file or a binary ion cloud file
+	(with the file name ending ``.npy``) as written by :py:func:`write_cloud_file`.
+
+	:param filename: name of the ion cloud file to read
+	:type filename: str
+	:return: the ion cloud in an np.array with the structure as expected by write_cloud_file
+	"""
+	if filename.endswith('.npy'):
+		return np.load(filename)
+
+	with open(filename) as file:
+		lines = [line.rstrip().rstrip(';') for line in file if line.strip() and not line.startswith('#')]
 
-			file.write('\n')
+	return np.loadtxt(lines, delimiter=';', ndmin=2)
 
 
 def velo_from_kinetic_energy(ke_eV, mass_amu):
@@ -33,11 +62,30 @@ def velo_from_kinetic_energy(ke_eV, mass_amu):
 	return v
 
 
-def random_sphere(radius, n_samples):
+def _uniform_random(rng, size):
+	"""
+	Draws uniformly distributed random numbers in [0, 1) from a random generator or from the global numpy random
+	state if no generator is given
+	"""
+	if rng is None:
+		return np.random.random_sample(size)
+	return rng.random(size)
+
+
+def random_sphere(radius, n_samples, rng=None):
+	"""
+	Picks random points uniformly distributed on the surface of a sphere
+
+	:param radius: the radius of the sphere, either a scalar or a column vector with one radius per sample
+	:param int n_samples: the number of random points
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
+	:return: array of random points with the shape [n_samples, 3]
+	"""
 	# http://mathworld.wolfram.com/SpherePointPicking.html
 
-	z = 2 * np.random.rand(n_samples) - 1  # uniform in -1, 1
-	t = 2 * np.pi * np.random.rand(n_samples)  # uniform in 0, 2*pi
+	z = 2 * _uniform_random(rng, n_samples) - 1  # uniform in -1, 1
+	t = 2 * np.pi * _uniform_random(rng, n_samples)  # uniform in 0, 2*pi
 	x = np.sqrt(1 - z ** 2) * np.cos(t)
 	y = np.sqrt(1 - z ** 2) * np.sin(t)
 	coords = np.transpose(np.vstack([x, y, z])) * radius
@@ -49,16 +97,68 @@ def set_kinetic_energy_in_z_dir(ion_cloud, ke):
 	return ion_cloud
 
 
-def add_thermalized_kinetic_energy(ion_cloud, ke):
+def add_thermalized_kinetic_energy(ion_cloud, ke, rng=None):
+	"""
+	Adds a velocity with random direction and the magnitude of a given kinetic energy to the particles in an
+	ion cloud. The ion cloud is modified in place.
+
+	:param ion_cloud: the ion cloud to modify
+	:type ion_cloud: numpy.Array
+	:param float ke: the kinetic energy (in eV)
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
+	:return: the modified ion cloud
+	"""
 	n_ions = np.shape(ion_cloud)[0]
 	thermal_velo_mag = velo_from_kinetic_energy(ke, ion_cloud[:, 7])
-	thermal_velo = random_sphere(np.transpose([thermal_velo_mag]), n_ions)
+	thermal_velo = random_sphere(np.transpose([thermal_velo_mag]), n_ions, rng)
 
-	ion_cloud[:, 3:6] = ion_cloud[:, 3:6] + thermal_velo
+	ion_cloud[:, 3:6] += thermal_velo
 
 	return ion_cloud
 
 
+def _fill_xy_grid(ion_cloud, n_x, n_y, w_x, w_y, o_x, o_y):
+	X, Y = np.meshgrid(np.linspace(-w_x, w_x, n_x) + o_x, np.linspace(-w_y, w_y, n_y) + o_y, indexing='ij')
+	ion_cloud[:, 0] = X.ravel()
+	ion_cloud[:, 1] = Y.ravel()
+
+
+def _fill_block(ion_cloud, w_x, w_y, w_z, rng):
+	positions = _uniform_random(rng, (np.shape(ion_cloud)[0], 3))
+	positions *= [2 * w_x, 2 * w_y, 2 * w_z]
+	positions -= [w_x, w_y, w_z]
+	ion_cloud[:, 0:3] = positions
+
+
+def _fill_cylinder(ion_cloud, r, length, axis, rng):
+	# the cylinder cross section is filled uniformly, see http://mathworld.wolfram.com/DiskPointPicking.html
+	n_ions = np.shape(ion_cloud)[0]
+	R = np.sqrt(_uniform_random(rng, n_ions)) * r
+	phi = _uniform_random(rng, n_ions) * 2 * np.pi
+	if axis == 'z':
+		ion_cloud[:, 2] = _uniform_random(rng, n_ions) * length
+		ion_cloud[:, 0] = np.cos(phi) * R
+		ion_cloud[:, 1] = np.sin(phi) * R
+	else:
+		ion_cloud[:, 0] = (_uniform_random(rng, n_ions) - 0.5) * 2.0 * length
+		ion_cloud[:, 2] = np.cos(phi) * R
+		ion_cloud[:, 1] = np.sin(phi) * R
+
+
+def _fill_sphere(ion_cloud, r, rng):
+	n_ions = np.shape(ion_cloud)[0]
+	radii = np.cbrt(_uniform_random(rng, n_ions)) * r
+	ion_cloud[:, 0:3] = random_sphere(np.transpose([radii]), n_ions, rng)
+
+
+def _new_ion_group(n_ions, charge, mass):
+	result = np.zeros([n_ions, 9])
+	result[:, 6] = charge
+	result[:, 7] = mass
+	return result
+
+
 def define_xy_grid(n_x, n_y, w_x, w_y, o_x, o_y, mass):
 	"""
 	Defines a grid in the x-y direction (z=0)
@@ -73,21 +173,12 @@ def define_xy_grid(n_x, n_y, w_x, w_y, o_x, o_y, mass):
 	:param float mass: the mass of the ions in the grid
 	:return: the ion cloud in an np.array with the structure as expected by write_cloud_file
 	"""
-	X = np.linspace(-w_x, w_x, n_x) + o_x
-	Y = np.linspace(-w_y, w_y, n_y) + o_y
-
-	result = np.zeros([n_x * n_y, 8])
-
-	i = 0
-	for x in X:
-		for y in Y:
-			result[i, :] = np.array([x, y, 0, 0, 0, 0, 1, mass, 0])
-			i += 1
-
+	result = _new_ion_group(n_x * n_y, 1, mass)
+	_fill_xy_grid(result, n_x, n_y, w_x, w_y, o_x, o_y)
 	return result
 
 
-def define_origin_centered_block(n_ions, w_x, w_y, w_z, mass):
+def define_origin_centered_block(n_ions, w_x, w_y, w_z, mass, rng=None):
 	"""
 	Defines a block of random ions around the coordinate system origin
 
@@ -96,23 +187,16 @@ def define_origin_centered_block(n_ions, w_x, w_y, w_z, mass):
 	:param float w_y: the width in y direction
 	:param float w_z: the width in z direction
 	:param float mass: the mass of the ions (in amu)
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
 	:return: the ion cloud in an np.array with the structure as expected by write_cloud_file
 	"""
-	X = np.random.rand(n_ions, 3)
-	V = np.zeros([n_ions, 3])
-	M = np.zeros([n_ions, 1]) + mass
-	C = np.zeros([n_ions, 1]) + 1
-	TOB = np.zeros([n_ions, 1])
-
-	X[:, 0] = (X[:, 0] * (2 * w_x)) - w_x
-	X[:, 1] = (X[:, 1] * (2 * w_y)) - w_y
-	X[:, 2] = (X[:, 2] * (2 * w_z)) - w_z
-
-	result = np.hstack([X, V, C, M, TOB])
+	result = _new_ion_group(n_ions, 1, mass)
+	_fill_block(result, w_x, w_y, w_z, rng)
 	return result
 
 
-def define_cylinder_z_dir(n_ions, r, z, charge, mass):
+def define_cylinder_z_dir(n_ions, r, z, charge, mass, rng=None):
 	"""
 	Defines a cylinder with the cylinder axis parallel to the z-axis and the center of one face of the cylinder on
 	the origin of the coordinate system filled with random ions.
@@ -125,26 +209,17 @@ def define_cylinder_z_dir(n_ions, r, z, charge, mass):
 	:param float z: Height of the cylinder
 	:param float charge: Charge of the ions in the generated cylinder
 	:param float mass: Mass of the ions in the generated cylinder
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
 	:return: Array with parameters of the particles in the defined cylinder. Columns are:
 		[x,y,z, vx, vy, vz, charge, mass, time of birth]
 	"""
-	R = np.sqrt(np.random.rand(n_ions, 1)) * r
-	phi = np.random.rand(n_ions, 1) * 2 * np.pi
-	Z = np.random.rand(n_ions, 1) * z
-
-
-	X = np.cos(phi) * R
-	Y = np.sin(phi) * R
-
-	V = np.zeros([n_ions, 3])
-	C = np.zeros([n_ions, 1]) + charge
-	M = np.zeros([n_ions, 1]) + mass
-	TOB = np.zeros([n_ions, 1])
-
-	result = np.hstack([X, Y, Z, V, C, M, TOB])
+	result = _new_ion_group(n_ions, charge, mass)
+	_fill_cylinder(result, r, z, 'z', rng)
 	return result
 
-def define_cylinder_x_dir(n_ions, r, x, charge, mass):
+
+def define_cylinder_x_dir(n_ions, r, x, charge, mass, rng=None):
 	"""
 	Defines a cylinder with the cylinder axis parallel to the x-axis and the center of one face of the cylinder on
 	the origin of the coordinate system filled with random ions
@@ -157,24 +232,173 @@ def define_cylinder_x_dir(n_ions, r, x, charge, mass):
 	:param float x: length ("radius") in x direction
 	:param float charge: Charge of the ions in the generated cylinder
 	:param float mass: Mass of the ions in the generated cylinder
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
 	:return: Array with parameters of the particles in the defined cylinder. Columns are:
 		[x,y,z, vx, vy, vz, charge, mass, time of birth]
 	"""
-	R = np.sqrt(np.random.rand(n_ions, 1)) * r
-	phi = np.random.rand(n_ions, 1) * 2 * np.pi
-	X = (np.random.rand(n_ions, 1)-0.5) * 2.0 * x
+	result = _new_ion_group(n_ions, charge, mass)
+	_fill_cylinder(result, r, x, 'x', rng)
+	return result
 
 
-	Z = np.cos(phi) * R
-	Y = np.sin(phi) * R
+def define_sphere(n_ions, r, charge, mass, rng=None):
+	"""
+	Defines a sphere around the origin of the coordinate system uniformly filled with random ions
+
+	:param int n_ions: The number of ions in the sphere
+	:param float r: Radius of the sphere
+	:param float charge: Charge of the ions in the generated sphere
+	:param float mass: Mass of the ions in the generated sphere
+	:param rng: random generator to draw from, the global numpy random state is used if None
+	:type rng: numpy.random.Generator
+	:return: Array with parameters of the particles in the defined sphere. Columns are:
+		[x,y,z, vx, vy, vz, charge, mass, time of birth]
+	"""
+	result = _new_ion_group(n_ions, charge, mass)
+	_fill_sphere(result, r, rng)
+	return result
 
-	V = np.zeros([n_ions, 3])
-	C = np.zeros([n_ions, 1]) + charge
-	M = np.zeros([n_ions, 1]) + mass
-	TOB = np.zeros([n_ions, 1])
 
-	result = np.hstack([X, Y, Z, V, C, M, TOB])
-	return result
+class IonCloudBuilder:
+	"""
+	Builder for ion clouds consisting of multiple groups of particles (e.g. multiple ion species in different
+	geometric shapes).
+
+	The particle groups are added to the builder, the ion cloud is then generated by :py:meth:`build`, which allocates
+	the complete ion cloud array once and fills the particle groups in place. All random numbers are drawn from a
+	``numpy.random.Generator`` initialized with the seed of the builder, thus a builder with a defined seed
+	generates the same ion cloud on every call of :py:meth:`build`.
+
+	The methods adding particle groups return the builder itself, which allows to chain them::
+
+		builder = IonCloudBuilder(seed=42)
+		builder.add_cylinder_z_dir(1000, 1e-3, 5e-3, 1, 100).add_sphere(500, 1e-3, 1, 200, kinetic_energy=0.1)
+		cloud = builder.build()
+
+	All particle group definitions take the optional parameters ``offset`` (a translation [x, y, z] of the particle
+	group), ``kinetic_energy`` (a thermalized kinetic energy in eV, see :py:func:`add_thermalized_kinetic_energy`)
+	and ``time_of_birth``.
+	"""
+
+	def __init__(self, seed=None):
+		"""
+		Constructor
+
+		:param seed: seed for the random generator, an arbitrary seed is used if None
+		:type seed: int or numpy.random.SeedSequence
+		"""
+		self.seed = seed
+		self.groups = []
+
+	@property
+	def n_ions(self):
+		"""The total number of ions in the ion cloud"""
+		return sum([group['n_ions'] for group in self.groups])
+
+	def _add_group(self, n_ions, fill_function, charge, mass, offset, kinetic_energy, time_of_birth):
+		self.groups.append({
+			'n_ions': n_ions, 'fill_function': fill_function, 'charge': charge, 'mass': mass, 'offset': offset,
+			'kinetic_energy': kinetic_energy, 'time_of_birth': time_of_birth})
+		return self
+
+	def add_block(self, n_ions, w_x, w_y, w_z, charge, mass, offset=None, kinetic_energy=None, time_of_birth=0.0):
+		"""
+		Adds a block of random ions (from -width to width in every direction)
+
+		:param int n_ions: the number of ions in the block
+		:param float w_x: the width in x direction
+		:param float w_y: the width in y direction
+		:param float w_z: the width in z direction
+		:param float charge: charge of the ions (in elementary charges)
+		:param float mass: mass of the ions (in amu)
+		"""
+		return self._add_group(
+			n_ions, lambda cloud, rng: _fill_block(cloud, w_x, w_y, w_z, rng),
+			charge, mass, offset, kinetic_energy, time_of_birth)
+
+	def add_cylinder_z_dir(self, n_ions, r, z, charge, mass, offset=None, kinetic_energy=None, time_of_birth=0.0):
+		"""
+		Adds a cylinder filled with random ions with the cylinder axis parallel to the z-axis
+		(see :py:func:`define_cylinder_z_dir`)
+
+		:param int n_ions: the number of ions in the cylinder
+		:param float r: radius of the cylinder
+		:param float z: height of the cylinder
+		:param float charge: charge of the ions (in elementary charges)
+		:param float mass: mass of the ions (in amu)
+		"""
+		return self._add_group(
+			n_ions, lambda cloud, rng: _fill_cylinder(cloud, r, z, 'z', rng),
+			charge, mass, offset, kinetic_energy, time_of_birth)
+
+	def add_cylinder_x_dir(self, n_ions, r, x, charge, mass, offset=None, kinetic_energy=None, time_of_birth=0.0):
+		"""
+		Adds a cylinder filled with random ions with the cylinder axis parallel to the x-axis
+		(see :py:func:`define_cylinder_x_dir`)
+
+		:param int n_ions: the number of ions in the cylinder
+		:param float r: radius of the cylinder
+		:param float x: length ("radius") in x direction
+		:param float charge: charge of the ions (in elementary charges)
+		:param float mass: mass of the ions (in amu)
+		"""
+		return self._add_group(
+			n_ions, lambda cloud, rng: _fill_cylinder(cloud, r, x, 'x', rng),
+			charge, mass, offset, kinetic_energy, time_of_birth)
+
+	def add_sphere(self, n_ions, r, charge, mass, offset=None, kinetic_energy=None, time_of_birth=0.0):
+		"""
+		Adds a sphere uniformly filled with random ions
+
+		:param int n_ions: the number of ions in the sphere
+		:param float r: radius of the sphere
+		:param float charge: charge of the ions (in elementary charges)
+		:param float mass: mass of the ions (in amu)
+		"""
+		return self._add_group(
+			n_ions, lambda cloud, rng: _fill_sphere(cloud, r, rng),
+			charge, mass, offset, kinetic_energy, time_of_birth)
+
+	def add_xy_grid(self, n_x, n_y, w_x, w_y, charge, mass, offset=None, kinetic_energy=None, time_of_birth=0.0):
+		"""
+		Adds a regular grid of ions in the x-y plane (grid is from -width to width, see :py:func:`define_xy_grid`)
+
+		:param int n_x: ions in x direction
+		:param int n_y: ions in y direction
+		:param float w_x: width in x direction
+		:param float w_y: width in y direction
+		:param float charge: charge of the ions (in elementary charges)
+		:param float mass: mass of the ions (in amu)
+		"""
+		return self._add_group(
+			n_x * n_y, lambda cloud, rng: _fill_xy_grid(cloud, n_x, n_y, w_x, w_y, 0.0, 0.0),
+			charge, mass, offset, kinetic_energy, time_of_birth)
+
+	def build(self):
+		"""
+		Generates the ion cloud
+
+		:return: the ion cloud in an np.array with the structure as expected by write_cloud_file
+		"""
+		rng = np.random.default_rng(self.seed)
+		ion_cloud = np.zeros([self.n_ions, 9])
+
+		i_start = 0
+		for group in self.groups:
+			group_cloud = ion_cloud[i_start: i_start + group['n_ions'], :]
+			i_start += group['n_ions']
+
+			group['fill_function'](group_cloud, rng)
+			if group['offset'] is not None:
+				group_cloud[:, 0:3] += group['offset']
+			group_cloud[:, 6] = group['charge']
+			group_cloud[:, 7] = group['mass']
+			group_cloud[:, 8] = group['time_of_birth']
+			if group['kinetic_energy'] is not None:
+				add_thermalized_kinetic_energy(group_cloud, group['kinetic_energy'], rng)
+
+		return ion_cloud
 
 
 def write_xy_slice(n_ions, masses, w_x, w_y, filename):
@@ -187,16 +411,15 @@ def write_xy_slice(n_ions, masses, w_x, w_y, filename):
 	:param float w_y: the width in y direction (in m)
 	:param str filename: the name of the file to write the resulting ion cloud to
 	"""
-	ion_cloud = []
+	ion_cloud = np.zeros([int(np.sum(n_ions[:len(masses)])), 9])
+	ion_cloud[:, 6] = 1
 
+	i_start = 0
 	for i_m in range(0, len(masses)):
+		species_cloud = ion_cloud[i_start: i_start + n_ions[i_m], :]
+		i_start += n_ions[i_m]
 
-		if len(ion_cloud) == 0:
-			ion_cloud = define_origin_centered_block(n_ions[i_m], w_x, w_y, 0.1 / 1000.0, masses[i_m])
-		else:
-			ion_cloud = np.vstack([
-				ion_cloud,
-				define_origin_centered_block(n_ions[i_m], w_x, w_y, 0.1 / 1000.0, masses[i_m])
-			])
+		_fill_block(species_cloud, w_x, w_y, 0.1 / 1000.0, None)
+		species_cloud[:, 7] = masses[i_m]
 
 	write_cloud_file(ion_cloud, filename)
@@ -1,7 +1,15 @@
 import unittest
 import os
+import json
+import gzip
+import shutil
+import h5py
 import numpy as np
+import vtk
+from vtk.util import numpy_support
 import IDSimPy.analysis as ia
+import IDSimPy.analysis.trajectory as ia_tra
+from IDSimPy._cache_util import write_cache_entry
 
 
 class TestTrajectory(unittest.TestCase):
@@ -158,6 +166,49 @@ class TestTrajectory(unittest.TestCase):
 		np.testing.assert_almost_equal(particle[0], (5.0, 6.0, 7.0))
 		np.testing.assert_almost_equal(particle[1], (10, 300))
 
+	def test_ragged_frames(self):
+		frames = [np.arange(i * 3, dtype=float).reshape(i, 3) for i in (2, 0, 4, 1)]
+		ragged = ia.RaggedFrames.from_frames(frames)
+		self.assertEqual(len(ragged), 4)
+		self.assertEqual(ragged.data.shape, (7, 3))
+		np.testing.assert_array_equal(ragged.offsets, (0, 2, 2, 6, 7))
+		for i in range(4):
+			np.testing.assert_array_equal(ragged[i], frames[i])
+		np.testing.assert_array_equal(ragged[-1], frames[-1])
+		self.assertEqual(len(ragged[1:3]), 2)
+		with self.assertRaises(IndexError):
+			ragged[4]
+
+		selected = ragged.select_rows(ragged.data[:, 0] > 2.0)
+		np.testing.assert_array_equal(selected.offsets, (0, 1, 1, 4, 4))
+		np.testing.assert_array_equal(selected[2], frames[2][1:, :])
+
+		with self.assertRaises(ValueError):
+			ia.RaggedFrames(np.zeros((3, 3)), (0, 2))
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		self.assertIsInstance(tra.positions, ia.RaggedFrames)
+		self.assertIsInstance(tra.particle_attributes.attr_dat_int, ia.RaggedFrames)
+
+		coc = ia.center_of_charge(tra)
+		np.testing.assert_allclose(coc[5, :], np.mean(tra[5], axis=0), rtol=1e-5)
+		self.assertTrue(np.all(np.isnan(coc[0, :])))
+
+		tra_list = ia.Trajectory(
+			positions=list(tra.positions), times=tra.times,
+			particle_attributes=ia.ParticleAttributes(
+				tra.particle_attributes.attr_names_float, list(tra.particle_attributes.attr_dat_float),
+				tra.particle_attributes.attr_names_int, list(tra.particle_attributes.attr_dat_int)))
+		tra_filtered = ia.filter_attribute(tra, 'global index', 10)
+		tra_list_filtered = ia.filter_attribute(tra_list, 'global index', 10)
+		for i in range(tra.n_timesteps):
+			np.testing.assert_array_equal(tra_filtered[i], tra_list_filtered[i])
+			np.testing.assert_array_equal(tra_filtered[i], tra[i][tra.particle_attributes.get('global index', i) == 10])
+
+		velocity_x = tra.particle_attributes.get('velocity x')
+		self.assertEqual(len(velocity_x), tra.n_timesteps)
+		np.testing.assert_array_equal(velocity_x[7], tra_list.particle_attributes.get('velocity x', 7))
+
 	#  --------------- test Trajectory reading from files ---------------
 
 	def test_hdf5_v3_trajectory_reading_variable_timesteps(self):
@@ -223,6 +274,205 @@ class TestTrajectory(unittest.TestCase):
 		self.assertEqual(tra.n_particles, 1000)
 		self.assertEqual(np.shape(tra.positions), (1000, 3, 51))
 		self.assertAlmostEqual(tra.positions[983, 0, 9], -0.00146076)
+		self.assertTrue(tra.positions.dtype.isnative)
+		self.assertTrue(tra.positions.flags['C_CONTIGUOUS'])
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v2_static_fname, time_range=(-2.0, -1.0))
+		self.assertEqual(np.shape(tra.positions), (0, 3, 0))
+
+	def test_lazy_hdf5_trajectory_reading(self):
+		tra_eager = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname)
+
+		with ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, lazy=True, cache_size=2) as tra:
+			self.assertEqual(tra.is_static_trajectory, True)
+			self.assertIsInstance(tra.positions, ia.LazyFrames)
+			self.assertEqual(tra.n_particles, 1000)
+			self.assertEqual(tra.positions.shape, (1000, 3, 52))
+			np.testing.assert_array_equal(tra[9], tra_eager[9])
+			self.assertEqual(tra[9].dtype, tra_eager[9].dtype)  # frames in native byte order
+			np.testing.assert_array_equal(tra.positions[983, :, 9], tra_eager.positions[983, :, 9])
+			np.testing.assert_array_equal(tra.positions[:, 2, :], tra_eager.positions[:, 2, :])
+			np.testing.assert_array_equal(tra.particle_attributes.get('global index', 3),
+			                              tra_eager.particle_attributes.get('global index', 3))
+			np.testing.assert_array_equal(ia.center_of_charge(tra), ia.center_of_charge(tra_eager))
+			self.assertLessEqual(len(tra.positions.frame_source._cache), 2)
+
+		with self.assertRaises(ValueError):
+			tra[0]
+
+		with ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, lazy=True, particle_indices=[5, 2, 7]) as tra:
+			self.assertEqual(tra[4].dtype, tra_eager[4].dtype)
+			self.assertEqual(tra.particle_attributes.get('velocity x', 4).dtype,
+			                 tra_eager.particle_attributes.get('velocity x', 4).dtype)
+
+		tra_eager_var = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		with ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, lazy=True) as tra_var:
+			self.assertEqual(tra_var.is_static_trajectory, False)
+			self.assertEqual(np.shape(tra_var[0]), (0, 3))
+			self.assertEqual(np.shape(tra_var[3]), (144, 3))
+			self.assertEqual(tra_var.get_n_particles(5), 214)
+
+			tra_filtered = ia.filter_attribute(tra_var, 'global index', 10)
+			tra_filtered_eager = ia.filter_attribute(tra_eager_var, 'global index', 10)
+			for i in range(tra_var.n_timesteps):
+				np.testing.assert_array_equal(tra_filtered[i], tra_filtered_eager[i])
+
+	def test_hdf5_trajectory_reading_with_timestep_selection(self):
+		tra_full = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, timestep_slice=slice(3, 40, 10))
+		self.assertEqual(tra.n_timesteps, 4)
+		np.testing.assert_array_equal(tra.times, tra_full.times[3:40:10])
+		np.testing.assert_array_equal(tra[1], tra_full[13])
+		np.testing.assert_array_equal(tra.particle_attributes.get('global index', 2),
+		                              tra_full.particle_attributes.get('global index', 23))
+
+		t_start, t_stop = tra_full.times[10], tra_full.times[20]
+		tra = ia.read_hdf5_trajectory_file(
+			self.hdf5_v3_variable_fname, time_range=(t_start, t_stop), timestep_slice=slice(None, None, 5))
+		np.testing.assert_array_equal(tra.times, tra_full.times[10:21:5])
+		np.testing.assert_array_equal(tra[2], tra_full[20])
+
+		tra_lazy = ia.read_hdf5_trajectory_file(
+			self.hdf5_v3_variable_fname, lazy=True, time_range=(t_start, t_stop), timestep_slice=slice(None, None, 5))
+		self.assertEqual(tra_lazy.n_timesteps, 3)
+		np.testing.assert_array_equal(tra_lazy[2], tra_full[20])
+		tra_lazy.close()
+
+		tra_legacy_full = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname)
+		tra_legacy = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname, timestep_slice=slice(5, 30, 4))
+		np.testing.assert_array_equal(tra_legacy.positions, tra_legacy_full.positions[:, :, 5:30:4])
+		np.testing.assert_array_equal(tra_legacy.particle_attributes.get('velocity x'),
+		                              tra_legacy_full.particle_attributes.get('velocity x')[:, 5:30:4])
+
+		tra_legacy = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname, timestep_slice=slice(None, None, -3))
+		np.testing.assert_array_equal(tra_legacy.positions, tra_legacy_full.positions[:, :, ::-3])
+
+	def test_hdf5_trajectory_reading_with_attribute_selection(self):
+		tra_full = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+
+		tra = ia.read_hdf5_trajectory_file(
+			self.hdf5_v3_variable_fname, attributes=['global index', 'velocity z', 'velocity x'])
+		self.assertEqual(tra.particle_attributes.attribute_names, ['velocity z', 'velocity x', 'global index'])
+		np.testing.assert_array_equal(tra[5], tra_full[5])
+		for name in ('global index', 'velocity z', 'velocity x'):
+			np.testing.assert_array_equal(tra.particle_attributes.get(name, 5),
+			                              tra_full.particle_attributes.get(name, 5))
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, attributes=['velocity y'], positions=False)
+		self.assertIsNone(tra.positions)
+		self.assertEqual(tra.n_timesteps, tra_full.n_timesteps)
+		self.assertEqual(tra.get_n_particles(5), 214)
+		np.testing.assert_array_equal(tra.particle_attributes.get('velocity y', 5),
+		                              tra_full.particle_attributes.get('velocity y', 5))
+		with self.assertRaises(ValueError):
+			tra[5]
+
+		with ia.read_hdf5_trajectory_file(
+				self.hdf5_v3_static_fname, lazy=True, attributes=['global index'], positions=False) as tra_lazy:
+			self.assertEqual(tra_lazy.is_static_trajectory, True)
+			self.assertEqual(tra_lazy.n_particles, 1000)
+			np.testing.assert_array_equal(
+				tra_lazy.particle_attributes.get('global index', 7),
+				ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname).particle_attributes.get('global index', 7))
+
+		with self.assertRaises(ValueError):
+			ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, attributes=['not an attribute'])
+
+	def test_hdf5_trajectory_reading_with_particle_selection(self):
+		tra_full = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname)
+
+		indices = [983, 5, 10, 15, 20, -1]
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, particle_indices=indices)
+		self.assertEqual(tra.is_static_trajectory, True)
+		self.assertEqual(tra.n_particles, 6)
+		np.testing.assert_array_equal(tra.positions, tra_full.positions[indices, :, :])
+		np.testing.assert_array_equal(tra.particle_attributes.get('global index', 9),
+		                              tra_full.particle_attributes.get('global index', 9)[indices])
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, particle_indices=range(10, 20, 3), lazy=True)
+		np.testing.assert_array_equal(tra.positions[:, :, 7], tra_full.positions[10:20:3, :, 7])
+		tra.close()
+
+		with self.assertRaises(ValueError):
+			ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, particle_indices=[1, 2])
+
+		tra_var_full = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		tra_filtered = ia.filter_attribute(tra_var_full, 'global index', 10)
+		for lazy in (False, True):
+			tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, where=('global index', 10), lazy=lazy)
+			self.assertEqual(tra.n_timesteps, tra_filtered.n_timesteps)
+			for i in range(tra.n_timesteps):
+				np.testing.assert_array_equal(tra[i], tra_filtered[i])
+				np.testing.assert_array_equal(tra.particle_attributes.get('velocity x', i),
+				                              tra_filtered.particle_attributes.get('velocity x', i))
+			tra.close()
+
+	def test_parallel_hdf5_trajectory_reading(self):
+		tra_serial = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname)
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, n_workers=3)
+		self.assertEqual(tra.is_static_trajectory, True)
+		np.testing.assert_array_equal(tra.times, tra_serial.times)
+		np.testing.assert_array_equal(tra.positions, tra_serial.positions)
+		np.testing.assert_array_equal(tra.particle_attributes.attr_dat_int, tra_serial.particle_attributes.attr_dat_int)
+		np.testing.assert_array_equal(tra.start_splat_data.splat_times, tra_serial.start_splat_data.splat_times)
+
+		tra_serial = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, timestep_slice=slice(2, None, 3))
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, timestep_slice=slice(2, None, 3), n_workers=2)
+		self.assertEqual(tra.n_timesteps, tra_serial.n_timesteps)
+		for i in range(tra.n_timesteps):
+			np.testing.assert_array_equal(tra[i], tra_serial[i])
+			np.testing.assert_array_equal(tra.particle_attributes.get('velocity x', i),
+			                              tra_serial.particle_attributes.get('velocity x', i))
+
+		with self.assertRaises(ValueError):
+			ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, lazy=True, n_workers=2)
+
+	def test_hdf5_chunk_decompression(self):
+		# the raw chunks of gzip compressed datasets are decoded without the hdf5 library by the trajectory readers:
+		data = np.random.default_rng(3).normal(size=(103, 11)).astype('>f4')
+		with h5py.File(os.path.join(self.result_path, 'chunk_decompression_test.hd5'), 'w') as h5f:
+			datasets = [
+				h5f.create_dataset('gzip', data=data, chunks=(10, 4), compression='gzip'),
+				h5f.create_dataset('shuffle', data=data, chunks=(7, 11), compression='gzip', shuffle=True),
+				h5f.create_dataset('lzf', data=data, chunks=(10, 4), compression='lzf'),
+				h5f.create_dataset('plain', data=data)]
+			unwritten = h5f.create_dataset('unwritten', shape=(30, 4), dtype='>f4', chunks=(10, 4), compression='gzip')
+			unwritten[0:10] = data[0:10, 0:4]
+
+			for dataset in datasets:
+				for rows, cols in (((0, 103), (0, 11)), ((5, 6), (3, 9)), ((17, 88), (4, 5)), ((100, 103), (0, 11))):
+					block = ia_tra._read_dataset_block(dataset, rows[0], rows[1], cols[0], cols[1])
+					self.assertEqual(block.dtype, np.dtype('=f4'))
+					np.testing.assert_array_equal(block, data[rows[0]:rows[1], cols[0]:cols[1]])
+
+			np.testing.assert_array_equal(ia_tra._read_dataset_block(unwritten, 5, 25, 0, 4), unwritten[5:25])
+
+	def test_hdf5_trajectory_frame_iteration(self):
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		frames = list(ia.iter_hdf5_trajectory_frames(self.hdf5_v3_variable_fname))
+		self.assertEqual(len(frames), tra.n_timesteps)
+		for i, (time, positions, attributes_float, attributes_int) in enumerate(frames):
+			self.assertEqual(time, tra.times[i])
+			np.testing.assert_array_equal(positions, tra[i])
+			np.testing.assert_array_equal(attributes_float[:, 0], tra.particle_attributes.get('velocity x', i))
+			np.testing.assert_array_equal(attributes_int[:, 0], tra.particle_attributes.get('global index', i))
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v2_static_fname)
+		frames = ia.iter_hdf5_trajectory_frames(self.hdf5_v2_static_fname, timestep_slice=slice(10, 20, 5))
+		time, positions, attributes_float, attributes_int = next(frames)
+		self.assertEqual(time, tra.times[10])
+		np.testing.assert_array_equal(positions, tra[10])
+		self.assertIsNone(attributes_int)
+		frames.close()
+
+		tra = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname)
+		frames = list(ia.iter_hdf5_trajectory_frames(
+			self.legacy_hdf5_aux_fname, attributes=['velocity z', 'velocity x'], positions=False))
+		self.assertEqual(len(frames), tra.n_timesteps)
+		self.assertIsNone(frames[7][1])
+		np.testing.assert_array_equal(frames[7][2][:, 0], tra.particle_attributes.get('velocity z', 7))
+		np.testing.assert_array_equal(frames[7][2][:, 1], tra.particle_attributes.get('velocity x', 7))
 
 	def test_legacy_hdf5_trajectory_reading(self):
 		tra = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname)
@@ -238,6 +488,192 @@ class TestTrajectory(unittest.TestCase):
 		self.assertEqual(tra.particle_attributes.number_of_attributes, 1)
 		self.assertEqual(len(tra.optional_attributes[ia.OptionalAttribute.PARTICLE_MASSES]), 2000)
 
+	def test_synthetic_json_trajectory_reading(self):
+		n_ions, n_steps = 7, 23
+		positions = np.random.default_rng(1).normal(size=(n_ions, 3, n_steps))
+		times = np.linspace(0, 2.2e-5, n_steps)
+		steps = [{'time': times[i], 'ions': [[list(positions[j, :, i]), j, 2.0 * j] for j in range(n_ions)]}
+		         for i in range(n_steps)]
+		tj = {'ionMasses': [100.0 + i for i in range(n_ions)], 'steps': steps, 'splatTimes': [0.0] * n_ions}
+
+		json_fname = os.path.join(self.result_path, 'synthetic_trajectories.json')
+		with open(json_fname, 'w') as tf:
+			json.dump(tj, tf, indent=1)
+		json_gz_fname = os.path.join(self.result_path, 'synthetic_trajectories.json.gz')
+		with gzip.open(json_gz_fname, 'wt') as tf:
+			json.dump(tj, tf)
+
+		for fname in (json_fname, json_gz_fname):
+			tra = ia.read_json_trajectory_file(fname)
+			self.assertEqual(tra.positions.shape, (n_ions, 3, n_steps))
+			np.testing.assert_array_equal(tra.positions, positions)
+			np.testing.assert_array_equal(tra.times, times)
+			self.assertEqual(tra.particle_attributes.number_of_attributes, 2)
+			np.testing.assert_array_equal(tra.particle_attributes.get('attribute 2', 4), 2.0 * np.arange(n_ions))
+			np.testing.assert_array_equal(
+				tra.optional_attributes[ia.OptionalAttribute.PARTICLE_MASSES], 100.0 + np.arange(n_ions))
+
+		tra = ia.read_json_trajectory_file(json_fname, time_range=(times[5], times[20]), timestep_slice=slice(1, None, 4))
+		np.testing.assert_array_equal(tra.times, times[6:21:4])
+		np.testing.assert_array_equal(tra.positions, positions[:, :, 6:21:4])
+
+		tra = ia.read_json_trajectory_file(json_fname, timestep_slice=slice(None, None, -2))
+		np.testing.assert_array_equal(tra.positions, positions[:, :, ::-2])
+
+	def test_cached_trajectory_reading(self):
+		cache_dir = os.path.join(self.result_path, 'trajectory_cache')
+		shutil.rmtree(cache_dir, ignore_errors=True)
+
+		tra_ref = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		for i in range(2):
+			tra = ia.read_cached_trajectory_file(self.hdf5_v3_variable_fname, cache_dir=cache_dir)
+			self.assertEqual(tra.is_static_trajectory, False)
+			self.assertEqual(tra.file_version_id, 3)
+			self.assertEqual(tra.n_timesteps, tra_ref.n_timesteps)
+			self.assertEqual(tra.particle_attributes.attribute_names, tra_ref.particle_attributes.attribute_names)
+			np.testing.assert_array_equal(tra[5], tra_ref[5])
+			np.testing.assert_array_equal(tra.particle_attributes.get('global index', 5),
+			                              tra_ref.particle_attributes.get('global index', 5))
+			np.testing.assert_array_equal(tra.start_splat_data.splat_positions,
+			                              tra_ref.start_splat_data.splat_positions)
+		self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+		# options which do not change the read data share the cache entry:
+		ia.read_cached_trajectory_file(self.hdf5_v3_variable_fname, cache_dir=cache_dir, n_workers=2)
+		ia.read_cached_trajectory_file(self.hdf5_v3_variable_fname, cache_dir=cache_dir, timestep_slice=None)
+		self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+		tra = ia.read_cached_trajectory_file(self.hdf5_v3_static_fname, cache_dir=cache_dir,
+		                                     timestep_slice=slice(0, 10))
+		self.assertIsInstance(tra.positions, np.memmap)
+		np.testing.assert_array_equal(
+			tra.positions, ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname).positions[:, :, :10])
+
+		tra_ref = ia.read_legacy_hdf5_trajectory_file(self.legacy_hdf5_aux_fname)
+		tra = ia.read_cached_trajectory_file(self.legacy_hdf5_aux_fname, cache_dir=cache_dir)
+		self.assertEqual(tra.file_version_id, 1)
+		np.testing.assert_array_equal(tra.positions, tra_ref.positions)
+		self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+		# long index arrays which differ only in the middle (and have equal numpy reprs) are cached separately:
+		tra_ref = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname, timestep_slice=slice(0, 3))
+		indices_a = np.arange(1200) % tra_ref.n_particles
+		indices_b = indices_a.copy()
+		indices_b[600] = indices_a[601]
+		for indices in (indices_a, indices_b):
+			tra = ia.read_cached_trajectory_file(
+				self.hdf5_v3_static_fname, cache_dir=cache_dir, timestep_slice=slice(0, 3), particle_indices=indices)
+			np.testing.assert_array_equal(tra.positions, tra_ref.positions[indices, :, :])
+		self.assertEqual(len(os.listdir(cache_dir)), 5)
+
+		# the cache entry of a modified trajectory file is replaced:
+		modified_fname = os.path.join(self.result_path, 'cached_modified_trajectory.hd5')
+		shutil.copyfile(self.hdf5_v3_static_fname, modified_fname)
+		ia.read_cached_trajectory_file(modified_fname, cache_dir=cache_dir)
+		tra_static = ia.read_hdf5_trajectory_file(self.hdf5_v3_static_fname)
+		selector = np.zeros(tra_static.n_particles)
+		selector[:10] = 1
+		tra_selected = ia.select(tra_static, selector, 1)
+		ia.write_hdf5_trajectory_file(tra_selected, modified_fname)
+		tra = ia.read_cached_trajectory_file(modified_fname, cache_dir=cache_dir)
+		np.testing.assert_array_equal(tra.positions, tra_selected.positions)
+		self.assertEqual(len(os.listdir(cache_dir)), 6)
+
+	def test_cache_entry_writing(self):
+		cache_dir = os.path.join(self.result_path, 'cache_entry_test')
+		shutil.rmtree(cache_dir, ignore_errors=True)
+		entry_dir = os.path.join(cache_dir, 'entry')
+
+		def write_file(content):
+			def write_entry(tmp_dir):
+				with open(os.path.join(tmp_dir, 'data.txt'), 'w') as data_file:
+					data_file.write(content)
+			return write_entry
+
+		def read_entry():
+			with open(os.path.join(entry_dir, 'data.txt')) as data_file:
+				return data_file.read()
+
+		write_cache_entry(cache_dir, entry_dir, write_file('a'))
+		write_cache_entry(cache_dir, entry_dir, write_file('b'))  # stale entries are replaced
+		self.assertEqual(read_entry(), 'b')
+
+		# interrupted writes leave no temporary directories behind:
+		def interrupted_write(tmp_dir):
+			write_file('c')(tmp_dir)
+			raise KeyboardInterrupt()
+
+		with self.assertRaises(KeyboardInterrupt):
+			write_cache_entry(cache_dir, entry_dir, interrupted_write)
+		self.assertEqual(os.listdir(cache_dir), ['entry'])
+		self.assertEqual(read_entry(), 'b')
+
+		# an entry written concurrently by another process is kept:
+		original_replace = os.replace
+
+		def replace_with_concurrent_write(src, dst):
+			original_replace(src, dst)
+			if src == entry_dir:  # the other process installs its entry after the old entry was moved aside
+				write_cache_entry(cache_dir, entry_dir, write_file('e'))
+
+		os.replace = replace_with_concurrent_write
+		try:
+			write_cache_entry(cache_dir, entry_dir, write_file('d'))
+		finally:
+			os.replace = original_replace
+		self.assertEqual(read_entry(), 'e')
+		self.assertEqual(os.listdir(cache_dir), ['entry'])
+
+	def test_hdf5_trajectory_writing(self):
+		out_fname = os.path.join(self.result_path, 'written_trajectory.hd5')
+		packed_fname = os.path.join(self.result_path, 'written_trajectory_packed.hd5')
+
+		tra_ref = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		ia.write_hdf5_trajectory_file(tra_ref, out_fname, chunks=(64, 3))
+		ia.write_hdf5_trajectory_file(tra_ref, packed_fname, packed=True)
+		for fname in (out_fname, packed_fname):
+			tra = ia.read_hdf5_trajectory_file(fname)
+			self.assertEqual(tra.file_version_id, 3)
+			self.assertEqual(tra.is_static_trajectory, False)
+			self.assertEqual(tra.particle_attributes.attribute_names, tra_ref.particle_attributes.attribute_names)
+			np.testing.assert_array_equal(tra.times, tra_ref.times)
+			for ts_i in (0, 3, tra.n_timesteps - 1):
+				np.testing.assert_array_equal(tra[ts_i], tra_ref[ts_i])
+				np.testing.assert_array_equal(tra.particle_attributes.get('global index', ts_i),
+				                              tra_ref.particle_attributes.get('global index', ts_i))
+			np.testing.assert_array_equal(tra.start_splat_data.splat_times, tra_ref.start_splat_data.splat_times)
+
+		tra_lazy = ia.read_hdf5_trajectory_file(packed_fname, lazy=True)
+		np.testing.assert_array_equal(tra_lazy[3], tra_ref[3])
+		tra_lazy.close()
+		tra = ia.read_hdf5_trajectory_file(packed_fname, where=('global index', 2), timestep_slice=slice(2, 8, 3))
+		np.testing.assert_array_equal(tra[1], tra_ref[5][tra_ref.particle_attributes.get('global index', 5) == 2])
+
+		# parallel reading of packed files, also with non contiguous time steps:
+		for timestep_slice in (None, slice(1, None, 3)):
+			tra_serial = ia.read_hdf5_trajectory_file(packed_fname, timestep_slice=timestep_slice)
+			tra = ia.read_hdf5_trajectory_file(packed_fname, timestep_slice=timestep_slice, n_workers=3)
+			self.assertEqual(tra.n_timesteps, tra_serial.n_timesteps)
+			for ts_i in range(tra.n_timesteps):
+				np.testing.assert_array_equal(tra[ts_i], tra_serial[ts_i])
+				np.testing.assert_array_equal(tra.particle_attributes.get('global index', ts_i),
+				                              tra_serial.particle_attributes.get('global index', ts_i))
+
+		tra_ref = ia.read_hdf5_trajectory_file(self.hdf5_v2_static_fname)
+		selector = np.zeros(tra_ref.n_particles)
+		selector[10:20] = 1
+		tra_selected = ia.select(tra_ref, selector, 1)
+		ia.write_hdf5_trajectory_file(tra_selected, out_fname, compression='lzf')
+		ia.write_hdf5_trajectory_file(tra_selected, packed_fname, compression=None, chunks=None, packed=True)
+		for fname in (out_fname, packed_fname):
+			tra = ia.read_hdf5_trajectory_file(fname)
+			self.assertEqual(tra.is_static_trajectory, True)
+			np.testing.assert_array_equal(tra.positions, tra_selected.positions)
+			np.testing.assert_array_equal(tra.particle_attributes.attr_dat_float,
+			                              tra_selected.particle_attributes.attr_dat_float)
+		tra = ia.read_hdf5_trajectory_file(packed_fname, particle_indices=[3, 1], attributes=['velocity y'])
+		np.testing.assert_array_equal(tra.positions, tra_selected.positions[[3, 1], :, :])
+
 	#  --------------- test Trajectory filtering ---------------
 
 	def test_parameter_filter_with_synthetic_trajectory(self):
@@ -349,6 +785,12 @@ class TestTrajectory(unittest.TestCase):
 		coc_synth_tra_weighted = ia.center_of_charge(synth_tra_static)
 		np.testing.assert_almost_equal(coc_synth_tra_weighted[0], (9.0909091, 9.0909091, 9.0909091))
 
+		# charges changing between the time steps are taken from the particle attributes:
+		charge_attribute = np.dstack(((0, 10, 1, 0, 0), (0, 0, 0, 1, 1))).reshape((5, 1, 2))
+		synth_tra_static.particle_attributes = ia.ParticleAttributes(['charge'], charge_attribute)
+		coc_synth_tra_attribute = ia.center_of_charge(synth_tra_static, charge_attribute='charge')
+		np.testing.assert_almost_equal(coc_synth_tra_attribute, ((9.0909091, 9.0909091, 9.0909091), (0.0, 0.0, 0.0)))
+
 	def test_center_of_charge_calculation_with_variable_trajectory(self):
 		p_pos_1 = np.array(
 			((-10, -10, -10),
@@ -373,6 +815,29 @@ class TestTrajectory(unittest.TestCase):
 		np.testing.assert_almost_equal(coc_synth_tra[0], (-5.0, -5.0, -5.0))
 		np.testing.assert_almost_equal(coc_synth_tra[1], (0.0, 0.0, 0.0))
 
+		# empty frames have no defined center of charge:
+		synth_tra_empty_frame = ia.Trajectory(positions=[p_pos_1, np.zeros((0, 3)), p_pos_2], times=np.arange(3.0))
+		coc_synth_tra_empty_frame = ia.center_of_charge(synth_tra_empty_frame)
+		np.testing.assert_almost_equal(coc_synth_tra_empty_frame[[0, 2]], coc_synth_tra)
+		self.assertTrue(np.all(np.isnan(coc_synth_tra_empty_frame[1])))
+
+		charges = [np.array([[1.0], [3.0]]), np.array([[0.0], [1.0], [1.0]])]
+		synth_tra_variable.particle_attributes = ia.ParticleAttributes(['charge'], charges)
+		coc_synth_tra_attribute = ia.center_of_charge(synth_tra_variable, charge_attribute='charge')
+		np.testing.assert_almost_equal(coc_synth_tra_attribute, ((-2.5, -2.5, -2.5), (5.0, 5.0, 5.0)))
+
+		# lazily read trajectories with empty frames are consistent with eagerly read trajectories:
+		tra_eager = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		self.assertEqual(tra_eager[0].shape[0], 0)
+		coc_eager = ia.center_of_charge(tra_eager)
+		coc_eager_attribute = ia.center_of_charge(tra_eager, charge_attribute='global index')
+		with ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname, lazy=True) as tra_lazy:
+			coc_lazy = ia.center_of_charge(tra_lazy)
+			coc_lazy_attribute = ia.center_of_charge(tra_lazy, charge_attribute='global index')
+		self.assertTrue(np.all(np.isnan(coc_lazy[0])))
+		np.testing.assert_allclose(coc_lazy, coc_eager, rtol=1e-4)
+		np.testing.assert_allclose(coc_lazy_attribute, coc_eager_attribute, rtol=1e-4)
+
 	#  --------------- test Trajectory export / writing ---------------
 
 	def test_static_trajectory_legacy_vtk_export(self):
@@ -382,5 +847,41 @@ class TestTrajectory(unittest.TestCase):
 			os.makedirs(vtk_export_path)
 		ia.export_trajectory_to_vtk(tra, os.path.join(self.result_path, 'vtk_export', 'static_test'))
 
+	def test_trajectory_vtp_export(self):
+		vtk_export_path = os.path.join(self.result_path, 'vtk_export')
+		if not os.path.exists(vtk_export_path):
+			os.makedirs(vtk_export_path)
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v3_variable_fname)
+		ia.export_trajectory_to_vtk(tra, os.path.join(vtk_export_path, 'variable_test'))
+		with open(os.path.join(vtk_export_path, 'variable_test00003.vtk')) as vtk_file:
+			self.assertIn('POINTS 144 float', vtk_file.read())
+
+		base_name = os.path.join(vtk_export_path, 'variable_test_')
+		for n_workers in (None, 2):
+			ia.export_trajectory_to_vtp(tra, base_name, n_workers=n_workers)
+			reader = vtk.vtkXMLPolyDataReader()
+			reader.SetFileName(base_name + '00003.vtp')
+			reader.Update()
+			poly_data = reader.GetOutput()
+			self.assertEqual(poly_data.GetNumberOfVerts(), 144)
+			np.testing.assert_array_equal(numpy_support.vtk_to_numpy(poly_data.GetPoints().GetData()), tra[3])
+			np.testing.assert_array_equal(
+				numpy_support.vtk_to_numpy(poly_data.GetPointData().GetArray('global index')),
+				tra.particle_attributes.get('global index', 3))
+
+		with open(base_name + '.pvd') as pvd_file:
+			pvd_content = pvd_file.read()
+		self.assertEqual(pvd_content.count('<DataSet '), tra.n_timesteps)
+		self.assertIn('file="variable_test_00003.vtp"', pvd_content)
+
+		tra = ia.read_hdf5_trajectory_file(self.hdf5_v2_static_fname)
+		ia.export_trajectory_to_vtp(tra, os.path.join(vtk_export_path, 'static_test_'), attributes=['velocity x'])
+		reader = vtk.vtkXMLPolyDataReader()
+		reader.SetFileName(os.path.join(vtk_export_path, 'static_test_00010.vtp'))
+		reader.Update()
+		self.assertEqual(reader.GetOutput().GetPointData().GetNumberOfArrays(), 1)
+		np.testing.assert_array_equal(numpy_support.vtk_to_numpy(reader.GetOutput().GetPoints().GetData()), tra[10])
+
 
 
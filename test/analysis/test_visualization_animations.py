@@ -1,9 +1,26 @@
 import unittest
+import unittest.mock
 import os
+import functools
 import numpy as np
+import matplotlib.pyplot as plt
 import IDSimPy.analysis.trajectory as tra
 import IDSimPy.analysis.visualization as vis
 
+
+def density_animation_figure(xedges, zedges, vmax):
+	# animation factory for parallel rendering with save_animation (has to be picklable)
+	fig, ax = plt.subplots()
+	im = ax.imshow(
+		np.zeros((len(zedges) - 1, len(xedges) - 1)), origin='lower', vmin=0, vmax=vmax,
+		extent=(xedges[0], xedges[-1], zedges[0], zedges[-1]))
+
+	def update(density):
+		im.set_data(density.T)
+
+	return fig, update
+
+
 class TestVisualizationAnimations(unittest.TestCase):
 
 	@classmethod
@@ -69,6 +86,27 @@ class TestVisualizationAnimations(unittest.TestCase):
 			self.test_reactive_projectName, result_name, interval=5, alpha=0.5,
 			color_parameter="velocity x", file_type='hdf5')
 
+	def test_variable_scatter_animation_low_level(self):
+		tra_var = tra.read_hdf5_trajectory_file(self.new_hdf5_variable_projectName + '_trajectories.hd5')
+		anim = vis.animate_variable_scatter_plot(tra_var, interval=2, alpha=0.5, color_parameter='global index')
+		result_name = os.path.join(self.result_path, 'variable_scatter_animation_test_1.mp4')
+		anim.save(result_name, fps=20, extra_args=['-vcodec', 'libx264'])
+
+		# test with manual coloring, one vector of color values per time step:
+		c_param = [np.arange(tra_var.get_positions(i).shape[0]) for i in range(tra_var.n_timesteps)]
+		anim = vis.animate_variable_scatter_plot(
+			tra_var, xlim=(-0.001, 0.001), ylim=(-0.001, 0.001), zlim=(-0.005, 0.005),
+			color_parameter=c_param, crange=(0, 500))
+		result_name = os.path.join(self.result_path, 'variable_scatter_animation_test_2.mp4')
+		anim.save(result_name, fps=20, extra_args=['-vcodec', 'libx264'])
+
+		self.assertRaises(  # one color vector per time step is required
+			ValueError, vis.animate_variable_scatter_plot, tra_var, color_parameter=c_param[:3])
+
+		c_param[10] = c_param[10][:-1]
+		self.assertRaises(  # color vector length differs from particle number
+			ValueError, vis.animate_variable_scatter_plot, tra_var, color_parameter=c_param)
+
 	def test_basic_scatter_animation_low_level(self):
 		tra_b = tra.read_hdf5_trajectory_file(self.scanning_qit_hdf5_trajectory_b)
 		anim = vis.animate_scatter_plot(tra_b)
@@ -129,6 +167,19 @@ class TestVisualizationAnimations(unittest.TestCase):
 			self.new_hdf5_static_projectName, result_name,
 			xedges=40, zedges=40, axis_equal=True)
 
+		# the density cache is identified by the trajectory file, a cache hit does not hash the trajectory data:
+		cache_file = os.path.join(self.result_path, 'density_animation_test_cache.npz')
+		if os.path.exists(cache_file):
+			os.remove(cache_file)
+		vis.render_xz_density_animation(
+			self.new_hdf5_static_projectName, result_name, xedges=40, zedges=40, density_cache_file=cache_file)
+		cache_mtime = os.stat(cache_file).st_mtime_ns
+		with unittest.mock.patch.object(vis, '_density_cube_fingerprint') as fingerprint:
+			vis.render_xz_density_animation(
+				self.new_hdf5_static_projectName, result_name, xedges=40, zedges=40, density_cache_file=cache_file)
+			fingerprint.assert_not_called()
+		self.assertEqual(os.stat(cache_file).st_mtime_ns, cache_mtime)
+
 	def test_comparison_density_animation_with_json(self):
 		project_names = [self.test_json_projectName, self.test_json_projectName]
 		masses = [73, 55]
@@ -178,3 +229,35 @@ class TestVisualizationAnimations(unittest.TestCase):
 		vis.render_xz_density_comparison_animation(
 			project_names, substances, result_name, n_frames=51, interval=1, select_mode='substance',
 			s_lim=0.001, annotation="", file_type='hdf5')
+
+	def test_parallel_animation_rendering(self):
+		# the frames rendered by parallel workers have to result in the same video as the serial rendering
+		for n_workers in (None, 2):
+			result_name = os.path.join(self.result_path, 'parallel_scatter_animation_test_{}'.format(n_workers))
+			vis.render_scatter_animation(
+				self.new_hdf5_static_projectName, result_name, n_frames=20, alpha=0.5, n_workers=n_workers)
+
+			result_name = os.path.join(self.result_path, 'parallel_density_animation_test_{}'.format(n_workers))
+			vis.render_xz_density_animation(
+				self.new_hdf5_static_projectName, result_name, xedges=40, zedges=40, n_workers=n_workers)
+
+		for suffix in ('scatter_animation_test_{}_scatter.mp4', 'density_animation_test_{}_densityXZ.mp4'):
+			with open(os.path.join(self.result_path, 'parallel_' + suffix.format(None)), 'rb') as serial_file, \
+					open(os.path.join(self.result_path, 'parallel_' + suffix.format(2)), 'rb') as parallel_file:
+				self.assertEqual(serial_file.read(), parallel_file.read())
+
+		tra_b = tra.read_hdf5_trajectory_file(self.scanning_qit_hdf5_trajectory_b)
+		edges = np.linspace(-0.002, 0.002, 30)
+		density_cube = vis.compute_density_cube(tra_b, edges, edges)
+		animation_factory = functools.partial(density_animation_figure, edges, edges, np.max(density_cube))
+
+		video_data = []
+		for n_workers in (None, 3):
+			result_name = os.path.join(self.result_path, 'parallel_custom_animation_test_{}.mp4'.format(n_workers))
+			vis.save_animation(animation_factory, density_cube, result_name, n_workers=n_workers, frames_per_task=5)
+			with open(result_name, 'rb') as result_file:
+				video_data.append(result_file.read())
+		self.assertEqual(video_data[0], video_data[1])
+
+		with self.assertRaises(ValueError):  # there are no frames to render
+			vis.save_animation(animation_factory, density_cube[:0], result_name, n_workers=2)
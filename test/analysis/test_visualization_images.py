@@ -1,4 +1,5 @@
 import unittest
+import unittest.mock
 import os
 import numpy as np
 import matplotlib.pyplot as plt
@@ -23,6 +24,80 @@ class TestVisualization_images(unittest.TestCase):
 		                                          'qitSim_2019_04_15_001_trajectories.hd5')
 		cls.result_path = os.path.join('test', 'test_results')
 
+	def test_density_binning(self):
+		rng = np.random.default_rng(42)
+		x = np.concatenate((rng.normal(size=10000), np.linspace(-2.0, 2.0, 41), (np.nan, 3.0, -3.0)))
+		y = np.concatenate((rng.normal(size=10000), np.linspace(-1.0, 3.0, 41), (0.0, np.inf, 0.5)))
+		w = rng.random(len(x))
+
+		for xedges, yedges in (
+				(np.linspace(-2.0, 2.0, 41), np.linspace(-1.0, 3.0, 21)),
+				(np.linspace(-0.3, 0.7, 3), [-1.0, -0.2, 0.0, 0.1, 3.0])):
+			binning = vis.DensityBinning(xedges, yedges)
+			counts, weighted, weighted_squared = binning.histogram(x, y, w, w ** 2)
+			self.assertEqual(counts.shape, (len(xedges) - 1, len(yedges) - 1))
+			np.testing.assert_array_equal(counts, np.histogram2d(x, y, bins=(xedges, yedges))[0])
+			np.testing.assert_allclose(weighted, np.histogram2d(x, y, bins=(xedges, yedges), weights=w)[0])
+			np.testing.assert_allclose(
+				weighted_squared, np.histogram2d(x, y, bins=(xedges, yedges), weights=w ** 2)[0])
+
+		with self.assertRaises(ValueError):
+			vis.DensityBinning([0.0, 2.0, 1.0], [0.0, 1.0])
+
+	def test_density_cube_computation(self):
+		rng = np.random.default_rng(42)
+		n_ions, n_steps = 500, 20
+		positions = rng.normal(size=(n_ions, 3, n_steps))
+		charges = rng.integers(1, 3, size=(n_ions, 1, n_steps)).astype(float)
+		static_tra = tra.Trajectory(
+			positions=positions, times=np.arange(n_steps) * 1e-6,
+			particle_attributes=tra.ParticleAttributes(['charge'], charges))
+		xedges, zedges = np.linspace(-2, 2, 21), np.linspace(-3, 3, 31)
+
+		cube = vis.compute_density_cube(static_tra, xedges, zedges, max_chunk_size=1200)
+		self.assertEqual(cube.shape, (n_steps, 20, 30))
+		for ts in (0, 7, n_steps - 1):
+			np.testing.assert_array_equal(
+				cube[ts], np.histogram2d(positions[:, 0, ts], positions[:, 2, ts], bins=(xedges, zedges))[0])
+
+		charge_cube = vis.compute_density_cube(static_tra, xedges, zedges, weights='charge', timestep_indices=[3, 5])
+		np.testing.assert_allclose(charge_cube[1], np.histogram2d(
+			positions[:, 0, 5], positions[:, 2, 5], bins=(xedges, zedges), weights=charges[:, 0, 5])[0])
+
+		variable_tra = tra.Trajectory(
+			positions=[positions[:10 + i * 10, :, i] for i in range(n_steps)], times=static_tra.times)
+		variable_cube = vis.compute_density_cube(variable_tra, xedges, zedges, timestep_indices=[2, 19])
+		np.testing.assert_array_equal(variable_cube[1], np.histogram2d(
+			positions[:200, 0, 19], positions[:200, 2, 19], bins=(xedges, zedges))[0])
+
+		# the density cube is reused from the cache file as long as the parameters and the trajectory are unchanged:
+		cache_file = os.path.join(self.result_path, 'test_density_cube_cache.npz')
+		if os.path.exists(cache_file):
+			os.remove(cache_file)
+		np.testing.assert_array_equal(vis.compute_density_cube(static_tra, xedges, zedges, cache_file=cache_file), cube)
+		cache_mtime = os.stat(cache_file).st_mtime_ns
+		np.testing.assert_array_equal(vis.compute_density_cube(static_tra, xedges, zedges, cache_file=cache_file), cube)
+		self.assertEqual(os.stat(cache_file).st_mtime_ns, cache_mtime)
+
+		# a different trajectory with the same times is recomputed:
+		variable_full_cube = vis.compute_density_cube(variable_tra, xedges, zedges, cache_file=cache_file)
+		self.assertFalse(np.array_equal(variable_full_cube, cube))
+		np.testing.assert_array_equal(variable_full_cube[19], variable_cube[1])
+		other_edges_cube = vis.compute_density_cube(variable_tra, xedges, zedges[:-1], cache_file=cache_file)
+		self.assertEqual(other_edges_cube.shape, (n_steps, 20, 29))
+
+		# with an explicit cache key the trajectory data is not hashed, only a different key is recomputed:
+		vis.compute_density_cube(static_tra, xedges, zedges, cache_file=cache_file, cache_key='static')
+		with unittest.mock.patch.object(vis, '_density_cube_fingerprint') as fingerprint:
+			np.testing.assert_array_equal(vis.compute_density_cube(
+				variable_tra, xedges, zedges, cache_file=cache_file, cache_key='static'), cube)
+			np.testing.assert_array_equal(vis.compute_density_cube(
+				variable_tra, xedges, zedges, cache_file=cache_file, cache_key='variable'), variable_full_cube)
+			fingerprint.assert_not_called()
+
+		anim = vis.animate_xz_density(static_tra, xedges, zedges, n_frames=5, interval=2, density_cube=cube)
+		anim.save(os.path.join(self.result_path, 'test_density_cube_animation.mp4'), fps=20)
+
 	def test_basic_density_plotting(self):
 		time_step_index = 1
 		traj_json = tra.read_json_trajectory_file(self.test_json_trajectory)
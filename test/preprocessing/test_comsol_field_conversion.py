@@ -1,5 +1,8 @@
 import unittest
 import os
+import gzip
+import shutil
+import numpy as np
 import IDSimPy.preprocessing.comsol_import as ci
 import IDSimPy.preprocessing.field_generation as fg
 
@@ -26,6 +29,90 @@ class TestFieldGeneration(unittest.TestCase):
 		self.assertAlmostEqual(V_field['data'][80, 10, 10], -0.994295)
 		self.assertAlmostEqual(V_field['data'][40, 29, 29], -0.007102)
 
+	@classmethod
+	def generate_synthetic_comsol_content(cls, offset=0.0):
+		grid_points = [np.linspace(-1.0, 1.0, 5), np.linspace(0.0, 2.0, 4), np.linspace(0.0, 0.5, 3)]
+		X, Y, Z = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')
+		fields = [('% V (V)', X + 10.0 * Y + 100.0 * Z + offset), ('% es.Ex (V/m)', X * Y * Z)]
+		fields[1][1][2, 1, 0] = np.nan
+
+		lines = ['% Model,synthetic.mph', '% Version,COMSOL 5.4', '% Grid']
+		lines += [','.join(repr(v) for v in vec) for vec in grid_points]
+		for name, data in fields:
+			lines += ['% Data', name]
+			lines += [','.join(repr(v) for v in data[:, j, k]) for k in range(3) for j in range(4)]
+		content = '\n'.join(lines) + '\n'
+		return grid_points, fields, content
+
+	def test_synthetic_comsol_field_import(self):
+		grid_points, fields, content = self.generate_synthetic_comsol_content()
+		Y = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')[1]
+
+		csv_fname = os.path.join(self.result_path, 'synthetic_comsol_field.csv')
+		with open(csv_fname, 'w') as f:
+			f.write(content)
+		csv_gz_fname = csv_fname + '.gz'
+		with gzip.open(csv_gz_fname, 'wt') as f:
+			f.write(content)
+
+		for fname in (csv_fname, csv_gz_fname):
+			dat = ci.import_comsol_3d_csv_grid(fname)
+			for vec, vec_ref in zip(dat['grid_points'], grid_points):
+				np.testing.assert_array_equal(vec, vec_ref)
+			self.assertEqual([field['name'] for field in dat['fields']], [name for name, data in fields])
+			for field, (name, data) in zip(dat['fields'], fields):
+				np.testing.assert_array_equal(field['data'], data)
+			np.testing.assert_array_equal(dat['meshgrid'][1], Y)
+
+		# the chunk wise parser gives the same result:
+		raw_chunk = content.split('% Data\n')[2]
+		np.testing.assert_array_equal(ci.parse_comsol_csv_data_chunk(raw_chunk, (5, 4, 3))['data'], fields[1][1])
+
+		dat = ci.import_comsol_3d_csv_grid(csv_gz_fname, field_names=['% es.Ex (V/m)'])
+		self.assertEqual(len(dat['fields']), 1)
+		np.testing.assert_array_equal(dat['fields'][0]['data'], fields[1][1])
+		with self.assertRaises(ValueError):
+			ci.import_comsol_3d_csv_grid(csv_fname, field_names=['% p (Pa)'])
+
+	def test_cached_comsol_field_import(self):
+		cache_dir = os.path.join(self.result_path, 'comsol_cache')
+		shutil.rmtree(cache_dir, ignore_errors=True)
+		csv_fname = os.path.join(self.result_path, 'synthetic_comsol_field_cached.csv')
+		grid_points, fields, content = self.generate_synthetic_comsol_content()
+		with open(csv_fname, 'w') as f:
+			f.write(content)
+
+		for i in range(2):
+			dat = ci.import_comsol_3d_csv_grid(csv_fname, cache=True, cache_dir=cache_dir)
+			self.assertIsInstance(dat['fields'][0]['data'], np.memmap)
+			self.assertEqual([field['name'] for field in dat['fields']], [name for name, data in fields])
+			for field, (name, data) in zip(dat['fields'], fields):
+				np.testing.assert_array_equal(field['data'], data)
+			np.testing.assert_array_equal(dat['grid_points'][2], grid_points[2])
+		self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+		# a new modification time with unchanged content keeps the cache entry valid:
+		stat = os.stat(csv_fname)
+		os.utime(csv_fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+		dat = ci.import_comsol_3d_csv_grid(csv_fname, cache=True, cache_dir=cache_dir)
+		np.testing.assert_array_equal(dat['fields'][0]['data'], fields[0][1])
+
+		# modified content invalidates the cache entry:
+		grid_points, fields, content = self.generate_synthetic_comsol_content(offset=1.0)
+		with open(csv_fname, 'w') as f:
+			f.write(content)
+		os.utime(csv_fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+		dat = ci.import_comsol_3d_csv_grid(csv_fname, cache=True, cache_dir=cache_dir)
+		np.testing.assert_array_equal(dat['fields'][0]['data'], fields[0][1])
+		self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+		dat = ci.import_comsol_3d_csv_grid(csv_fname, field_names=['% es.Ex (V/m)'], cache=True, cache_dir=cache_dir)
+		self.assertEqual(len(dat['fields']), 1)
+		self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+		# imported cached data can be written directly to field files:
+		fg.write_3d_scalar_fields_to_hdf5(dat, os.path.join(self.result_path, 'comsol_cached_scalar_import.h5'))
+
 	def test_comsol_data_is_writeable_as_interpolated_grid(self):
 
 		# import comsol data
@@ -1,6 +1,9 @@
 import unittest
 import os
 import numpy as np
+import h5py
+import vtk
+from vtk.util import numpy_support
 import IDSimPy.preprocessing.field_generation as fg
 
 
@@ -46,6 +49,90 @@ class TestFieldGeneration(unittest.TestCase):
 		fg.write_3d_vector_fields_to_hdf5(dat, os.path.join(self.result_path,
 		                                                    'test_linear_vector_field_01.h5'))
 
+	def test_hdf5_field_writing_options(self):
+		grid_points = [np.linspace(0, 1, 30), np.linspace(0, 2, 20), np.linspace(-1, 1, 10)]
+		X, Y, Z = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')
+		S = X + 10.0 * Y + 100.0 * Z
+		scalar_dat = {"grid_points": grid_points, "fields": [{'name': 'test_field', 'data': S}]}
+		vector_dat = {"grid_points": grid_points, "fields": [{'name': 'test_field', 'data': [S, -S, X]}]}
+		scalar_file = os.path.join(self.result_path, 'test_scalar_field_options.h5')
+		vector_file = os.path.join(self.result_path, 'test_vector_field_options.h5')
+
+		# default: single precision, no compression
+		fg.write_3d_scalar_fields_to_hdf5(scalar_dat, scalar_file)
+		fg.write_3d_vector_fields_to_hdf5(vector_dat, vector_file)
+		with h5py.File(scalar_file, 'r') as fh:
+			self.assertEqual(fh['fields/test_field'].dtype, np.float32)
+			self.assertIsNone(fh['fields/test_field'].compression)
+			np.testing.assert_array_equal(fh['fields/test_field'][()], S.astype(np.float32))
+		with h5py.File(vector_file, 'r') as fh:
+			np.testing.assert_array_equal(fh['fields/test_field'][()], np.stack([S, -S, X], axis=3).astype(np.float32))
+
+		fg.write_3d_scalar_fields_to_hdf5(
+			scalar_dat, scalar_file, scale_factor=2.0, dtype=np.float64, compression='gzip', chunks=(8, 50, 4))
+		fg.write_3d_vector_fields_to_hdf5(
+			vector_dat, vector_file, dtype='d', compression='gzip', compression_opts=9, chunks=(10, 10, 10))
+		with h5py.File(scalar_file, 'r') as fh:
+			dataset = fh['fields/test_field']
+			self.assertEqual(dataset.compression, 'gzip')
+			self.assertEqual(dataset.chunks, (8, 20, 4))
+			np.testing.assert_array_equal(dataset[()], S)
+			np.testing.assert_array_equal(fh['grid_points/y'][()], grid_points[1] * 2.0)
+		with h5py.File(vector_file, 'r') as fh:
+			dataset = fh['fields/test_field']
+			self.assertEqual(dataset.compression_opts, 9)
+			self.assertEqual(dataset.chunks, (10, 10, 10, 3))
+			np.testing.assert_array_equal(dataset[()], np.stack([S, -S, X], axis=3))
+
+		# slabs computed and chunks compressed by parallel workers:
+		for compression in ('gzip', None):
+			fg.write_3d_scalar_fields_to_hdf5(
+				scalar_dat, scalar_file, compression=compression, chunks=(7, 8, 4), n_workers=3)
+			fg.write_3d_vector_fields_to_hdf5(
+				vector_dat, vector_file, dtype='d', compression=compression, n_workers=2)
+			with h5py.File(scalar_file, 'r') as fh:
+				np.testing.assert_array_equal(fh['fields/test_field'][()], S.astype(np.float32))
+			with h5py.File(vector_file, 'r') as fh:
+				np.testing.assert_array_equal(fh['fields/test_field'][()], np.stack([S, -S, X], axis=3))
+
+	def test_vtk_field_data_layout(self):
+		grid_points = [[0, 2, 5, 15], [0, 2, 10], [0, 2, 5, 7, 10]]
+		X, Y, Z = np.meshgrid(grid_points[0], grid_points[1], grid_points[2], indexing='ij')
+		S = X + 10.0 * Y + 100.0 * Z
+		dat = {"grid_points": grid_points, "fields": [{'name': 'test_field', 'data': [S, -S, 2.0 * S]}]}
+
+		for file_ext, reader in (('.vts', vtk.vtkXMLStructuredGridReader()),
+		                         ('.vtr', vtk.vtkXMLRectilinearGridReader())):
+			result_file = os.path.join(self.result_path, 'test_vector_field_layout' + file_ext)
+			fg.write_3d_vector_fields_as_vtk_point_data(dat, result_file)
+			reader.SetFileName(result_file)
+			reader.Update()
+			grid = reader.GetOutput()
+			self.assertEqual(grid.GetExtent(), (0, 3, 0, 2, 0, 4))
+
+			# VTK point order: x index running fastest
+			field_dat = numpy_support.vtk_to_numpy(grid.GetPointData().GetArray('test_field'))
+			np.testing.assert_array_equal(field_dat[:, 0], S.ravel(order='F'))
+			np.testing.assert_array_equal(field_dat[:, 1], -S.ravel(order='F'))
+			point_index = 1 + 4 * (2 + 3 * 3)
+			np.testing.assert_allclose(grid.GetPoint(point_index), (2, 10, 7))
+			self.assertAlmostEqual(field_dat[point_index, 2], 2.0 * S[1, 2, 3])
+
+		result_file = os.path.join(self.result_path, 'test_scalar_field_layout.vti')
+		with self.assertRaises(ValueError):
+			fg.write_3d_scalar_fields_as_vtk_point_data(
+				{"grid_points": grid_points, "fields": [{'name': 'test_field', 'data': S}]}, result_file)
+
+		grid_points = [np.linspace(0, 1, 4), np.linspace(0, 2, 3), np.linspace(-1, 1, 5)]
+		fg.write_3d_scalar_fields_as_vtk_point_data(
+			{"grid_points": grid_points, "fields": [{'name': 'test_field', 'data': S}]}, result_file,
+			scale_factor=2.0)
+		reader = vtk.vtkXMLImageDataReader()
+		reader.SetFileName(result_file)
+		reader.Update()
+		np.testing.assert_allclose(reader.GetOutput().GetSpacing(), (2.0 / 3.0, 2.0, 1.0))
+		np.testing.assert_array_equal(
+			numpy_support.vtk_to_numpy(reader.GetOutput().GetPointData().GetArray('test_field')), S.ravel(order='F'))
 
 	def test_2d_3d_conversion_for_scalar_field(self):
 
@@ -74,7 +161,56 @@ class TestFieldGeneration(unittest.TestCase):
 		#plt.colorbar()
 		#plt.show()
 
-		#todo: Test convesion of axial symmetric vector field
+		# chunked transformation gives identical results:
+		z_axi = np.meshgrid(points_r, points_z, indexing='ij')[1]
+		v_ca_chunked = fg.transform_2d_axial_to_3d(r_axi, z_axi, v_axi, chunk_size=7)[3]
+		np.testing.assert_array_equal(v_ca_chunked, v_ca)
+
+	def test_2d_3d_conversion_for_radial_vector_field(self):
+		points_r = np.linspace(0, 0.01, 30)
+		points_z = np.linspace(0, 0.1, 50)
+		r_axi, z_axi = np.meshgrid(points_r, points_z, indexing='ij')
+		e_r_axi = r_axi * 1e3
+
+		x_ca, y_ca, z_ca, e_ca = fg.transform_2d_axial_to_3d(r_axi, z_axi, e_r_axi, radial_component=True)
+		self.assertEqual(e_ca.shape, (60, 50, 60, 2))
+
+		# linear radial field is rotated into the x and z components within the radial grid:
+		r_ca = np.sqrt(x_ca ** 2 + z_ca ** 2)
+		in_grid = r_ca < points_r[-1]
+		np.testing.assert_allclose(e_ca[..., 0][in_grid], x_ca[in_grid] * 1e3, atol=1e-12)
+		np.testing.assert_allclose(e_ca[..., 1][in_grid], z_ca[in_grid] * 1e3, atol=1e-12)
+		np.testing.assert_array_equal(e_ca[r_ca > points_r[-1]], 0.0)
+
+		e_ca_chunked = fg.transform_2d_axial_to_3d(r_axi, z_axi, e_r_axi, radial_component=True, chunk_size=8)[3]
+		np.testing.assert_array_equal(e_ca_chunked, e_ca)
+
+	def test_2d_axial_fields_written_to_3d_hdf5(self):
+		points_r = np.linspace(0, 0.01, 15)
+		points_z = np.linspace(0, 0.1, 40)
+		r_axi, z_axi = np.meshgrid(points_r, points_z, indexing='ij')
+		p_axi = np.cos(r_axi * 300.0) * z_axi
+		e_a_axi = r_axi + z_axi
+
+		result_file = os.path.join(self.result_path, 'test_axial_fields_3d.h5')
+		fields = [{'name': 'pressure', 'data': p_axi}, {'name': 'flow', 'data': (p_axi, e_a_axi)}]
+		fg.write_2d_axial_fields_to_3d_hdf5(
+			r_axi, z_axi, fields, result_file, scale_factor=2.0, dtype=np.float64, compression='gzip', chunks=(4, 8, 8))
+
+		# written fields are identical to the in memory transformation:
+		x_ca, y_ca, z_ca, p_ca = fg.transform_2d_axial_to_3d(r_axi, z_axi, p_axi)
+		e_r_ca = fg.transform_2d_axial_to_3d(r_axi, z_axi, p_axi, radial_component=True)[3]
+		e_a_ca = fg.transform_2d_axial_to_3d(r_axi, z_axi, e_a_axi)[3]
+		with h5py.File(result_file, 'r') as fh:
+			np.testing.assert_array_equal(fh['grid_points/x'][()], x_ca[:, 0, 0] * 2.0)
+			np.testing.assert_array_equal(fh['grid_points/y'][()], y_ca[0, :, 0] * 2.0)
+			np.testing.assert_array_equal(fh['grid_points/z'][()], z_ca[0, 0, :] * 2.0)
+			np.testing.assert_array_equal(fh['fields/pressure'][()], p_ca)
+			e_ca = fh['fields/flow'][()]
+			self.assertEqual(e_ca.shape, (30, 40, 30, 3))
+			np.testing.assert_array_equal(e_ca[..., 0], e_r_ca[..., 0])
+			np.testing.assert_array_equal(e_ca[..., 1], e_a_ca)
+			np.testing.assert_array_equal(e_ca[..., 2], e_r_ca[..., 1])
 
 	def test_quadrupole_vector_field_generation(self):
 
@@ -0,0 +1,79 @@
+import unittest
+import os
+import numpy as np
+import IDSimPy.preprocessing.ion_cloud_generation as cl
+
+
+class TestIonCloudGeneration(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.result_path = os.path.join('test', 'test_results')
+
+	def test_cloud_file_writing_and_reading(self):
+		cloud = cl.define_cylinder_x_dir(1000, 0.5, 5.0, 1, 100)
+		cloud[:10, 3:6] = [[1e-7, -2.5e16, 0.1]] * 10
+		cloud[-1, 8] = 3e-5
+
+		text_file = os.path.join(self.result_path, 'test_cloud.csv')
+		cl.write_cloud_file(cloud, text_file, chunk_size=300)
+
+		# text format is the semicolon separated format with a delimiter after every value:
+		with open(text_file) as tf:
+			lines = tf.readlines()
+		self.assertEqual(len(lines), 1000)
+		self.assertEqual(lines[0], ''.join([str(v) + ';' for v in cloud[0, :]]) + '\n')
+		self.assertEqual(lines[-1], ''.join([str(v) + ';' for v in cloud[-1, :]]) + '\n')
+		np.testing.assert_array_equal(cl.read_cloud_file(text_file), cloud)
+
+		binary_file = os.path.join(self.result_path, 'test_cloud.npy')
+		cl.write_cloud_file(cloud, binary_file)
+		np.testing.assert_array_equal(cl.read_cloud_file(binary_file), cloud)
+
+	def test_cloud_file_reading_with_comments(self):
+		cloud_file = os.path.join(self.result_path, 'test_cloud_comments.csv')
+		with open(cloud_file, 'w') as cf:
+			cf.write('#pos x; pos y; pos z; vx; vy; vz; charge; mass_amu; time of birth\n')
+			cf.write('1.00;1.00;1.00;1.00;1.00;1.00;1.00;100.0;0\n')
+			cf.write('-10.00;-20.00;-10.00;-10.00;10.00;-10.00;2.0;300.0;1e-5\n')
+
+		cloud = cl.read_cloud_file(cloud_file)
+		self.assertEqual(np.shape(cloud), (2, 9))
+		np.testing.assert_array_equal(cloud[1, :], [-10.0, -20.0, -10.0, -10.0, 10.0, -10.0, 2.0, 300.0, 1e-5])
+
+	def test_xy_grid_definition(self):
+		grid = cl.define_xy_grid(3, 4, 1.0, 2.0, 0.5, 0.1, 100)
+		self.assertEqual(np.shape(grid), (12, 9))
+		np.testing.assert_allclose(grid[:4, 0], -0.5)
+		np.testing.assert_allclose(grid[:4, 1], np.linspace(-2.0, 2.0, 4) + 0.1)
+		np.testing.assert_array_equal(grid[:, 6:8], [[1, 100]] * 12)
+
+	def test_ion_cloud_builder(self):
+		builder = cl.IonCloudBuilder(seed=42)
+		builder.add_block(1000, 1.0, 2.0, 3.0, 1, 100)
+		builder.add_cylinder_z_dir(2000, 0.5, 5.0, 2, 200, time_of_birth=1e-5)
+		builder.add_sphere(1500, 2.0, -1, 300, offset=[10.0, 0, 0], kinetic_energy=0.1)
+		builder.add_xy_grid(10, 20, 1.0, 1.0, 1, 400)
+
+		cloud = builder.build()
+		self.assertEqual(np.shape(cloud), (4700, 9))
+		self.assertEqual(builder.n_ions, 4700)
+		np.testing.assert_array_equal(cloud, builder.build())
+		other_block = cl.IonCloudBuilder(seed=43).add_block(1000, 1.0, 2.0, 3.0, 1, 100).build()
+		self.assertFalse(np.array_equal(cloud[:1000], other_block))
+
+		block = cloud[:1000]
+		self.assertTrue(np.all(np.abs(block[:, 0:3]) <= [1.0, 2.0, 3.0]))
+		np.testing.assert_array_equal(block[:, 3:9], [[0, 0, 0, 1, 100, 0]] * 1000)
+
+		cylinder = cloud[1000:3000]
+		self.assertTrue(np.all(np.hypot(cylinder[:, 0], cylinder[:, 1]) <= 0.5))
+		self.assertTrue(np.all((cylinder[:, 2] >= 0) & (cylinder[:, 2] <= 5.0)))
+		np.testing.assert_array_equal(cylinder[:, 6:9], [[2, 200, 1e-5]] * 2000)
+
+		sphere = cloud[3000:4500]
+		self.assertTrue(np.all(np.linalg.norm(sphere[:, 0:3] - [10.0, 0, 0], axis=1) <= 2.0))
+		velocities = np.linalg.norm(sphere[:, 3:6], axis=1)
+		np.testing.assert_allclose(velocities, cl.velo_from_kinetic_energy(0.1, 300))
+
+		np.testing.assert_array_equal(cloud[4500:], cl.define_xy_grid(10, 20, 1.0, 1.0, 0, 0, 400))